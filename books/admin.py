@@ -1,5 +1,7 @@
 from django.contrib import admin
 
+from core.pagination import EstimatedCountPaginator
+
 from .models import Book
 
 
@@ -11,3 +13,5 @@ class BookAdmin(admin.ModelAdmin):
     list_filter = ("is_available", "created_at")
     search_fields = ("title", "author", "isbn")
     readonly_fields = ("created_at", "updated_at")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
@@ -0,0 +1,106 @@
+"""
+Caching and version markers for the book catalog.
+"""
+
+import hashlib
+from datetime import datetime
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from core.cache import TieredCache, bump_version, get_version, normalize_query
+from core.metrics import counter
+
+from .models import Book
+from .serializers import BookSerializer
+
+CATALOG_VERSION_KEY = "books:catalog:version"
+CATALOG_CHANGED_KEY = "books:catalog:changed_at"
+
+# Serialized book details, keyed by id and a version per book. The Book
+# signal handlers advance the version, so a row read before a write commits
+# can't be cached as current; the local tier may lag behind other
+# processes' writes by up to BOOK_CACHE_LOCAL_TTL seconds.
+book_detail_cache = TieredCache(
+    "books:detail",
+    maxsize=settings.BOOK_CACHE_LOCAL_SIZE,
+    timeout=settings.BOOK_CACHE_TIMEOUT,
+    local_ttl=settings.BOOK_CACHE_LOCAL_TTL,
+    versioned=True,
+)
+
+
+book_list_cache_hits = counter("books.list_cache.hits")
+book_list_cache_misses = counter("books.list_cache.misses")
+
+
+def get_catalog_version() -> int:
+    """Return the catalog version, which changes on every book write."""
+    return get_version(CATALOG_VERSION_KEY)
+
+
+def get_catalog_changed_at() -> datetime:
+    """
+    Return when the catalog version last changed.
+
+    Deleted books leave no ``updated_at`` behind, so this bounds the
+    Last-Modified date of lists. If the time was evicted it restarts from
+    now, which can only make lists look newer.
+    """
+    changed_at = cache.get(CATALOG_CHANGED_KEY)
+    if changed_at is None:
+        cache.add(CATALOG_CHANGED_KEY, timezone.now(), timeout=None)
+        changed_at = cache.get(CATALOG_CHANGED_KEY)
+    return changed_at
+
+
+def bump_catalog_version() -> int:
+    """Advance the catalog version after a book was created, changed or deleted."""
+    # Set before the version, so lists cached under the new version see it
+    cache.set(CATALOG_CHANGED_KEY, timezone.now(), timeout=None)
+    return bump_version(CATALOG_VERSION_KEY)
+
+
+def get_book_entry(pk: int) -> Optional[dict]:
+    """
+    Return the cached representation of a book.
+
+    The entry holds the book's ``updated_at`` (its version) and the
+    ``BookSerializer`` output. Returns ``None`` if the book doesn't exist.
+    """
+
+    def load() -> Optional[dict]:
+        book = Book.objects.filter(pk=pk).first()
+        if book is None:
+            return None
+        return {"updated_at": book.updated_at, "data": dict(BookSerializer(book).data)}
+
+    return book_detail_cache.get_or_load(pk, load)
+
+
+def invalidate_book(pk: int) -> None:
+    """Drop a book's cached representation."""
+    book_detail_cache.delete(pk)
+
+
+def invalidate_books(pks: list) -> None:
+    """Drop the cached representations of many books and advance the catalog version."""
+    if pks:
+        book_detail_cache.delete_many(pks)
+    bump_catalog_version()
+
+
+def book_list_cache_key(request) -> str:
+    """
+    Return the cache key of a book list response.
+
+    The key is built from the normalised query string, so equivalent requests
+    share an entry, and from the catalog version, so any book write makes all
+    cached lists unreachable at once. The host is included because responses
+    contain absolute pagination links. Lists don't depend on the user.
+    """
+    query = f"{request.get_host()}|{request.path}|{normalize_query(request.query_params)}"
+    digest = hashlib.md5(query.encode()).hexdigest()
+    return f"books:list:{get_catalog_version()}:{digest}"
@@ -2,9 +2,17 @@
 Filters for Book model.
 """
 
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.db import connections
+from django.db.models import Q
+from django.db.models.functions import Greatest
+
 import django_filters
+from rest_framework import filters
 
-from .models import Book
+from .models import BOOK_SEARCH_VECTOR, SEARCH_CONFIG, Book
 
 
 class BookFilter(django_filters.FilterSet):
@@ -18,3 +26,89 @@ class BookFilter(django_filters.FilterSet):
     class Meta:
         model = Book
         fields = ("title", "author", "isbn", "is_available")
+
+
+class BookSearchFilter(filters.SearchFilter):
+    """
+    Full-text search over book titles and authors.
+
+    On PostgreSQL the ``search`` parameter is parsed as a web search query and
+    matched against the weighted ``BOOK_SEARCH_VECTOR`` (backed by a GIN index),
+    results are annotated with ``search_rank``, and an exact ISBN match is
+    accepted as well. Other databases fall back to the ``icontains`` search
+    over the view's ``search_fields``.
+    """
+
+    rank_annotation = "search_rank"
+
+    def filter_queryset(self, request, queryset, view):
+        """Filter the queryset by the search parameter."""
+        if connections[queryset.db].vendor != "postgresql":
+            return super().filter_queryset(request, queryset, view)
+
+        terms = " ".join(self.get_search_terms(request))
+        if not terms:
+            return queryset
+
+        query = SearchQuery(terms, search_type="websearch", config=SEARCH_CONFIG)
+        isbn = re.sub(r"[-\s]", "", terms)
+        return queryset.annotate(
+            search_vector=BOOK_SEARCH_VECTOR,
+            **{self.rank_annotation: SearchRank(BOOK_SEARCH_VECTOR, query)},
+        ).filter(Q(search_vector=query) | Q(isbn=isbn))
+
+
+class BookFuzzySearchFilter(filters.BaseFilterBackend):
+    """
+    Typo-tolerant search over book titles and authors.
+
+    On PostgreSQL the ``fuzzy`` parameter is matched with the ``pg_trgm`` word
+    similarity operator, which is served by the trigram GIN indexes on
+    ``title`` and ``author``. Matches below ``BOOK_FUZZY_SEARCH_THRESHOLD``
+    (set on every new connection) are dropped and the rest are annotated with
+    ``fuzzy_rank``. Other databases fall back to a case-insensitive contains
+    match.
+    """
+
+    fuzzy_param = "fuzzy"
+    rank_annotation = "fuzzy_rank"
+
+    def filter_queryset(self, request, queryset, view):
+        """Filter the queryset by the fuzzy parameter."""
+        term = request.query_params.get(self.fuzzy_param, "").strip()
+        if not term:
+            return queryset
+
+        connection = connections[queryset.db]
+        if connection.vendor != "postgresql":
+            return queryset.filter(Q(title__icontains=term) | Q(author__icontains=term))
+
+        # The <% threshold is set per connection, see books.signals
+        return queryset.annotate(
+            **{
+                self.rank_annotation: Greatest(
+                    TrigramWordSimilarity(term, "title"), TrigramWordSimilarity(term, "author")
+                )
+            }
+        ).filter(Q(title__trigram_word_similar=term) | Q(author__trigram_word_similar=term))
+
+
+class BookOrderingFilter(filters.OrderingFilter):
+    """
+    Ordering filter that sorts ranked search results by relevance.
+
+    When the client doesn't request an explicit ordering and the queryset was
+    ranked by ``BookSearchFilter`` or ``BookFuzzySearchFilter``, the most
+    relevant books come first and the view's default ordering is used as a
+    tie-breaker.
+    """
+
+    rank_annotations = (BookSearchFilter.rank_annotation, BookFuzzySearchFilter.rank_annotation)
+
+    def get_ordering(self, request, queryset, view):
+        """Return the ordering, prepending search ranks when applicable."""
+        ordering = super().get_ordering(request, queryset, view) or ()
+        if request.query_params.get(self.ordering_param):
+            return ordering
+        ranks = [f"-{rank}" for rank in self.rank_annotations if rank in queryset.query.annotations]
+        return (*ranks, *ordering) if ranks else ordering
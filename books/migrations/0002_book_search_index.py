@@ -0,0 +1,35 @@
+# Generated by Django 6.0 on 2026-10-16 09:12
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+import core.db
+
+
+class Migration(migrations.Migration):
+    # Indexes are built concurrently, outside a transaction
+    atomic = False
+
+    dependencies = [
+        ("books", "0001_initial"),
+    ]
+
+    operations = [
+        core.db.PostgresOnlyAddIndex(
+            model_name="book",
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.search.CombinedSearchVector(
+                    django.contrib.postgres.search.SearchVector(
+                        "title", config="english", weight="A"
+                    ),
+                    "||",
+                    django.contrib.postgres.search.SearchVector(
+                        "author", config="english", weight="B"
+                    ),
+                    django.contrib.postgres.search.SearchConfig("english"),
+                ),
+                name="books_search_vector_gin",
+            ),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 6.0 on 2026-10-16 11:40
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+import core.db
+
+
+class Migration(migrations.Migration):
+    # Indexes are built concurrently, outside a transaction
+    atomic = False
+
+    dependencies = [
+        ("books", "0002_book_search_index"),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        core.db.PostgresOnlyAddIndex(
+            model_name="book",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["title"], name="books_title_trgm", opclasses=["gin_trgm_ops"]
+            ),
+        ),
+        core.db.PostgresOnlyAddIndex(
+            model_name="book",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["author"], name="books_author_trgm", opclasses=["gin_trgm_ops"]
+            ),
+        ),
+    ]
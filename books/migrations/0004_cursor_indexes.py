@@ -0,0 +1,21 @@
+# Generated by Django 6.0 on 2026-10-16 13:05
+
+from django.db import migrations, models
+
+import core.db
+
+
+class Migration(migrations.Migration):
+    # Indexes are built concurrently, outside a transaction
+    atomic = False
+
+    dependencies = [
+        ("books", "0003_book_trigram_indexes"),
+    ]
+
+    operations = [
+        core.db.PortableAddIndexConcurrently(
+            model_name="book",
+            index=models.Index(fields=["-created_at", "id"], name="books_created_id_idx"),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 6.0 on 2026-10-16 15:20
+
+from django.db import migrations, models
+
+import core.db
+
+
+class Migration(migrations.Migration):
+    # Indexes are built concurrently, outside a transaction
+    atomic = False
+
+    dependencies = [
+        ("books", "0004_cursor_indexes"),
+    ]
+
+    operations = [
+        core.db.PortableAddIndexConcurrently(
+            model_name="book",
+            index=models.Index(fields=["updated_at"], name="books_updated_at_idx"),
+        ),
+    ]
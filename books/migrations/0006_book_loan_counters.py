@@ -0,0 +1,25 @@
+# Generated by Django 6.0 on 2026-10-16 18:05
+
+from django.db import migrations, models
+
+import core.db
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("books", "0005_book_updated_at_index"),
+    ]
+
+    operations = [
+        core.db.PortableAddField(
+            model_name="book",
+            name="total_loans",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        core.db.PortableAddField(
+            model_name="book",
+            name="active_loans",
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
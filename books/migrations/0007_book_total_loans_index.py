@@ -0,0 +1,21 @@
+# Generated by Django 6.0 on 2026-10-16 18:05
+
+from django.db import migrations, models
+
+import core.db
+
+
+class Migration(migrations.Migration):
+    # Indexes are built concurrently, outside a transaction
+    atomic = False
+
+    dependencies = [
+        ("books", "0006_book_loan_counters"),
+    ]
+
+    operations = [
+        core.db.PortableAddIndexConcurrently(
+            model_name="book",
+            index=models.Index(fields=["-total_loans", "id"], name="books_total_loans_idx"),
+        ),
+    ]
@@ -2,9 +2,20 @@
 Book models for the Library Management System.
 """
 
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
 from django.core.validators import MinLengthValidator
 from django.db import models
 
+# Text search configuration used for the catalog full-text index and queries
+SEARCH_CONFIG = "english"
+
+# Weighted document searched by BookSearchFilter. Queries must use this exact
+# expression for PostgreSQL to pick the GIN index declared on Book.
+BOOK_SEARCH_VECTOR = SearchVector("title", weight="A", config=SEARCH_CONFIG) + SearchVector(
+    "author", weight="B", config=SEARCH_CONFIG
+)
+
 
 class Book(models.Model):
     """
@@ -21,6 +32,9 @@ class Book(models.Model):
     )
     page_count = models.PositiveIntegerField()
     is_available = models.BooleanField(default=True)
+    # Circulation counters maintained by LoanService (see reconcile_loan_counters)
+    total_loans = models.PositiveIntegerField(default=0)
+    active_loans = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -31,6 +45,12 @@ class Book(models.Model):
             models.Index(fields=["isbn"]),
             models.Index(fields=["is_available"]),
             models.Index(fields=["title", "author"]),
+            models.Index(fields=["-created_at", "id"], name="books_created_id_idx"),
+            models.Index(fields=["updated_at"], name="books_updated_at_idx"),
+            models.Index(fields=["-total_loans", "id"], name="books_total_loans_idx"),
+            GinIndex(BOOK_SEARCH_VECTOR, name="books_search_vector_gin"),
+            GinIndex(fields=["title"], name="books_title_trgm", opclasses=["gin_trgm_ops"]),
+            GinIndex(fields=["author"], name="books_author_trgm", opclasses=["gin_trgm_ops"]),
         ]
 
     def __str__(self) -> str:
@@ -0,0 +1,59 @@
+"""
+Streaming parsers for bulk book uploads.
+
+Both parsers return a lazy iterator of rows read from the request stream, so
+uploads are never held in memory as a whole.
+"""
+
+import codecs
+import csv
+import json
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+class CSVRowParser(BaseParser):
+    """Parse a CSV upload with a header line into an iterator of dicts."""
+
+    media_type = "text/csv"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if stream is None:
+            return iter(())
+        encoding = (parser_context or {}).get("encoding") or "utf-8"
+        if codecs.lookup(encoding).name == "utf-8":
+            # Tolerate the byte order mark spreadsheet exports start with
+            encoding = "utf-8-sig"
+        return self.read_rows(csv.DictReader(codecs.iterdecode(stream, encoding)))
+
+    def read_rows(self, reader):
+        try:
+            yield from reader
+        except (csv.Error, UnicodeDecodeError) as e:
+            raise ParseError(f"CSV parse error - {e}")
+
+
+class NDJSONRowParser(BaseParser):
+    """
+    Parse newline-delimited JSON into an iterator of rows.
+
+    Blank lines are skipped. A line that isn't valid JSON is yielded as the
+    ``ValueError`` describing it, so it can be reported for that row alone.
+    """
+
+    media_type = "application/x-ndjson"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if stream is None:
+            return iter(())
+        return self.read_rows(stream)
+
+    def read_rows(self, stream):
+        for line in stream:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                yield ValueError(f"JSON parse error - {e}")
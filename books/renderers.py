@@ -0,0 +1,91 @@
+"""
+Renderers for streamed catalog exports.
+
+Besides rendering regular response data (such as error details), both
+renderers can stream rows of ``values_list()`` tuples with ``stream()``.
+Values are formatted like ``BookSerializer`` output.
+"""
+
+import csv
+import json
+from datetime import datetime
+from itertools import islice
+from typing import Iterable, Iterator
+
+from rest_framework import serializers
+from rest_framework.renderers import BaseRenderer
+
+_datetime_field = serializers.DateTimeField()
+
+
+def format_value(value):
+    """Format a database value the way the serializer fields do."""
+    if isinstance(value, datetime):
+        return _datetime_field.to_representation(value)
+    return value
+
+
+class Echo:
+    """File-like object returning what is written, so ``csv.writer`` output can be streamed."""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+class StreamingRenderer(BaseRenderer):
+    """Base class for line-oriented renderers that can stream rows."""
+
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None) -> bytes:
+        if data is None:
+            return b""
+        rows = data if isinstance(data, list) else [data]
+        if not rows:
+            return b""
+        fields = list(rows[0])
+        values = [[format_value(row.get(field)) for field in fields] for row in rows]
+        content = self.render_header(fields) + "".join(self.render_rows(fields, values))
+        return content.encode(self.charset)
+
+    def stream(self, fields: Iterable, rows: Iterable, chunk_size: int) -> Iterator[bytes]:
+        """Render rows of values for ``fields``, yielding ``chunk_size`` rows at a time."""
+        fields = list(fields)
+        rows = ([format_value(value) for value in row] for row in rows)
+        yield self.render_header(fields).encode(self.charset)
+        while chunk := list(islice(rows, chunk_size)):
+            yield "".join(self.render_rows(fields, chunk)).encode(self.charset)
+
+    def render_header(self, fields: list) -> str:
+        return ""
+
+    def render_rows(self, fields: list, rows: Iterable) -> Iterator[str]:
+        raise NotImplementedError
+
+
+class NDJSONRenderer(StreamingRenderer):
+    """Render rows as newline-delimited JSON objects."""
+
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+
+    def render_rows(self, fields: list, rows: Iterable) -> Iterator[str]:
+        for row in rows:
+            yield json.dumps(dict(zip(fields, row)), ensure_ascii=False) + "\n"
+
+
+class CSVRenderer(StreamingRenderer):
+    """Render rows as CSV with a header line. Booleans are written as true/false."""
+
+    media_type = "text/csv"
+    format = "csv"
+
+    def render_header(self, fields: list) -> str:
+        return csv.writer(Echo()).writerow(fields)
+
+    def render_rows(self, fields: list, rows: Iterable) -> Iterator[str]:
+        writer = csv.writer(Echo())
+        for row in rows:
+            yield writer.writerow(
+                [str(value).lower() if isinstance(value, bool) else value for value in row]
+            )
@@ -0,0 +1,143 @@
+"""
+Business logic services for Book operations.
+"""
+
+import re
+from itertools import islice
+from typing import Iterable, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import invalidate_books
+from .models import Book
+from .validators import clean_isbn, clean_page_count
+
+# Fields overwritten when an imported ISBN already exists. Availability is
+# owned by loans and is never changed by an import.
+IMPORT_UPDATE_FIELDS = ("title", "author", "page_count", "updated_at")
+
+
+class BookImportService:
+    """Service class for bulk book imports."""
+
+    @staticmethod
+    def import_books(
+        rows: Iterable,
+        chunk_size: Optional[int] = None,
+        max_errors: Optional[int] = None,
+    ) -> dict:
+        """
+        Validate and upsert books on ISBN, chunk by chunk.
+
+        Rows are consumed lazily and written with one ``bulk_create`` per
+        chunk, so memory use doesn't depend on the number of rows. Each chunk
+        is committed on its own; a failing upload keeps the chunks before it.
+        Within a chunk the last row for an ISBN wins.
+
+        Args:
+            rows: Iterable of row dicts with title, author, isbn and page_count
+            chunk_size: Rows per upsert, defaults to BOOK_IMPORT_CHUNK_SIZE
+            max_errors: Row errors kept in the report, defaults to BOOK_IMPORT_MAX_ERRORS
+
+        Returns:
+            Report with row counts and the errors of the first invalid rows
+        """
+        chunk_size = chunk_size or settings.BOOK_IMPORT_CHUNK_SIZE
+        if max_errors is None:
+            max_errors = settings.BOOK_IMPORT_MAX_ERRORS
+        report = {"processed": 0, "imported": 0, "failed": 0, "errors": []}
+
+        numbered = enumerate(rows, start=1)
+        while True:
+            chunk = list(islice(numbered, chunk_size))
+            if not chunk:
+                break
+            books = {}
+            for number, row in chunk:
+                values, errors = BookImportService.clean_row(row)
+                if errors:
+                    report["failed"] += 1
+                    if len(report["errors"]) < max_errors:
+                        report["errors"].append({"row": number, "errors": errors})
+                    continue
+                books[values["isbn"]] = Book(**values)
+            report["processed"] += len(chunk)
+            BookImportService.upsert(list(books.values()))
+
+        report["imported"] = report["processed"] - report["failed"]
+        report["errors_truncated"] = report["failed"] > len(report["errors"])
+        return report
+
+    @staticmethod
+    def upsert(books: list) -> None:
+        """Insert books, updating existing ones with the same ISBN, and drop cached copies."""
+        if not books:
+            return
+        now = timezone.now()
+        for book in books:
+            book.created_at = book.updated_at = now
+        with transaction.atomic():
+            # Only books that already existed can have cached copies
+            isbns = [book.isbn for book in books]
+            existing = list(Book.objects.filter(isbn__in=isbns).values_list("id", flat=True))
+            Book.objects.bulk_create(
+                books,
+                update_conflicts=True,
+                unique_fields=["isbn"],
+                update_fields=IMPORT_UPDATE_FIELDS,
+            )
+            # bulk_create sends no signals. Invalidating once the chunk is
+            # committed is enough: versioned entries loaded before then are
+            # left behind by the new versions.
+            transaction.on_commit(lambda: invalidate_books(existing))
+
+    @staticmethod
+    def clean_row(row) -> tuple:
+        """
+        Validate one import row.
+
+        Returns:
+            ``(values, None)`` for a valid row, ``(None, errors)`` otherwise,
+            with errors keyed by field like serializer errors
+        """
+        if isinstance(row, ValueError):
+            return None, {"non_field_errors": [str(row)]}
+        if not isinstance(row, dict):
+            return None, {"non_field_errors": ["Row must be an object."]}
+
+        values = {}
+        errors = {}
+        for field in ("title", "author", "isbn"):
+            value = row.get(field)
+            if value is None:
+                errors[field] = ["This field is required."]
+            elif not isinstance(value, str) or not value.strip():
+                errors[field] = ["This field may not be blank."]
+            else:
+                values[field] = value.strip()
+        for field in ("title", "author"):
+            max_length = Book._meta.get_field(field).max_length
+            if len(values.get(field, "")) > max_length:
+                errors[field] = [f"Ensure this field has no more than {max_length} characters."]
+        if "isbn" in values:
+            try:
+                values["isbn"] = clean_isbn(values["isbn"])
+            except ValueError as e:
+                errors["isbn"] = [str(e)]
+
+        page_count = row.get("page_count")
+        if page_count is None or page_count == "":
+            errors["page_count"] = ["This field is required."]
+        elif isinstance(page_count, bool) or not re.match(r"^-?\d+$", str(page_count).strip()):
+            errors["page_count"] = ["A valid integer is required."]
+        else:
+            try:
+                values["page_count"] = clean_page_count(int(page_count))
+            except ValueError as e:
+                errors["page_count"] = [str(e)]
+
+        if errors:
+            return None, errors
+        return values, None
@@ -0,0 +1,48 @@
+"""
+Signal handlers for the books app.
+"""
+
+from django.conf import settings
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import invalidate_books
+from .models import Book
+
+
+def invalidate_book_caches(*pks: int) -> None:
+    """
+    Drop the cached books and advance the catalog version.
+
+    Caches are invalidated right away and again once the transaction commits,
+    so a concurrent reader can't re-cache the pre-commit rows for long.
+    """
+    invalidate_books(pks)
+    transaction.on_commit(lambda: invalidate_books(pks))
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def book_changed(sender, instance: Book, **kwargs) -> None:
+    """Invalidate catalog caches when a book is written."""
+    invalidate_book_caches(instance.pk)
+
+
+@receiver(connection_created)
+def configure_fuzzy_search(sender, connection, **kwargs) -> None:
+    """
+    Set the trigram word similarity threshold of a new PostgreSQL connection.
+
+    The ``<%`` operator used by ``BookFuzzySearchFilter`` compares against this
+    setting, so it has to be set for the index to filter with the configured
+    threshold. Setting it once per connection keeps it out of the requests.
+    """
+    if connection.vendor != "postgresql":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT set_config('pg_trgm.word_similarity_threshold', %s, false)",
+            [str(settings.BOOK_FUZZY_SEARCH_THRESHOLD)],
+        )
@@ -0,0 +1,35 @@
+"""
+Validation rules for book fields, shared by the serializer and bulk import.
+"""
+
+import re
+
+
+def clean_isbn(value: str) -> str:
+    """
+    Validate an ISBN and return it without hyphens and spaces.
+
+    Raises:
+        ValueError: If the ISBN is not 10 or 13 digits (or X for ISBN-10)
+    """
+    # Remove hyphens and spaces
+    isbn_clean = re.sub(r"[-\s]", "", value)
+    # Check if it's 10 or 13 digits
+    if not (len(isbn_clean) == 10 or len(isbn_clean) == 13):
+        raise ValueError("ISBN must be 10 or 13 digits long.")
+    # Check if all characters are digits (or X for ISBN-10)
+    if not re.match(r"^[\dX]+$", isbn_clean):
+        raise ValueError("ISBN must contain only digits (or X for ISBN-10).")
+    return isbn_clean
+
+
+def clean_page_count(value: int) -> int:
+    """
+    Validate that a page count is positive.
+
+    Raises:
+        ValueError: If the page count is zero or negative
+    """
+    if value <= 0:
+        raise ValueError("Page count must be greater than 0.")
+    return value
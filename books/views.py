@@ -2,22 +2,43 @@
 Views for Book API endpoints.
 """
 
+from django.conf import settings
+from django.db.models import Max
+from django.http import StreamingHttpResponse
+
+from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import SAFE_METHODS, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 
-from loans.models import Loan
+from core.cache import get_or_compute
+from core.conditional import conditional_get
+from core.idempotency import idempotent
+from core.mixins import CompiledListMixin
+from core.throttling import ScopedRateThrottle
+from loans.models import LoanHistory
+from loans.pagination import LoanPagination
 from loans.serializers import LoanSerializer
 from loans.services import LoanService
 
-from .filters import BookFilter
+from .cache import (
+    book_list_cache_hits,
+    book_list_cache_key,
+    book_list_cache_misses,
+    get_book_entry,
+    get_catalog_changed_at,
+)
+from .filters import BookFilter, BookFuzzySearchFilter, BookOrderingFilter, BookSearchFilter
 from .models import Book
+from .parsers import CSVRowParser, NDJSONRowParser
 from .permissions import IsAdminOrReadOnly
+from .renderers import CSVRenderer, NDJSONRenderer
 from .serializers import BookSerializer
+from .services import BookImportService
 
 
-class BookViewSet(viewsets.ModelViewSet):
+class BookViewSet(CompiledListMixin, viewsets.ModelViewSet):
     """
     ViewSet for Book model.
 
@@ -30,15 +51,122 @@ class BookViewSet(viewsets.ModelViewSet):
     borrow: POST /books/<id>/borrow/ - Borrow a book (authenticated users)
     return: POST /books/<id>/return/ - Return a book (authenticated users)
     loan_history: GET /books/<id>/loan_history/ - Get loan history for a book (admin only)
+    import_books: POST /books/import/ - Bulk import books from CSV or NDJSON (admin only)
+    export: GET /books/export/?format=ndjson|csv - Stream the filtered catalog (authenticated)
     """
 
     queryset = Book.objects.all()
     serializer_class = BookSerializer
     permission_classes = (IsAdminOrReadOnly,)
+    filter_backends = (
+        DjangoFilterBackend,
+        BookSearchFilter,
+        BookFuzzySearchFilter,
+        BookOrderingFilter,
+    )
     filterset_class = BookFilter
     search_fields = ("title", "author", "isbn")
-    ordering_fields = ("title", "author", "created_at", "page_count")
-    ordering = ("-created_at",)
+    ordering_fields = (
+        "title",
+        "author",
+        "created_at",
+        "page_count",
+        "total_loans",
+        "active_loans",
+    )
+    ordering = ("-created_at", "id")
+    # Reads are throttled at this scope's rate instead of the anon/user rates
+    throttle_scope = "books_read"
+
+    def get_throttles(self) -> list:
+        """Throttle reads with the looser ``books_read`` scope, writes with the defaults."""
+        if self.request.method in SAFE_METHODS:
+            return [ScopedRateThrottle()]
+        return super().get_throttles()
+
+    @conditional_get("get_list_version")
+    def list(self, request, *args, **kwargs) -> Response:
+        """
+        List books from the list response cache.
+
+        Conditional requests are answered with 304 Not Modified before the
+        response is loaded. Responses are cached per normalised query string
+        and catalog version.
+        """
+        misses = []
+
+        def compute() -> dict:
+            misses.append(1)
+            response = self.get_list_response(
+                self.get_filtered_queryset(), self.get_serializer_class(), self.paginator, self
+            )
+            return {"data": response.data}
+
+        entry = get_or_compute(self.list_cache_key, compute, settings.BOOK_LIST_CACHE_TIMEOUT)
+        (book_list_cache_misses if misses else book_list_cache_hits).incr()
+        return Response(entry["data"])
+
+    @conditional_get("get_object_version")
+    def retrieve(self, request, *args, **kwargs) -> Response:
+        """
+        Get book details from the book cache.
+
+        Conditional requests are answered with 304 Not Modified. Books have no
+        object-level permissions, so cached details skip ``get_object()``.
+        """
+        entry = self.get_book_entry(**kwargs)
+        if entry is None:
+            return super().retrieve(request, *args, **kwargs)
+        data = entry["data"]
+        fields = self.get_sparse_fields()["fields"]
+        if fields is not None:
+            data = {name: value for name, value in data.items() if name in fields}
+        return Response(data)
+
+    def get_list_version(self, request, *args, **kwargs) -> tuple:
+        """
+        Return the version of the filtered book list.
+
+        The version is the list cache key, which embeds the catalog version
+        that changes on any book write (including deletes). The list's
+        Last-Modified date is the latest ``updated_at`` of the filtered books
+        or the time of the last catalog change, whichever is later, as a
+        deleted book (or one that left the filtered list) leaves no
+        ``updated_at`` behind. It is cached next to the response, so
+        validating a list takes one cache read and no serialization.
+        """
+
+        def compute() -> dict:
+            changed_at = get_catalog_changed_at()
+            aggregate = self.get_filtered_queryset().aggregate(last_modified=Max("updated_at"))
+            return {"last_modified": max(filter(None, (aggregate["last_modified"], changed_at)))}
+
+        self.list_cache_key = book_list_cache_key(request)
+        validators = get_or_compute(
+            f"{self.list_cache_key}:validators", compute, settings.BOOK_LIST_CACHE_TIMEOUT
+        )
+        return self.list_cache_key, validators["last_modified"]
+
+    def get_filtered_queryset(self):
+        """Return the filtered list queryset, filtering once per request."""
+        if getattr(self, "filtered_queryset", None) is None:
+            self.filtered_queryset = self.filter_queryset(self.get_queryset())
+        return self.filtered_queryset
+
+    def get_object_version(self, request, *args, **kwargs) -> tuple:
+        """Return the version of a single book, taken from its cached ``updated_at``."""
+        entry = self.get_book_entry(**kwargs)
+        if entry is None:
+            return None, None
+        return entry["updated_at"].isoformat(), entry["updated_at"]
+
+    def get_book_entry(self, **kwargs):
+        """Return the cached entry of the book in the URL, or ``None``."""
+        try:
+            pk = int(kwargs[self.lookup_url_kwarg or self.lookup_field])
+        except (TypeError, ValueError):
+            return None
+        return get_book_entry(pk)
 
     @action(
         detail=True,
@@ -47,10 +175,13 @@ class BookViewSet(viewsets.ModelViewSet):
         url_path="borrow",
         url_name="borrow",
     )
+    @idempotent
     def borrow(self, request, pk=None) -> Response:
         """
         Borrow a book. Book ID is taken from URL.
         POST /books/<id>/borrow/
+
+        Retries sending the same ``Idempotency-Key`` get the first response.
         """
         book = self.get_object()
         try:
@@ -73,10 +204,13 @@ class BookViewSet(viewsets.ModelViewSet):
         url_path="return",
         url_name="return_book",
     )
+    @idempotent
     def return_book(self, request, pk=None) -> Response:
         """
         Return a book. Book ID is taken from URL.
         POST /books/<id>/return/
+
+        Retries sending the same ``Idempotency-Key`` get the first response.
         """
         book = self.get_object()
         try:
@@ -111,6 +245,57 @@ class BookViewSet(viewsets.ModelViewSet):
             )
 
         book = self.get_object()
-        loans = Loan.objects.filter(book=book).order_by("-borrowed_at")
-        serializer = LoanSerializer(loans, many=True)
-        return Response(serializer.data)
+        paginator = LoanPagination()
+        queryset = self.narrow_queryset(
+            LoanHistory.objects.filter(book=book).select_related("user", "book"),
+            LoanSerializer,
+            ordering=paginator.ordering,
+        )
+        return self.get_list_response(queryset, LoanSerializer, paginator)
+
+    @action(
+        detail=False,
+        methods=["post"],
+        permission_classes=[IsAdminUser],
+        parser_classes=[CSVRowParser, NDJSONRowParser],
+        url_path="import",
+        url_name="import",
+    )
+    def import_books(self, request) -> Response:
+        """
+        Bulk import books from a streamed upload. Admin only.
+        POST /books/import/
+
+        Send ``text/csv`` with a header line or ``application/x-ndjson``, one
+        book (title, author, isbn, page_count) per row. Existing ISBNs are
+        updated. Responds with row counts and per-row validation errors.
+        """
+        report = BookImportService.import_books(request.data)
+        return Response(report, status=status.HTTP_200_OK)
+
+    @action(
+        detail=False,
+        methods=["get"],
+        permission_classes=[IsAuthenticated],
+        renderer_classes=[NDJSONRenderer, CSVRenderer],
+        url_path="export",
+        url_name="export",
+    )
+    def export(self, request) -> StreamingHttpResponse:
+        """
+        Stream the catalog as NDJSON (default) or CSV.
+        GET /books/export/?format=ndjson|csv
+
+        Honours the list filters, search and ordering. Rows are read with a
+        server-side cursor as plain values, bypassing the serializer.
+        """
+        fields = BookSerializer.Meta.fields
+        queryset = self.filter_queryset(self.get_queryset()).values_list(*fields)
+        chunk_size = settings.BOOK_EXPORT_CHUNK_SIZE
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            renderer.stream(fields, queryset.iterator(chunk_size=chunk_size), chunk_size),
+            content_type=f"{renderer.media_type}; charset={renderer.charset}",
+        )
+        response["Content-Disposition"] = f'attachment; filename="books.{renderer.format}"'
+        return response
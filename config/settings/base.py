@@ -25,6 +25,7 @@ INSTALLED_APPS: List[str] = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     # Third party
     "rest_framework",
     "rest_framework_simplejwt",
@@ -113,11 +114,9 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 # REST Framework Configuration
 REST_FRAMEWORK = {
-    "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
-    ),
+    "DEFAULT_AUTHENTICATION_CLASSES": ("users.authentication.ClaimsJWTAuthentication",),
     "DEFAULT_PERMISSION_CLASSES": ("rest_framework.permissions.IsAuthenticatedOrReadOnly",),
-    "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
+    "DEFAULT_PAGINATION_CLASS": "core.pagination.CursorOrPageNumberPagination",
     "PAGE_SIZE": 2,
     "DEFAULT_FILTER_BACKENDS": (
         "django_filters.rest_framework.DjangoFilterBackend",
@@ -126,15 +125,105 @@ REST_FRAMEWORK = {
     ),
     "DEFAULT_SCHEMA_CLASS": "rest_framework.schemas.coreapi.AutoSchema",
     "DEFAULT_THROTTLE_CLASSES": [
-        "rest_framework.throttling.AnonRateThrottle",
-        "rest_framework.throttling.UserRateThrottle",
+        "core.throttling.AnonRateThrottle",
+        "core.throttling.UserRateThrottle",
     ],
     "DEFAULT_THROTTLE_RATES": {
-        "anon": "100/hour",
-        "user": "1000/hour",
+        "anon": os.getenv("THROTTLE_ANON_RATE", "100/hour"),
+        "user": os.getenv("THROTTLE_USER_RATE", "1000/hour"),
+        # Per-view scopes (throttle_scope)
+        "login": os.getenv("THROTTLE_LOGIN_RATE", "10/minute"),
+        "books_read": os.getenv("THROTTLE_BOOKS_READ_RATE", "5000/hour"),
     },
 }
 
+# Caches shared by all workers (Redis) when REDIS_URL is set, otherwise
+# per-process memory. Throttle counters, token blacklists and idempotency
+# records are only enforced across workers with a shared cache.
+REDIS_URL = os.getenv("REDIS_URL")
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        },
+        "throttle": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+            "KEY_PREFIX": "throttle",
+        },
+    }
+else:
+    CACHES = {
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+        "throttle": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "throttle",
+        },
+    }
+
+# Cache holding the rate throttle counters
+THROTTLE_CACHE = "throttle"
+
+# Tables with at least this many rows report planner estimates instead of
+# COUNT(*) in unfiltered page number responses and admin changelists
+ESTIMATED_COUNT_THRESHOLD = int(os.getenv("ESTIMATED_COUNT_THRESHOLD", "100000"))
+
+# Book detail cache: shared cache timeout, in-process LRU tier size and TTL
+BOOK_CACHE_TIMEOUT = int(os.getenv("BOOK_CACHE_TIMEOUT", "300"))
+BOOK_CACHE_LOCAL_SIZE = int(os.getenv("BOOK_CACHE_LOCAL_SIZE", "1024"))
+BOOK_CACHE_LOCAL_TTL = float(os.getenv("BOOK_CACHE_LOCAL_TTL", "5"))
+# Book list response cache timeout
+BOOK_LIST_CACHE_TIMEOUT = int(os.getenv("BOOK_LIST_CACHE_TIMEOUT", "60"))
+
+# Catalog search
+# Minimum pg_trgm word similarity for ?fuzzy= matches on /books/
+BOOK_FUZZY_SEARCH_THRESHOLD = float(os.getenv("BOOK_FUZZY_SEARCH_THRESHOLD", "0.5"))
+
+# Bulk book import: rows upserted per statement and errors kept in the report
+BOOK_IMPORT_CHUNK_SIZE = int(os.getenv("BOOK_IMPORT_CHUNK_SIZE", "1000"))
+BOOK_IMPORT_MAX_ERRORS = int(os.getenv("BOOK_IMPORT_MAX_ERRORS", "100"))
+# Catalog export: rows fetched per server-side cursor round trip
+BOOK_EXPORT_CHUNK_SIZE = int(os.getenv("BOOK_EXPORT_CHUNK_SIZE", "2000"))
+
+# Maximum number of books in one POST /loans/batch/ request
+LOAN_BATCH_MAX_SIZE = int(os.getenv("LOAN_BATCH_MAX_SIZE", "50"))
+
+# How long responses to requests with an Idempotency-Key are replayed (seconds)
+IDEMPOTENCY_KEY_TTL = int(os.getenv("IDEMPOTENCY_KEY_TTL", "86400"))
+
+# Returned loans older than this many months are moved to the archive table
+# by the archive_loans management command
+LOAN_ARCHIVE_AFTER_MONTHS = int(os.getenv("LOAN_ARCHIVE_AFTER_MONTHS", "12"))
+
+# How long write requests reuse a process-local copy of the user row (seconds),
+# and how many users each process keeps
+AUTH_USER_CACHE_TTL = int(os.getenv("AUTH_USER_CACHE_TTL", "30"))
+AUTH_USER_CACHE_SIZE = int(os.getenv("AUTH_USER_CACHE_SIZE", "1024"))
+
+# How often each process syncs its filter of revoked access tokens (seconds),
+# how many recent revocations a new process loads, and how many revocations
+# one Bloom filter (an hour of token expiry) holds at its target error rate
+TOKEN_BLACKLIST_SYNC_INTERVAL = float(os.getenv("TOKEN_BLACKLIST_SYNC_INTERVAL", "2"))
+TOKEN_BLACKLIST_SYNC_BACKLOG = int(os.getenv("TOKEN_BLACKLIST_SYNC_BACKLOG", "100000"))
+TOKEN_BLACKLIST_BLOOM_CAPACITY = int(os.getenv("TOKEN_BLACKLIST_BLOOM_CAPACITY", "100000"))
+
+# Failed logins are counted per username and client address for this long
+# (seconds). The failure reaching the given count, and every one after it,
+# locks the username or address out for the base delay, doubled per failure
+# past the count, up to the maximum (seconds).
+LOGIN_GUARD_WINDOW = int(os.getenv("LOGIN_GUARD_WINDOW", "3600"))
+LOGIN_GUARD_USER_FAILURES = int(os.getenv("LOGIN_GUARD_USER_FAILURES", "5"))
+LOGIN_GUARD_IP_FAILURES = int(os.getenv("LOGIN_GUARD_IP_FAILURES", "20"))
+LOGIN_GUARD_BASE_DELAY = float(os.getenv("LOGIN_GUARD_BASE_DELAY", "1"))
+LOGIN_GUARD_MAX_DELAY = float(os.getenv("LOGIN_GUARD_MAX_DELAY", "900"))
+
+# Buffered updates of hot rows (e.g. last_login) are written at most this
+# many seconds late, or sooner once this many rows are pending; 0 writes
+# every update immediately
+WRITE_BEHIND_INTERVAL = float(os.getenv("WRITE_BEHIND_INTERVAL", "5"))
+WRITE_BEHIND_MAX_PENDING = int(os.getenv("WRITE_BEHIND_MAX_PENDING", "10000"))
+
 # JWT Configuration
 from datetime import timedelta
 
@@ -143,7 +232,8 @@ SIMPLE_JWT = {
     "REFRESH_TOKEN_LIFETIME": timedelta(days=7),
     "ROTATE_REFRESH_TOKENS": True,
     "BLACKLIST_AFTER_ROTATION": True,
-    "UPDATE_LAST_LOGIN": True,
+    # Written through the write-behind buffer by CustomTokenObtainPairSerializer
+    "UPDATE_LAST_LOGIN": False,
     "ALGORITHM": "HS256",
     "SIGNING_KEY": SECRET_KEY,
     "AUTH_HEADER_TYPES": ("Bearer",),
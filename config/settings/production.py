@@ -5,6 +5,8 @@ Production settings.
 import os
 from typing import List
 
+from django.core.exceptions import ImproperlyConfigured
+
 from .base import *  # noqa
 
 DEBUG = False
@@ -13,6 +15,15 @@ ALLOWED_HOSTS: List[str] = (
     os.getenv("ALLOWED_HOSTS", "").split(",") if os.getenv("ALLOWED_HOSTS") else []
 )
 
+# Revoked tokens (users.blacklist) and the markers that stop trusting the
+# claims of demoted or deactivated users (users.authentication) live in the
+# cache, so they only take effect in every worker when the cache is shared
+if not REDIS_URL:  # noqa: F405
+    raise ImproperlyConfigured(
+        "REDIS_URL must be set in production: the token blacklist and the "
+        "invalidation of token claims need a cache shared by all workers."
+    )
+
 # Security settings
 SECURE_SSL_REDIRECT = os.getenv("SECURE_SSL_REDIRECT", "False") == "True"
 SECURE_PROXY_SSL_HEADER = ("HTTP_X_FORWARDED_PROTO", "https")
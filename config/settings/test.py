@@ -41,5 +41,18 @@ SWAGGER_SETTINGS = {
     "USE_COMPAT_RENDERERS": False,
 }
 
+# Throttle counters in files, standing in for the Redis cache shared by workers
+CACHES = {
+    **CACHES,
+    "throttle": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": tempfile.mkdtemp(),
+    },
+}
+
+# Write buffered updates immediately, tests run in a transaction the
+# background flusher can't see
+WRITE_BEHIND_INTERVAL = 0
+
 # Use a temporary directory for static files during tests to avoid warnings
 STATIC_ROOT = Path(tempfile.mkdtemp())
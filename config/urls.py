@@ -9,6 +9,8 @@ from drf_yasg import openapi
 from drf_yasg.views import get_schema_view
 from rest_framework import permissions
 
+from core.views import metrics_view
+
 schema_view = get_schema_view(
     openapi.Info(
         title="Library Management System API",
@@ -27,6 +29,7 @@ urlpatterns = [
     path("auth/", include("users.urls")),
     path("books/", include("books.urls")),
     path("loans/", include("loans.urls")),
+    path("metrics/", metrics_view, name="metrics"),
     # Swagger documentation
     path("swagger/", schema_view.with_ui("swagger", cache_timeout=0), name="schema-swagger-ui"),
     path("swagger.json", schema_view.without_ui(cache_timeout=0), name="schema-json"),
@@ -0,0 +1,299 @@
+"""
+Cache helpers shared across apps.
+"""
+
+import hashlib
+import math
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Iterable, Optional
+
+from django.core.cache import cache
+from django.http import QueryDict
+from django.utils.http import urlencode
+
+
+def normalize_query(params: QueryDict, comma_separated: Iterable[str] = ("ordering",)) -> str:
+    """
+    Return a canonical query string for use in cache keys.
+
+    Parameters are sorted by name, empty values are dropped and whitespace
+    around the items of ``comma_separated`` parameters is removed, so
+    equivalent requests share one cache entry.
+    """
+    items = []
+    for name, values in sorted(params.lists()):
+        for value in values:
+            value = value.strip()
+            if name in comma_separated:
+                value = ",".join(part.strip() for part in value.split(",") if part.strip())
+            if value:
+                items.append((name, value))
+    return urlencode(items)
+
+
+def get_version(key: str, timeout: Optional[float] = None) -> int:
+    """
+    Return the current value of a version counter.
+
+    Missing counters are initialised from the clock rather than from zero, so a
+    counter that was evicted (or expired after ``timeout`` seconds) never
+    repeats a value handed out before.
+    """
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns() // 1000, timeout=timeout)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key: str, timeout: Optional[float] = None) -> int:
+    """Advance a version counter, invalidating everything derived from it."""
+    try:
+        return cache.incr(key)
+    except ValueError:
+        get_version(key, timeout)
+        return cache.incr(key)
+
+
+# Single-flight recomputation: how long the recompute lock is held at most,
+# how long other callers wait for a missing value, and how long an expired
+# value can still be served while it is being recomputed.
+LOCK_TIMEOUT = 10
+LOCK_WAIT = 0.5
+LOCK_POLL_INTERVAL = 0.02
+STALE_GRACE = 30
+# Probabilistic early refresh aggressiveness (1.0 is the usual XFetch value)
+EARLY_REFRESH_BETA = 1.0
+
+
+def should_refresh(envelope: dict, now: float, beta: float = EARLY_REFRESH_BETA) -> bool:
+    """
+    Decide whether a cached value should be recomputed now.
+
+    Implements probabilistic early expiration (XFetch): the closer a value is
+    to its expiry, and the longer it took to compute, the more likely a reader
+    recomputes it ahead of time, so hot keys don't all expire at once.
+    """
+    jitter = -envelope["delta"] * beta * math.log(1.0 - random.random())
+    return now + jitter >= envelope["expires_at"]
+
+
+def get_or_compute(key: str, compute: Callable[[], Any], timeout: int) -> Any:
+    """
+    Return the cached value for ``key``, recomputing it at most once at a time.
+
+    Values are stored with their logical expiry and compute time, and kept
+    ``STALE_GRACE`` seconds past expiry. When a value is due (or picked for
+    early refresh), the caller that wins a short-lived lock recomputes it.
+    Everyone else gets the stale value or, if there is none, waits up to
+    ``LOCK_WAIT`` seconds for the winner before computing it themselves.
+    ``None`` results are not cached.
+    """
+    envelope = cache.get(key)
+    if envelope is not None and not should_refresh(envelope, time.time()):
+        return envelope["value"]
+
+    lock_key = f"{key}:lock"
+    if cache.add(lock_key, 1, LOCK_TIMEOUT):
+        try:
+            return _compute_and_store(key, compute, timeout)
+        finally:
+            cache.delete(lock_key)
+
+    if envelope is not None:
+        return envelope["value"]
+
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        envelope = cache.get(key)
+        if envelope is not None:
+            return envelope["value"]
+    return _compute_and_store(key, compute, timeout)
+
+
+def _compute_and_store(key: str, compute: Callable[[], Any], timeout: int) -> Any:
+    started = time.time()
+    value = compute()
+    finished = time.time()
+    if value is not None:
+        envelope = {"value": value, "delta": finished - started, "expires_at": finished + timeout}
+        cache.set(key, envelope, timeout + STALE_GRACE)
+    return value
+
+
+class LocalLRUCache:
+    """
+    Small thread-safe, in-process LRU cache with a per-entry TTL.
+
+    Used as a first tier in front of the shared Django cache. Entries are only
+    invalidated in the process that performed the write, so the TTL bounds how
+    long other processes can serve a stale entry.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        """Return the cached value, or ``None`` if it is missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        """Store a value for ``ttl`` seconds, evicting the least recently used entry."""
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        """Remove a value."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Remove all values."""
+        with self._lock:
+            self._entries.clear()
+
+
+class BloomFilter:
+    """
+    In-process Bloom filter over strings.
+
+    Answers "definitely not added" without false negatives, and "possibly
+    added" with a false positive rate of about ``error_rate`` while at most
+    ``capacity`` items were added. Items can't be removed; drop the filter
+    instead.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001) -> None:
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str) -> list:
+        # Double hashing: position i is h1 + i * h2 (Kirsch and Mitzenmacher)
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item: str) -> None:
+        """Add an item."""
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(
+            self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item)
+        )
+
+
+class TieredCache:
+    """
+    Read-through cache with an in-process LRU tier in front of the Django cache.
+
+    ``get_or_load`` looks in the local tier, then in the shared cache, and
+    finally calls ``loader``; found values are copied into the faster tiers.
+    Shared cache misses are recomputed single-flight by ``get_or_compute``.
+    ``None`` results from the loader are not cached.
+
+    With ``versioned``, shared entries are keyed by a version counter per
+    key, which ``delete`` advances instead of deleting the entry. A value
+    loaded before an invalidation then lands under the old version, where
+    nobody looks for it, rather than replacing the fresh entry. Counters
+    expire with the entries they version (and restart from the clock). Each
+    process remembers the last version it saw per key, so a local miss reads
+    the counter and that version's entry in one round trip; only values
+    confirmed current that way are copied into the local tier.
+    """
+
+    def __init__(
+        self, prefix: str, maxsize: int, timeout: int, local_ttl: float, versioned: bool = False
+    ) -> None:
+        self.prefix = prefix
+        self.timeout = timeout
+        self.local_ttl = local_ttl
+        self.versioned = versioned
+        self.version_timeout = timeout + STALE_GRACE
+        self.local = LocalLRUCache(maxsize)
+        self.known_versions = LocalLRUCache(maxsize)
+
+    def make_key(self, key: Any) -> str:
+        """Return the cache key for ``key``."""
+        return f"{self.prefix}:{key}"
+
+    def version_key(self, key: Any) -> str:
+        """Return the cache key of the version counter of ``key``."""
+        return f"{self.prefix}:version:{key}"
+
+    def get_or_load(self, key: Any, loader: Callable[[], Any]) -> Any:
+        """Return the cached value for ``key``, loading and caching it on a miss."""
+        cache_key = self.make_key(key)
+        value = self.local.get(cache_key)
+        if value is not None:
+            return value
+        if not self.versioned:
+            value = get_or_compute(cache_key, loader, self.timeout)
+            if value is not None:
+                self.local.set(cache_key, value, self.local_ttl)
+            return value
+
+        version_key = self.version_key(key)
+        version = None
+        known = self.known_versions.get(cache_key)
+        if known is not None:
+            found = cache.get_many([version_key, f"{cache_key}:{known}"])
+            version = found.get(version_key)
+            envelope = found.get(f"{cache_key}:{known}")
+            if (
+                version == known
+                and envelope is not None
+                and not should_refresh(envelope, time.time())
+            ):
+                self.local.set(cache_key, envelope["value"], self.local_ttl)
+                return envelope["value"]
+
+        if version is None:
+            version = get_version(version_key, self.version_timeout)
+        self.known_versions.set(cache_key, version, self.version_timeout)
+        return get_or_compute(f"{cache_key}:{version}", loader, self.timeout)
+
+    def delete(self, key: Any) -> None:
+        """Invalidate ``key`` in both tiers."""
+        cache_key = self.make_key(key)
+        self.local.delete(cache_key)
+        if self.versioned:
+            bump_version(self.version_key(key), self.version_timeout)
+        else:
+            cache.delete(cache_key)
+
+    def delete_many(self, keys: Iterable) -> None:
+        """
+        Invalidate many keys in both tiers, with one shared cache round trip.
+
+        Version counters are deleted rather than advanced; they restart from
+        the clock, past the versions handed out before.
+        """
+        keys = list(keys)
+        for key in keys:
+            self.local.delete(self.make_key(key))
+        if self.versioned:
+            cache.delete_many([self.version_key(key) for key in keys])
+        else:
+            cache.delete_many([self.make_key(key) for key in keys])
@@ -0,0 +1,60 @@
+"""
+Conditional GET support for API views.
+"""
+
+import hashlib
+from functools import wraps
+from typing import Callable
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from .cache import normalize_query
+
+
+def conditional_get(validators: str, per_user: bool = False) -> Callable:
+    """
+    Answer conditional GETs on a view method with ``304 Not Modified``.
+
+    ``validators`` names a view method that takes the method's arguments and
+    returns a ``(version, last_modified)`` pair built from cheap version
+    markers, ``last_modified`` being a ``datetime`` or ``None``. The ETag is a
+    hash of the version, the request path, the normalised query string and the
+    accepted renderer (plus the user for ``per_user`` views), so
+    ``If-None-Match`` / ``If-Modified-Since`` are answered before the queryset
+    is evaluated or serialized. A ``None`` version skips conditional handling.
+    """
+
+    def decorator(method: Callable) -> Callable:
+        @wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            version, last_modified = getattr(view, validators)(request, *args, **kwargs)
+            if version is None:
+                return method(view, request, *args, **kwargs)
+
+            parts = [
+                request.path,
+                normalize_query(request.query_params),
+                request.accepted_renderer.format,
+                version,
+            ]
+            if per_user:
+                parts.append(str(request.user.pk))
+            etag = quote_etag(hashlib.md5("|".join(parts).encode()).hexdigest())
+            timestamp = int(last_modified.timestamp()) if last_modified else None
+
+            response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+            if response is None:
+                response = method(view, request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+            response.headers["ETag"] = etag
+            if timestamp is not None:
+                response.headers["Last-Modified"] = http_date(timestamp)
+            if per_user:
+                patch_vary_headers(response, ("Authorization",))
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,253 @@
+"""
+Database helpers shared across apps.
+"""
+
+from typing import Optional, Sequence
+
+from django.contrib.postgres.indexes import PostgresIndex
+from django.contrib.postgres.operations import AddIndexConcurrently, RemoveIndexConcurrently
+from django.db import connections, migrations, router
+from django.db.models import QuerySet
+from django.db.models.sql import UpdateQuery
+
+
+def estimated_count(queryset: QuerySet) -> Optional[int]:
+    """
+    Return the planner's row estimate for an unfiltered queryset.
+
+    Reads ``pg_class.reltuples`` for the model's table, which is maintained by
+    ``ANALYZE``/autovacuum and costs a single catalog lookup. Returns ``None``
+    when no estimate applies: on other databases, for querysets that filter,
+    slice, deduplicate or combine rows, and for tables that were never analyzed.
+    """
+    query = queryset.query
+    if query.where or query.is_sliced or query.distinct or query.combinator:
+        return None
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return None
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT reltuples FROM pg_class WHERE oid = %s::regclass",
+            [connection.ops.quote_name(queryset.model._meta.db_table)],
+        )
+        row = cursor.fetchone()
+    if row is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+def update_returning(queryset: QuerySet, returning: Sequence[str], **values) -> list:
+    """
+    Update the rows of ``queryset`` and return fields of the updated rows.
+
+    Like ``QuerySet.update()`` but with a ``RETURNING`` clause (PostgreSQL,
+    SQLite 3.35+), so an update and the read of what it changed take a single
+    statement. Returned values are converted like model field values.
+
+    Returns:
+        One dict of ``returning`` field values per updated row
+    """
+    model = queryset.model
+    connection = connections[queryset.db]
+    query = queryset.query.chain(UpdateQuery)
+    query.add_update_values(values)
+    compiler = query.get_compiler(queryset.db)
+    compiler.pre_sql_setup()
+    update_sql, params = compiler.as_sql()
+
+    columns = [model._meta.get_field(name).get_col(model._meta.db_table) for name in returning]
+    converters = [
+        connection.ops.get_db_converters(column) + column.get_db_converters(connection)
+        for column in columns
+    ]
+    columns_sql = ", ".join(connection.ops.quote_name(column.target.column) for column in columns)
+    with connection.cursor() as cursor:
+        cursor.execute(f"{update_sql} RETURNING {columns_sql}", params)
+        rows = cursor.fetchall()
+
+    results = []
+    for row in rows:
+        result = {}
+        for name, column, functions, value in zip(returning, columns, converters, row):
+            for convert in functions:
+                value = convert(value, column, connection)
+            result[name] = value
+        results.append(result)
+    return results
+
+
+def upsert_add(model, unique_fields: Sequence[str], rows: Sequence[dict]) -> None:
+    """
+    Insert ``rows``, adding their values to the row already stored on conflict.
+
+    Issues a single ``INSERT ... ON CONFLICT ... DO UPDATE`` (PostgreSQL,
+    SQLite 3.24+), so concurrent writers of the same row never lose an
+    increment. Every field of the rows that isn't in ``unique_fields`` is
+    added to the stored value.
+    """
+    if not rows:
+        return
+    connection = connections[router.db_for_write(model)]
+    quote = connection.ops.quote_name
+    fields = [model._meta.get_field(name) for name in rows[0]]
+    table = quote(model._meta.db_table)
+    columns = ", ".join(quote(field.column) for field in fields)
+    conflict = ", ".join(quote(model._meta.get_field(name).column) for name in unique_fields)
+    added = ", ".join(
+        f"{quote(field.column)} = {table}.{quote(field.column)} + EXCLUDED.{quote(field.column)}"
+        for field in fields
+        if field.name not in unique_fields
+    )
+    values = ", ".join([f"({', '.join(['%s'] * len(fields))})"] * len(rows))
+    params = [
+        field.get_db_prep_value(row[field.name], connection, prepared=False)
+        for row in rows
+        for field in fields
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} ({columns}) VALUES {values} "
+            f"ON CONFLICT ({conflict}) DO UPDATE SET {added}",
+            params,
+        )
+
+
+def update_from_values(model, field_name: str, values: dict, add: bool = False) -> int:
+    """
+    Set (or with ``add``, add to) one field of many rows in a single statement.
+
+    Issues ``UPDATE ... FROM (VALUES (pk, value), ...)`` (PostgreSQL, SQLite
+    3.33+) instead of one ``UPDATE`` per row.
+
+    Args:
+        values: The new value (or the amount to add) per primary key
+
+    Returns:
+        The number of rows updated
+    """
+    if not values:
+        return 0
+    connection = connections[router.db_for_write(model)]
+    quote = connection.ops.quote_name
+    pk = model._meta.pk
+    field = model._meta.get_field(field_name)
+    table = quote(model._meta.db_table)
+    column = quote(field.column)
+    if connection.vendor == "postgresql":
+        # Parameters in VALUES have no type to infer
+        pk_type, field_type = pk.cast_db_type(connection), field.cast_db_type(connection)
+        row = f"(CAST(%s AS {pk_type}), CAST(%s AS {field_type}))"
+    else:
+        row = "(%s, %s)"
+    new_value = f"{table}.{column} + v.column2" if add else "v.column2"
+    params = []
+    for key in sorted(values):
+        params.append(pk.get_db_prep_value(key, connection, prepared=False))
+        params.append(field.get_db_prep_value(values[key], connection, prepared=False))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {table} SET {column} = {new_value} "
+            f"FROM (VALUES {', '.join([row] * len(values))}) AS v "
+            f"WHERE {table}.{quote(pk.column)} = v.column1",
+            params,
+        )
+        return cursor.rowcount
+
+
+class PostgresOnlyOperationMixin:
+    """
+    Run a schema operation on PostgreSQL only.
+
+    The migration state is always updated, so the models keep describing the
+    production schema, but the DDL is skipped on other backends (e.g. the
+    SQLite database used by the test suite).
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state) -> None:
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state) -> None:
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class PostgresOnlyAddIndex(PostgresOnlyOperationMixin, AddIndexConcurrently):
+    """
+    Concurrent ``AddIndex`` for PostgreSQL-specific indexes (GIN, expression indexes).
+
+    Like every concurrent index operation, it needs a migration with
+    ``atomic = False``.
+    """
+
+
+class PortableConcurrentOperationMixin:
+    """
+    Run a concurrent index operation without blocking writes on PostgreSQL.
+
+    ``CREATE``/``DROP INDEX CONCURRENTLY`` only takes a lock that lets
+    writes to the table continue while the index is built. Other backends
+    have no such option and run the plain operation instead. Migrations
+    using these operations must set ``atomic = False``.
+    """
+
+    plain_operation = None
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state) -> None:
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+        else:
+            self.plain_operation.database_forwards(
+                self, app_label, schema_editor, from_state, to_state
+            )
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state) -> None:
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+        else:
+            self.plain_operation.database_backwards(
+                self, app_label, schema_editor, from_state, to_state
+            )
+
+
+class PortableAddIndexConcurrently(PortableConcurrentOperationMixin, AddIndexConcurrently):
+    """``AddIndexConcurrently`` on PostgreSQL, ``AddIndex`` elsewhere."""
+
+    plain_operation = migrations.AddIndex
+
+
+class PortableRemoveIndexConcurrently(PortableConcurrentOperationMixin, RemoveIndexConcurrently):
+    """``RemoveIndexConcurrently`` on PostgreSQL, ``RemoveIndex`` elsewhere."""
+
+    plain_operation = migrations.RemoveIndex
+
+
+class PortableAddField(migrations.AddField):
+    """
+    ``AddField`` for tables that have PostgreSQL-specific indexes.
+
+    SQLite adds ``NOT NULL`` columns by rebuilding the table, which recreates
+    every index of the model, including the GIN indexes that were never
+    created there (see ``PostgresOnlyAddIndex``). On other backends those
+    indexes are left out of the rebuild.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state) -> None:
+        if schema_editor.connection.vendor != "postgresql":
+            from_state = self.without_postgres_indexes(app_label, from_state)
+            to_state = self.without_postgres_indexes(app_label, to_state)
+        super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def without_postgres_indexes(self, app_label: str, state):
+        """Return a copy of ``state`` without the model's PostgreSQL-specific indexes."""
+        state = state.clone()
+        model_state = state.models[app_label, self.model_name_lower]
+        model_state.options["indexes"] = [
+            index
+            for index in model_state.options.get("indexes", [])
+            if not isinstance(index, PostgresIndex)
+        ]
+        state.reload_model(app_label, self.model_name_lower, delay=True)
+        return state
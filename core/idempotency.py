@@ -0,0 +1,86 @@
+"""
+Idempotency key support for unsafe API views.
+"""
+
+import hashlib
+import json
+from functools import wraps
+from typing import Callable
+
+from django.conf import settings
+from django.core.cache import cache
+
+from rest_framework import status
+from rest_framework.response import Response
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+# Longest accepted key, and how long a request may hold its key in flight
+MAX_KEY_LENGTH = 255
+LOCK_TIMEOUT = 30
+
+
+def idempotent(method: Callable) -> Callable:
+    """
+    Replay the stored response of a view method for repeated ``Idempotency-Key``s.
+
+    Requests without the header are handled as usual. The first response
+    for a key (per user, method and path) is stored for
+    ``IDEMPOTENCY_KEY_TTL`` seconds, unless it is a server error, and
+    repeated requests get it back with an ``Idempotent-Replayed: true``
+    header without running the view again. Reusing a key for a different
+    payload is rejected with 422, and a repeat arriving while the first
+    request is still running gets 409.
+    """
+
+    @wraps(method)
+    def wrapper(view, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if key is None:
+            return method(view, request, *args, **kwargs)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {"error": f"{IDEMPOTENCY_HEADER} must be 1 to {MAX_KEY_LENGTH} characters long."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        scope = f"{request.user.pk}|{request.method}|{request.path}|{key}"
+        cache_key = f"idempotency:{hashlib.md5(scope.encode()).hexdigest()}"
+        payload = json.dumps(request.data, sort_keys=True, default=str)
+        fingerprint = hashlib.md5(payload.encode()).hexdigest()
+
+        stored = cache.get(cache_key)
+        if stored is None:
+            lock_key = f"{cache_key}:lock"
+            if not cache.add(lock_key, 1, LOCK_TIMEOUT):
+                return Response(
+                    {"error": f"A request with this {IDEMPOTENCY_HEADER} is in progress."},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            try:
+                # The first request may have finished between the read and the lock
+                stored = cache.get(cache_key)
+                if stored is None:
+                    response = method(view, request, *args, **kwargs)
+                    if response.status_code < 500:
+                        stored = {
+                            "fingerprint": fingerprint,
+                            "status": response.status_code,
+                            "data": response.data,
+                        }
+                        # Never replace a stored response, e.g. if the lock expired
+                        cache.add(cache_key, stored, settings.IDEMPOTENCY_KEY_TTL)
+                    return response
+            finally:
+                cache.delete(lock_key)
+
+        if stored["fingerprint"] != fingerprint:
+            return Response(
+                {"error": f"This {IDEMPOTENCY_HEADER} was used with a different request."},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        response = Response(stored["data"], status=stored["status"])
+        response.headers[REPLAYED_HEADER] = "true"
+        return response
+
+    return wrapper
@@ -0,0 +1,48 @@
+"""
+Process-shared counters for operational metrics.
+"""
+
+from typing import Dict
+
+from django.core.cache import cache
+
+_registry: Dict[str, "Counter"] = {}
+
+
+class Counter:
+    """
+    Monotonic counter stored in the Django cache.
+
+    Counters are shared by all processes using the same cache backend and are
+    reset when the cache is flushed.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.key = f"metrics:{name}"
+
+    def incr(self, delta: int = 1) -> None:
+        """Increase the counter."""
+        cache.add(self.key, 0, timeout=None)
+        try:
+            cache.incr(self.key, delta)
+        except ValueError:
+            # Evicted between add() and incr(); losing one increment is fine.
+            pass
+
+    def value(self) -> int:
+        """Return the current value."""
+        return cache.get(self.key, 0)
+
+
+def counter(name: str) -> Counter:
+    """Return the counter registered under ``name``, creating it if needed."""
+    if name not in _registry:
+        _registry[name] = Counter(name)
+    return _registry[name]
+
+
+def snapshot() -> Dict[str, int]:
+    """Return the current value of every registered counter."""
+    values = cache.get_many([c.key for c in _registry.values()])
+    return {name: values.get(c.key, 0) for name, c in sorted(_registry.items())}
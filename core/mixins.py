@@ -0,0 +1,130 @@
+"""
+Mixins shared by the API viewsets.
+"""
+
+from rest_framework.response import Response
+
+from .serializers import DynamicFieldsMixin, compile_serializer, parse_field_list
+
+# Actions whose querysets are narrowed to the requested fields
+SPARSE_FIELDS_ACTIONS = ("list", "retrieve")
+
+
+class SparseFieldsMixin:
+    """
+    Viewset mixin passing ``?fields=`` and ``?expand=`` to the serializer.
+
+    For list and retrieve, the queryset only selects the relations and loads
+    the columns the serializer renders (plus the ordering fields, which
+    cursor pagination reads). Only those actions pass the parameters to
+    serializers using ``DynamicFieldsMixin``: writes always validate and
+    render every field.
+    """
+
+    fields_query_param = "fields"
+    expand_query_param = "expand"
+
+    def get_sparse_fields(self) -> dict:
+        """Return the ``fields`` and ``expand`` serializer arguments of the request."""
+        params = self.request.query_params
+        return {
+            "fields": parse_field_list(params.get(self.fields_query_param)),
+            "expand": parse_field_list(params.get(self.expand_query_param)),
+        }
+
+    def get_serializer(self, *args, **kwargs):
+        if self.action in SPARSE_FIELDS_ACTIONS and issubclass(
+            self.get_serializer_class(), DynamicFieldsMixin
+        ):
+            for name, value in self.get_sparse_fields().items():
+                kwargs.setdefault(name, value)
+        return super().get_serializer(*args, **kwargs)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action in SPARSE_FIELDS_ACTIONS:
+            queryset = self.narrow_queryset(queryset, self.get_serializer_class())
+        return queryset
+
+    def narrow_queryset(self, queryset, serializer_class, ordering=None):
+        """
+        Select and load only what ``serializer_class`` renders for this request.
+
+        ``ordering`` lists the fields the results may be ordered by; it
+        defaults to the view's ``ordering`` and the ``ordering`` parameter.
+        """
+        serializer = serializer_class(**self.get_sparse_fields())
+        select_related, only = serializer.get_query_plan()
+        queryset = queryset.select_related(None)
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        if only is not None:
+            if ordering is None:
+                ordering = [
+                    *(getattr(self, "ordering", None) or ()),
+                    *(parse_field_list(self.request.query_params.get("ordering")) or ()),
+                ]
+            concrete = {field.name for field in queryset.model._meta.concrete_fields}
+            ordering = {field.lstrip("-") for field in ordering} & concrete
+            queryset = queryset.only(*only, *ordering)
+        return queryset
+
+
+class CompiledListMixin(SparseFieldsMixin):
+    """
+    Viewset mixin rendering list responses from ``values()`` rows.
+
+    Lists are serialized with the ``CompiledSerializer`` of the view's
+    serializer (for the requested fields), falling back to the serializer
+    itself when it can't be compiled. Writes and details keep using the
+    serializer, including its validation.
+    """
+
+    def list(self, request, *args, **kwargs) -> Response:
+        queryset = self.filter_queryset(self.get_queryset())
+        return self.get_list_response(queryset, self.get_serializer_class(), self.paginator, self)
+
+    def get_list_response(self, queryset, serializer_class, paginator=None, view=None) -> Response:
+        """
+        Return the (paginated) list response for ``queryset``.
+
+        ``view`` is passed on to the paginator; it selects the ordering from
+        the view's ordering filter, as in the regular list action.
+        """
+        sparse = {
+            name: None if value is None else tuple(value)
+            for name, value in self.get_sparse_fields().items()
+        }
+        compiled = compile_serializer(serializer_class, **sparse)
+
+        if compiled is not None:
+            lookups = self.get_ordering_lookups(queryset, paginator, view)
+            objects = compiled.values(queryset, lookups)
+        else:
+            objects = queryset
+
+        page = None
+        if paginator is not None:
+            page = paginator.paginate_queryset(objects, self.request, view=view)
+        if page is not None:
+            objects = page
+
+        if compiled is not None:
+            data = [compiled.to_representation(row) for row in objects]
+        else:
+            context = self.get_serializer_context()
+            data = serializer_class(objects, many=True, context=context, **sparse).data
+
+        if page is not None:
+            return paginator.get_paginated_response(data)
+        return Response(data)
+
+    def get_ordering_lookups(self, queryset, paginator, view) -> list:
+        """Return the fields the paginator orders by, which cursor pagination reads."""
+        get_ordering = getattr(paginator, "get_ordering", None)
+        if get_ordering is None:
+            return []
+        names = {field.name for field in queryset.model._meta.concrete_fields}
+        names.update(queryset.query.annotations)
+        ordering = (field.lstrip("-") for field in get_ordering(self.request, queryset, view))
+        return [field for field in ordering if field in names]
@@ -0,0 +1,224 @@
+"""
+Pagination classes shared by the API endpoints.
+"""
+
+import json
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+
+from rest_framework import pagination
+from rest_framework.exceptions import NotFound
+
+from .db import estimated_count
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that trusts the planner's row estimate for large tables.
+
+    For unfiltered querysets over tables with at least
+    ``ESTIMATED_COUNT_THRESHOLD`` rows the count comes from
+    ``pg_class.reltuples`` instead of a ``COUNT(*)`` over the whole table, and
+    ``count_is_estimate`` is set. Smaller tables and filtered querysets are
+    counted exactly.
+    """
+
+    count_is_estimate = False
+
+    @cached_property
+    def count(self) -> int:
+        """Return the estimated or exact number of objects."""
+        if isinstance(self.object_list, QuerySet):
+            estimate = estimated_count(self.object_list)
+            if estimate is not None and estimate >= settings.ESTIMATED_COUNT_THRESHOLD:
+                self.count_is_estimate = True
+                return estimate
+        return super().count
+
+    def page(self, number):
+        """Return a page, without trimming the last page to an estimated count."""
+        number = self.validate_number(number)
+        if not self.count_is_estimate:
+            return super().page(number)
+        bottom = (number - 1) * self.per_page
+        return self._get_page(self.object_list[bottom : bottom + self.per_page], number, self)
+
+
+class PageNumberPagination(pagination.PageNumberPagination):
+    """
+    Page number pagination with a client-controlled, capped page size.
+
+    Counts of large unfiltered tables are estimated, which is reported in the
+    ``count_is_estimate`` response field.
+    """
+
+    django_paginator_class = EstimatedCountPaginator
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+    def get_paginated_response(self, data):
+        """Add the ``count_is_estimate`` flag to the paginated response."""
+        response = super().get_paginated_response(data)
+        response.data["count_is_estimate"] = self.page.paginator.count_is_estimate
+        return response
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema["properties"]["count_is_estimate"] = {"type": "boolean", "example": False}
+        return response_schema
+
+
+class KeysetCursorPagination(pagination.CursorPagination):
+    """
+    Cursor pagination keyed on every ordering column.
+
+    DRF's ``CursorPagination`` keys the cursor on the first ordering field only
+    and skips ties with an ``OFFSET``. Here the cursor stores the values of all
+    ordering fields of the boundary row and the next page is selected with a
+    keyset comparison, so every page is an index range scan no matter how deep
+    it is. ``id`` is appended to the ordering as a unique tie-breaker.
+    """
+
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    ordering = ("-id",)
+    tie_breaker = "id"
+
+    def get_ordering(self, request, queryset, view) -> tuple:
+        """Return the view ordering, made unique with the tie-breaker."""
+        ordering = super().get_ordering(request, queryset, view)
+        if not any(field.lstrip("-") in (self.tie_breaker, "pk") for field in ordering):
+            ordering = (*ordering, self.tie_breaker)
+        return ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Return the page of results following (or preceding) the cursor."""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+
+        reverse = bool(self.cursor and self.cursor.reverse)
+        ordering = pagination._reverse_ordering(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if self.cursor is not None and self.cursor.position is not None:
+            queryset = queryset.filter(self.get_keyset_filter(ordering, self.cursor.position))
+
+        # Fetch one extra row to find out whether there is another page.
+        results = list(queryset[: self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[: self.page_size]
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def get_keyset_filter(self, ordering: tuple, position: str) -> Q:
+        """
+        Build the filter selecting rows strictly after ``position``.
+
+        For an ordering ``(-a, b)`` this is ``a <= pa AND (a < pa OR (a = pa
+        AND b > pb))``. The redundant bound on the leading column lets the
+        database start the index range scan at the cursor.
+        """
+        try:
+            values = json.loads(position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        fields = [(field.lstrip("-"), field.startswith("-")) for field in ordering]
+        keyset = Q()
+        equal = Q()
+        for (name, descending), value in zip(fields, values):
+            keyset |= equal & Q(**{f"{name}__{'lt' if descending else 'gt'}": value})
+            equal &= Q(**{name: value})
+
+        leading, descending = fields[0]
+        return Q(**{f"{leading}__{'lte' if descending else 'gte'}": values[0]}) & keyset
+
+    def get_next_link(self):
+        """Return the link to the page after the current one."""
+        if not self.has_next or not self.page:
+            return None
+        position = self._get_position_from_instance(self.page[-1], self.ordering)
+        return self.encode_cursor(pagination.Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        """Return the link to the page before the current one."""
+        if not self.has_previous or not self.page:
+            return None
+        position = self._get_position_from_instance(self.page[0], self.ordering)
+        return self.encode_cursor(pagination.Cursor(offset=0, reverse=True, position=position))
+
+    def _get_position_from_instance(self, instance, ordering) -> str:
+        values = []
+        for field in ordering:
+            name = field.lstrip("-")
+            value = instance[name] if isinstance(instance, dict) else getattr(instance, name)
+            values.append(str(value))
+        return json.dumps(values)
+
+
+class CursorOrPageNumberPagination(KeysetCursorPagination):
+    """
+    Keyset cursor pagination with an opt-in page number mode.
+
+    Clients that send a ``page`` parameter get the classic page number
+    response (including ``count``); everyone else gets cursor pagination.
+    """
+
+    page_number_class = PageNumberPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Paginate with page numbers if requested, otherwise with a cursor."""
+        self.page_number_paginator = None
+        if self.page_number_class.page_query_param in request.query_params:
+            self.page_number_paginator = self.page_number_class()
+            page = self.page_number_paginator.paginate_queryset(queryset, request, view)
+            self.display_page_controls = self.page_number_paginator.display_page_controls
+            return page
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        """Return the paginated response for the mode that was used."""
+        if self.page_number_paginator is not None:
+            return self.page_number_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def to_html(self):
+        """Render the page controls for the mode that was used."""
+        if self.page_number_paginator is not None:
+            return self.page_number_paginator.to_html()
+        return super().to_html()
+
+    def get_schema_fields(self, view):
+        return super().get_schema_fields(view) + [
+            field
+            for field in self.page_number_class().get_schema_fields(view)
+            if field.name == self.page_number_class.page_query_param
+        ]
+
+    def get_schema_operation_parameters(self, view):
+        return super().get_schema_operation_parameters(view) + [
+            parameter
+            for parameter in self.page_number_class().get_schema_operation_parameters(view)
+            if parameter["name"] == self.page_number_class.page_query_param
+        ]
@@ -0,0 +1,224 @@
+"""
+Serializer helpers shared by the API endpoints.
+"""
+
+from functools import lru_cache
+from typing import Callable, Optional
+
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+# Serializer fields whose representation of a database value is the value itself
+IDENTITY_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.IntegerField,
+    serializers.PrimaryKeyRelatedField,
+)
+
+
+def parse_field_list(value: Optional[str]) -> Optional[list]:
+    """Split a comma-separated query parameter, returning ``None`` if it is absent."""
+    if value is None:
+        return None
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+
+class DynamicFieldsMixin:
+    """
+    ModelSerializer mixin for sparse fieldsets and relation expansion.
+
+    ``fields`` limits the output to the listed fields. Relations named in
+    ``expandable_fields`` are rendered with their serializer when listed in
+    ``expand`` (or in ``default_expand`` if ``expand`` isn't given) and as
+    bare primary keys otherwise. Dotted names such as ``book.title`` select
+    fields of a relation and imply expanding it.
+
+    ``get_query_plan()`` returns the ``select_related()`` and ``only()``
+    arguments needed to render the selected fields. Fields that don't read a
+    model field of the same name declare the fields they read in
+    ``field_dependencies``.
+    """
+
+    expandable_fields: dict = {}
+    default_expand: tuple = ()
+    field_dependencies: dict = {}
+    # Database expressions computing fields that aren't model columns, used
+    # by CompiledSerializer
+    value_expressions: dict = {}
+
+    def __init__(
+        self, *args, fields: Optional[list] = None, expand: Optional[list] = None, **kwargs
+    ):
+        super().__init__(*args, **kwargs)
+        self.selected_fields = None
+        self.nested_fields = {}
+        self.expand = set(self.default_expand if expand is None else expand)
+        for name in fields if fields is not None else ():
+            relation, _, nested = name.partition(".")
+            if nested:
+                self.nested_fields.setdefault(relation, []).append(nested)
+                self.expand.add(relation)
+        if fields is not None:
+            self.selected_fields = {name.partition(".")[0] for name in fields}
+
+    def get_fields(self) -> dict:
+        fields = super().get_fields()
+        for name, serializer_class in self.expandable_fields.items():
+            if name not in fields:
+                continue
+            if name in self.expand:
+                fields[name] = serializer_class(read_only=True, fields=self.nested_fields.get(name))
+            else:
+                fields[name] = serializers.PrimaryKeyRelatedField(read_only=True)
+        if self.selected_fields is not None:
+            for name in set(fields) - self.selected_fields:
+                del fields[name]
+        return fields
+
+    def get_query_plan(self, prefix: str = "") -> tuple:
+        """
+        Return the relations to select and the model fields to load.
+
+        Returns:
+            ``(select_related, only)`` lists of lookups; ``only`` is ``None``
+            if a field reads something that can't be expressed as a lookup
+        """
+        model = self.Meta.model
+        concrete = {field.name for field in model._meta.concrete_fields}
+        select_related = []
+        only = [f"{prefix}{model._meta.pk.name}"]
+        for name, field in self.fields.items():
+            if isinstance(field, DynamicFieldsMixin):
+                select_related.append(f"{prefix}{field.source}")
+                nested_related, nested_only = field.get_query_plan(f"{prefix}{field.source}__")
+                select_related.extend(nested_related)
+                if nested_only is None or only is None:
+                    only = None
+                else:
+                    only.extend(nested_only)
+                continue
+            dependencies = self.field_dependencies.get(name, (field.source,))
+            if only is None or not set(dependencies) <= concrete:
+                only = None
+            else:
+                only.extend(f"{prefix}{dependency}" for dependency in dependencies)
+        return select_related, None if only is None else list(dict.fromkeys(only))
+
+
+def get_formatter(field: serializers.Field) -> Optional[Callable]:
+    """
+    Return a function formatting non-null database values like ``field``.
+
+    Returns ``None`` when values are represented as they are. ISO 8601
+    datetimes are formatted without DRF's per-call settings lookups.
+    """
+    if isinstance(field, IDENTITY_FIELDS):
+        return None
+    if not isinstance(field, serializers.DateTimeField):
+        return field.to_representation
+
+    output_format = getattr(field, "format", api_settings.DATETIME_FORMAT)
+    field_timezone = field.timezone if hasattr(field, "timezone") else field.default_timezone()
+    if output_format is None or output_format.lower() != ISO_8601 or field_timezone is None:
+        return field.to_representation
+
+    def format_datetime(value) -> str:
+        if isinstance(value, str) or value.tzinfo is None:
+            return field.to_representation(value)
+        value = value.astimezone(field_timezone).isoformat()
+        if value.endswith("+00:00"):
+            value = value[:-6] + "Z"
+        return value
+
+    return format_datetime
+
+
+class CompiledSerializer:
+    """
+    Read-only serializer over ``values()`` rows.
+
+    Compiled from a ``DynamicFieldsMixin`` serializer, it precomputes the
+    lookups to fetch and one getter per output field, and renders rows as
+    plain dicts equal to the serializer output. This skips the per-field
+    dispatch of ``Serializer.to_representation`` for large lists.
+
+    Use ``compile_serializer()`` to build one; it returns ``None`` for
+    serializers with fields that can't be read from ``values()`` rows.
+    """
+
+    def __init__(self, serializer, prefix: str = ""):
+        model = serializer.Meta.model
+        concrete = {field.name for field in model._meta.concrete_fields}
+        self.pk_lookup = f"{prefix}{model._meta.pk.name}"
+        self.lookups = [self.pk_lookup]
+        self.expressions = {}
+        self.getters = []
+
+        for name, field in serializer.fields.items():
+            if isinstance(field, DynamicFieldsMixin):
+                nested = CompiledSerializer(field, f"{prefix}{field.source}__")
+                if nested.expressions:
+                    raise ValueError(f"Nested field {name} uses value expressions.")
+                self.lookups.extend(nested.lookups)
+                self.getters.append((name, nested.get_nested))
+                continue
+
+            if name in serializer.value_expressions and not prefix:
+                key = f"_{name}"
+                self.expressions[key] = serializer.value_expressions[name]
+            elif field.source in concrete:
+                key = f"{prefix}{field.source}"
+                self.lookups.append(key)
+            else:
+                raise ValueError(f"Field {name} can't be read from values() rows.")
+            self.getters.append((name, self.make_getter(key, get_formatter(field))))
+
+        self.lookups = list(dict.fromkeys(self.lookups))
+
+    @staticmethod
+    def make_getter(key: str, formatter: Optional[Callable]) -> Callable:
+        if formatter is None:
+            return lambda row: row[key]
+
+        def get(row: dict):
+            value = row[key]
+            return None if value is None else formatter(value)
+
+        return get
+
+    def get_nested(self, row: dict) -> Optional[dict]:
+        """Render a nested relation, or ``None`` if the row has no related object."""
+        if row[self.pk_lookup] is None:
+            return None
+        return self.to_representation(row)
+
+    def values(self, queryset, extra_lookups=()):
+        """
+        Return ``queryset`` as rows holding the fields to render.
+
+        ``extra_lookups`` (such as ordering fields read by cursor pagination)
+        are fetched as well but not rendered.
+        """
+        lookups = [lookup for lookup in extra_lookups if lookup not in self.lookups]
+        return queryset.values(*self.lookups, *lookups, **self.expressions)
+
+    def to_representation(self, row: dict) -> dict:
+        return {name: get(row) for name, get in self.getters}
+
+
+@lru_cache(maxsize=256)
+def compile_serializer(
+    serializer_class, fields: Optional[tuple] = None, expand: Optional[tuple] = None
+) -> Optional[CompiledSerializer]:
+    """
+    Compile ``serializer_class`` for the given sparse fields and expansions.
+
+    Results are cached per arguments. Returns ``None`` if the serializer
+    can't be compiled.
+    """
+    serializer = serializer_class(fields=fields, expand=expand)
+    try:
+        return CompiledSerializer(serializer)
+    except ValueError:
+        return None
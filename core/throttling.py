@@ -0,0 +1,62 @@
+"""
+Rate throttles backed by counters in the shared throttle cache.
+"""
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.connection import ConnectionProxy
+
+from rest_framework import throttling
+
+
+class CounterRateThrottle(throttling.SimpleRateThrottle):
+    """
+    Fixed-window rate throttle with one counter per client and window.
+
+    DRF's throttles keep a list of request timestamps per client and rewrite
+    it on every request, in a cache that is per process unless configured
+    otherwise. Here each request is a single atomic ``incr`` of the counter of
+    the current window in the ``THROTTLE_CACHE`` cache, which is shared by
+    all workers when ``REDIS_URL`` is set, so the configured rate holds for
+    the whole deployment. A client can send up to twice the rate across a
+    window boundary.
+    """
+
+    cache = ConnectionProxy(caches, settings.THROTTLE_CACHE)
+
+    def allow_request(self, request, view) -> bool:
+        """Count the request in the current window and check it is within the rate."""
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = self.timer()
+        window = int(self.now // self.duration)
+        self.window_end = (window + 1) * self.duration
+        key = f"{self.key}:{window}"
+        self.cache.add(key, 0, timeout=self.duration + 1)
+        try:
+            count = self.cache.incr(key)
+        except ValueError:
+            # Evicted between add and incr
+            self.cache.set(key, 1, timeout=self.duration + 1)
+            count = 1
+        return count <= self.num_requests
+
+    def wait(self) -> float:
+        """Return the seconds until the current window ends."""
+        return max(0.0, self.window_end - self.now)
+
+
+class AnonRateThrottle(throttling.AnonRateThrottle, CounterRateThrottle):
+    """Limits anonymous clients by IP address (``anon`` rate)."""
+
+
+class UserRateThrottle(throttling.UserRateThrottle, CounterRateThrottle):
+    """Limits authenticated users by id, anonymous ones by IP address (``user`` rate)."""
+
+
+class ScopedRateThrottle(throttling.ScopedRateThrottle, CounterRateThrottle):
+    """Limits clients per ``throttle_scope`` of the view, at that scope's rate."""
@@ -0,0 +1,19 @@
+"""
+Operational API endpoints.
+"""
+
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+
+from .metrics import snapshot
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def metrics_view(request) -> Response:
+    """
+    Get operational counters (cache hits and misses, etc.). Admin only.
+    GET /metrics/
+    """
+    return Response(snapshot())
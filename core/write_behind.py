@@ -0,0 +1,149 @@
+"""
+Write-behind buffer for frequent updates of single fields of hot rows.
+"""
+
+import atexit
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+from django.db import connections
+
+from .db import update_from_values
+
+logger = logging.getLogger(__name__)
+
+# Rows written per UPDATE statement
+FLUSH_BATCH_SIZE = 500
+
+
+class WriteBehindBuffer:
+    """
+    Per-process buffer of field updates, written to the database in batches.
+
+    Updates that don't need to be read back immediately, like ``last_login``
+    or view counters, are collected in memory instead of issuing one
+    ``UPDATE`` per request. A background thread writes them every
+    ``WRITE_BEHIND_INTERVAL`` seconds, one ``UPDATE ... FROM (VALUES ...)``
+    per field and batch (see ``core.db.update_from_values``), so the database
+    lags by at most about that long. The thread is woken early once
+    ``WRITE_BEHIND_MAX_PENDING`` rows are pending, and the buffer is flushed
+    when the process exits. With an interval of 0 every update is written
+    immediately.
+
+    Set updates keep the latest value per row, add updates sum their deltas.
+    Updates that fail to be written are kept and retried with the next flush.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._pending: Dict[Tuple, dict] = {}
+        self._size = 0
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+
+    def set(self, model, pk, field: str, value) -> None:
+        """Buffer setting a field of a row; the latest value wins."""
+        self._record((model, field, False), pk, value)
+
+    def add(self, model, pk, field: str, delta) -> None:
+        """Buffer adding to a numeric field of a row."""
+        self._record((model, field, True), pk, delta)
+
+    def pending(self) -> int:
+        """Return the number of rows with buffered updates."""
+        with self._lock:
+            return self._size
+
+    def flush(self) -> int:
+        """
+        Write the buffered updates.
+
+        Returns:
+            The number of rows updated
+
+        Raises:
+            DatabaseError: if a batch failed; the updates not written are kept
+        """
+        with self._lock:
+            pending, self._pending, self._size = self._pending, {}, 0
+
+        updated = 0
+        targets = list(pending.items())
+        for index, ((model, field, add), values) in enumerate(targets):
+            keys = sorted(values)
+            for start in range(0, len(keys), FLUSH_BATCH_SIZE):
+                batch = {key: values[key] for key in keys[start : start + FLUSH_BATCH_SIZE]}
+                try:
+                    updated += update_from_values(model, field, batch, add=add)
+                except Exception:
+                    unwritten = [((model, field, add), {key: values[key] for key in keys[start:]})]
+                    self._restore(unwritten + targets[index + 1 :])
+                    raise
+        return updated
+
+    def stop(self) -> None:
+        """Stop the background thread and write what is still buffered."""
+        flusher = self._flusher
+        if flusher is not None and flusher.is_alive():
+            self._stopping.set()
+            self._wakeup.set()
+            flusher.join()
+        self._flusher = None
+        self._stopping.clear()
+        self.flush()
+
+    def _record(self, target: Tuple, pk, value) -> None:
+        with self._lock:
+            values = self._pending.setdefault(target, {})
+            if pk not in values:
+                self._size += 1
+            values[pk] = values.get(pk, 0) + value if target[2] else value
+            full = self._size >= settings.WRITE_BEHIND_MAX_PENDING
+
+        if settings.WRITE_BEHIND_INTERVAL <= 0:
+            self.flush()
+            return
+        self._start()
+        if full:
+            self._wakeup.set()
+
+    def _restore(self, targets: list) -> None:
+        """Put back updates that weren't written, under those buffered since."""
+        with self._lock:
+            for (model, field, add), values in targets:
+                newer = self._pending.setdefault((model, field, add), {})
+                for pk, value in values.items():
+                    if pk not in newer:
+                        self._size += 1
+                        newer[pk] = value
+                    elif add:
+                        newer[pk] += value
+
+    def _start(self) -> None:
+        with self._lock:
+            # Not alive in a process forked after it was started
+            if self._flusher is not None and self._flusher.is_alive():
+                return
+            self._flusher = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self._flusher.start()
+        atexit.unregister(self.stop)
+        atexit.register(self.stop)
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(settings.WRITE_BEHIND_INTERVAL)
+            self._wakeup.clear()
+            if self._stopping.is_set():
+                return
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Write-behind flush failed, retrying with the next flush")
+            finally:
+                connections.close_all()
+
+
+write_behind = WriteBehindBuffer()
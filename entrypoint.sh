@@ -4,4 +4,9 @@ set -e
 python manage.py migrate --noinput
 python manage.py collectstatic --noinput
 
-exec gunicorn config.wsgi:application --bind 0.0.0.0:${PORT:-8000} --workers 3
+# Threaded workers: a long streaming response (e.g. /books/export/) occupies
+# one thread instead of a whole worker, and isn't killed by the worker timeout
+exec gunicorn config.wsgi:application --bind 0.0.0.0:${PORT:-8000} \
+    --workers ${GUNICORN_WORKERS:-3} \
+    --worker-class gthread --threads ${GUNICORN_THREADS:-4} \
+    --timeout ${GUNICORN_TIMEOUT:-120}
@@ -1,5 +1,7 @@
 from django.contrib import admin
 
+from core.pagination import EstimatedCountPaginator
+
 from .models import Loan
 
 
@@ -12,3 +14,5 @@ class LoanAdmin(admin.ModelAdmin):
     search_fields = ("user__username", "book__title", "book__author")
     readonly_fields = ("borrowed_at",)
     date_hierarchy = "borrowed_at"
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
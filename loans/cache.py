@@ -0,0 +1,20 @@
+"""
+Cache keys and version markers for loans.
+"""
+
+from core.cache import bump_version, get_version
+
+
+def user_loans_version_key(user_id: int) -> str:
+    """Return the cache key of a user's loans version."""
+    return f"loans:user:{user_id}:version"
+
+
+def get_user_loans_version(user_id: int) -> int:
+    """Return the version of a user's loans, which changes on every loan write."""
+    return get_version(user_loans_version_key(user_id))
+
+
+def bump_user_loans_version(user_id: int) -> int:
+    """Advance a user's loans version after one of their loans was written."""
+    return bump_version(user_loans_version_key(user_id))
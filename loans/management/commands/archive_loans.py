@@ -0,0 +1,81 @@
+"""
+Move old returned loans from the loans table to the archive.
+"""
+
+import calendar
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from loans.models import ArchivedLoan, Loan
+
+ARCHIVED_FIELDS = ("id", "user_id", "book_id", "borrowed_at", "returned_at")
+
+
+def months_ago(now: datetime, months: int) -> datetime:
+    """Return ``now`` shifted back by whole calendar months, clamping the day."""
+    year, month = divmod(now.year * 12 + now.month - 1 - months, 12)
+    day = min(now.day, calendar.monthrange(year, month + 1)[1])
+    return now.replace(year=year, month=month + 1, day=day)
+
+
+def archive_batch(cutoff: datetime, batch_size: int) -> int:
+    """Move one batch of loans returned before ``cutoff``; return how many moved."""
+    with transaction.atomic():
+        rows = list(
+            Loan.objects.filter(returned_at__lt=cutoff)
+            .order_by("id")
+            .values(*ARCHIVED_FIELDS)[:batch_size]
+        )
+        if not rows:
+            return 0
+        ArchivedLoan.objects.bulk_create([ArchivedLoan(**row) for row in rows])
+        Loan.objects.filter(pk__in=[row["id"] for row in rows]).delete()
+    return len(rows)
+
+
+class Command(BaseCommand):
+    help = (
+        "Move loans returned more than LOAN_ARCHIVE_AFTER_MONTHS months ago to the archive "
+        "table, in batches of bounded size."
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            "--months",
+            type=int,
+            default=settings.LOAN_ARCHIVE_AFTER_MONTHS,
+            help="Archive loans returned more than this many months ago.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of loans moved per transaction.",
+        )
+        parser.add_argument(
+            "--max-batches",
+            type=int,
+            default=None,
+            help="Stop after this many batches (default: until nothing is left).",
+        )
+
+    def handle(self, *args, **options) -> None:
+        cutoff = months_ago(timezone.now(), options["months"])
+        batches = 0
+        archived = 0
+        while options["max_batches"] is None or batches < options["max_batches"]:
+            moved = archive_batch(cutoff, options["batch_size"])
+            if not moved:
+                break
+            batches += 1
+            archived += moved
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Archived {archived} loans returned before {cutoff:%Y-%m-%d} "
+                f"in {batches} batches."
+            )
+        )
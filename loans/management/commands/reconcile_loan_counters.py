@@ -0,0 +1,89 @@
+"""
+Recompute the circulation counters of books and users from the loans.
+"""
+
+from functools import reduce
+from operator import or_
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Q, QuerySet, Subquery
+from django.db.models.functions import Coalesce
+
+from books.models import Book
+from loans.models import Loan, LoanHistory
+
+User = get_user_model()
+
+
+def count_per_row(queryset: QuerySet, field: str) -> Coalesce:
+    """Return an expression counting the rows of ``queryset`` whose ``field`` is the outer row."""
+    counts = (
+        queryset.filter(**{field: OuterRef("pk")})
+        .order_by()
+        .values(field)
+        .annotate(count=Count("*"))
+        .values("count")
+    )
+    return Coalesce(Subquery(counts), 0)
+
+
+def reconcile(queryset: QuerySet, counters: dict, batch_size: int) -> int:
+    """
+    Set ``counters`` on every row of ``queryset``, one batch of rows at a time.
+
+    Each batch is locked before it is recounted, so borrows and returns of
+    those rows wait for the batch instead of having their counter updates
+    overwritten. Only rows whose counters drifted are written.
+
+    Returns:
+        Number of rows that were corrected
+    """
+    drifted = reduce(or_, (~Q(**{name: value}) for name, value in counters.items()))
+    queryset = queryset.order_by("pk")
+    corrected = 0
+    last = None
+    while True:
+        batch = queryset if last is None else queryset.filter(pk__gt=last)
+        ids = list(batch.values_list("pk", flat=True)[:batch_size])
+        if not ids:
+            return corrected
+        with transaction.atomic():
+            list(queryset.filter(pk__in=ids).select_for_update().values_list("pk"))
+            corrected += queryset.filter(drifted, pk__in=ids).update(**counters)
+        last = ids[-1]
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute Book.total_loans, Book.active_loans and User.active_loan_count from the "
+        "loans, in batches, fixing any counters that drifted."
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of books or users recounted per transaction.",
+        )
+
+    def handle(self, *args, **options) -> None:
+        active = Loan.objects.filter(returned_at__isnull=True)
+        books = reconcile(
+            Book.objects.all(),
+            {
+                "total_loans": count_per_row(LoanHistory.objects.all(), "book"),
+                "active_loans": count_per_row(active, "book"),
+            },
+            options["batch_size"],
+        )
+        users = reconcile(
+            User.objects.all(),
+            {"active_loan_count": count_per_row(active, "user")},
+            options["batch_size"],
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"Corrected the counters of {books} books and {users} users.")
+        )
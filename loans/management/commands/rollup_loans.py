@@ -0,0 +1,45 @@
+"""
+Rebuild the daily circulation rollups from the loans.
+"""
+
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from loans.services import LoanStatsService
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the daily loan rollups of a range of days from the loans, one day per "
+        "transaction. Defaults to yesterday; use --since to backfill."
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            "--since",
+            type=date.fromisoformat,
+            default=None,
+            help="First day to rebuild (YYYY-MM-DD, default: yesterday).",
+        )
+        parser.add_argument(
+            "--until",
+            type=date.fromisoformat,
+            default=None,
+            help="Last day to rebuild (YYYY-MM-DD, default: yesterday).",
+        )
+
+    def handle(self, *args, **options) -> None:
+        yesterday = timezone.localdate() - timedelta(days=1)
+        since = options["since"] or yesterday
+        until = options["until"] or yesterday
+        if since > until:
+            raise CommandError("--since must not be after --until.")
+
+        day = since
+        rows = 0
+        while day <= until:
+            rows += LoanStatsService.rebuild_day(day)
+            day += timedelta(days=1)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} rollups for {since} to {until}."))
@@ -0,0 +1,29 @@
+# Generated by Django 6.0 on 2026-10-16 13:05
+
+from django.db import migrations, models
+
+import core.db
+
+
+class Migration(migrations.Migration):
+    # Indexes are built concurrently, outside a transaction
+    atomic = False
+
+    dependencies = [
+        ("loans", "0002_initial"),
+    ]
+
+    operations = [
+        core.db.PortableAddIndexConcurrently(
+            model_name="loan",
+            index=models.Index(
+                fields=["user", "-borrowed_at", "id"], name="loans_user_borrowed_idx"
+            ),
+        ),
+        core.db.PortableAddIndexConcurrently(
+            model_name="loan",
+            index=models.Index(
+                fields=["book", "-borrowed_at", "id"], name="loans_book_borrowed_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 6.0 on 2026-10-16 15:20
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.utils import timezone
+
+
+def close_duplicate_active_loans(apps, schema_editor):
+    """
+    Return all but the earliest active loan of each book.
+
+    Before borrowing claimed the copy atomically, concurrent borrows could
+    lend it twice, and those rows would fail the constraint below. The later
+    loans are closed as returned now.
+    """
+    Loan = apps.get_model("loans", "Loan")
+    active = Loan.objects.using(schema_editor.connection.alias).filter(returned_at__isnull=True)
+    duplicated = (
+        active.values("book").annotate(count=Count("id")).filter(count__gt=1).values_list("book")
+    )
+    later = []
+    for (book_id,) in duplicated:
+        ids = active.filter(book_id=book_id).order_by("borrowed_at", "id").values_list("id", flat=True)
+        later.extend(list(ids)[1:])
+    if later:
+        active.filter(pk__in=later).update(returned_at=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("loans", "0003_cursor_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(close_duplicate_active_loans, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="loan",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("returned_at__isnull", True)),
+                fields=("book",),
+                name="loans_one_active_per_book",
+            ),
+        ),
+    ]
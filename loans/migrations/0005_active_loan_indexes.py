@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-10-16 16:05
+
+from django.db import migrations, models
+
+import core.db
+
+
+class Migration(migrations.Migration):
+    # Indexes are built concurrently, outside a transaction
+    atomic = False
+
+    dependencies = [
+        ("loans", "0004_active_loan_constraint"),
+    ]
+
+    operations = [
+        core.db.PortableRemoveIndexConcurrently(
+            model_name="loan",
+            name="loans_user_id_c50bf4_idx",
+        ),
+        core.db.PortableRemoveIndexConcurrently(
+            model_name="loan",
+            name="loans_book_id_ea0a0e_idx",
+        ),
+        core.db.PortableAddIndexConcurrently(
+            model_name="loan",
+            index=models.Index(
+                condition=models.Q(("returned_at__isnull", True)),
+                fields=["user", "book"],
+                name="loans_user_active_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 6.0 on 2026-10-16 16:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+LOAN_HISTORY_VIEW = """
+CREATE VIEW loan_history AS
+SELECT id, user_id, book_id, borrowed_at, returned_at FROM loans
+UNION ALL
+SELECT id, user_id, book_id, borrowed_at, returned_at FROM loans_archive
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("books", "0005_book_updated_at_index"),
+        ("loans", "0005_active_loan_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchivedLoan",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("borrowed_at", models.DateTimeField()),
+                ("returned_at", models.DateTimeField()),
+                (
+                    "book",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="archived_loans",
+                        to="books.book",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="archived_loans",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "loans_archive",
+                "ordering": ["-borrowed_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["user", "-borrowed_at", "id"], name="loans_archive_user_idx"
+                    ),
+                    models.Index(
+                        fields=["book", "-borrowed_at", "id"], name="loans_archive_book_idx"
+                    ),
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="LoanHistory",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("borrowed_at", models.DateTimeField()),
+                ("returned_at", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "db_table": "loan_history",
+                "ordering": ["-borrowed_at"],
+                "managed": False,
+            },
+        ),
+        migrations.RunSQL(LOAN_HISTORY_VIEW, "DROP VIEW loan_history"),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 6.0 on 2026-10-16 19:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("books", "0006_book_loan_counters"),
+        ("loans", "0006_loan_archive"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LoanDailyRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("day", models.DateField()),
+                ("borrows", models.PositiveIntegerField(default=0)),
+                ("returns", models.PositiveIntegerField(default=0)),
+                (
+                    "book",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_rollups",
+                        to="books.book",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "loans_daily_rollup",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("day", "book"), name="loans_rollup_day_book"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -24,9 +24,81 @@ class Loan(models.Model):
         db_table = "loans"
         ordering = ["-borrowed_at"]
         indexes = [
-            models.Index(fields=["user", "returned_at"]),
-            models.Index(fields=["book", "returned_at"]),
+            # Loan history paging, newest first
+            models.Index(fields=["user", "-borrowed_at", "id"], name="loans_user_borrowed_idx"),
+            models.Index(fields=["book", "-borrowed_at", "id"], name="loans_book_borrowed_idx"),
+            # Active loans of a user (and of a user for a book); returned
+            # loans are left out, so the index only grows with circulation
+            models.Index(
+                fields=["user", "book"],
+                condition=models.Q(returned_at__isnull=True),
+                name="loans_user_active_idx",
+            ),
         ]
+        constraints = [
+            # A copy can only be lent once at a time; also the index for the
+            # active loan of a book
+            models.UniqueConstraint(
+                fields=["book"],
+                condition=models.Q(returned_at__isnull=True),
+                name="loans_one_active_per_book",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        status = "returned" if self.returned_at else "borrowed"
+        return f"{self.user.username} - {self.book.title} ({status})"
+
+    @property
+    def is_active(self) -> bool:
+        """Check if the loan is currently active."""
+        return self.returned_at is None
+
+
+class ArchivedLoan(models.Model):
+    """
+    Returned loan moved out of the ``loans`` table by ``archive_loans``.
+
+    Archived loans keep their original ids, so they stay unique across both
+    tables and cursor positions in loan histories remain valid.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="archived_loans")
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name="archived_loans")
+    borrowed_at = models.DateTimeField()
+    returned_at = models.DateTimeField()
+
+    class Meta:
+        db_table = "loans_archive"
+        ordering = ["-borrowed_at"]
+        indexes = [
+            models.Index(fields=["user", "-borrowed_at", "id"], name="loans_archive_user_idx"),
+            models.Index(fields=["book", "-borrowed_at", "id"], name="loans_archive_book_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.user.username} - {self.book.title} (archived)"
+
+
+class LoanHistory(models.Model):
+    """
+    Read-only view of all loans: the ``loans`` table plus the archive.
+
+    Backed by the ``loan_history`` database view (a ``UNION ALL`` of both
+    tables), so loan histories include archived loans.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.DO_NOTHING, related_name="+")
+    book = models.ForeignKey(Book, on_delete=models.DO_NOTHING, related_name="+")
+    borrowed_at = models.DateTimeField()
+    returned_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        managed = False
+        db_table = "loan_history"
+        ordering = ["-borrowed_at"]
 
     def __str__(self) -> str:
         status = "returned" if self.returned_at else "borrowed"
@@ -36,3 +108,28 @@ class Loan(models.Model):
     def is_active(self) -> bool:
         """Check if the loan is currently active."""
         return self.returned_at is None
+
+
+class LoanDailyRollup(models.Model):
+    """
+    Borrows and returns of a book on one day.
+
+    Kept up to date by ``LoanService`` with every borrow and return, and
+    rebuilt from the loans by the ``rollup_loans`` command. Circulation
+    statistics are read from here instead of grouping the loans.
+    """
+
+    day = models.DateField()
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name="daily_rollups")
+    borrows = models.PositiveIntegerField(default=0)
+    returns = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = "loans_daily_rollup"
+        constraints = [
+            # Also the index for date range scans
+            models.UniqueConstraint(fields=["day", "book"], name="loans_rollup_day_book"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.day} - {self.book_id}: {self.borrows} borrows, {self.returns} returns"
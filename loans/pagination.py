@@ -0,0 +1,11 @@
+"""
+Pagination for Loan endpoints.
+"""
+
+from core.pagination import CursorOrPageNumberPagination
+
+
+class LoanPagination(CursorOrPageNumberPagination):
+    """Pagination for loan listings and loan histories, newest loans first."""
+
+    ordering = ("-borrowed_at", "id")
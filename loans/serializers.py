@@ -2,21 +2,69 @@
 Serializers for Loan model.
 """
 
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import BooleanField, ExpressionWrapper, Q
+from django.utils import timezone
+
 from rest_framework import serializers
 
 from books.serializers import BookSerializer
+from core.serializers import DynamicFieldsMixin
 from users.serializers import UserSerializer
 
 from .models import Loan
+from .services import LoanStatsService
+
 
+class LoanSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    """
+    Serializer for Loan model.
 
-class LoanSerializer(serializers.ModelSerializer):
-    """Serializer for Loan model."""
+    The user and the book are nested unless ``expand`` says otherwise; the
+    relations that aren't expanded are rendered as ids.
+    """
 
     user = UserSerializer(read_only=True)
     book = BookSerializer(read_only=True)
 
+    expandable_fields = {"user": UserSerializer, "book": BookSerializer}
+    default_expand = ("user", "book")
+    field_dependencies = {"is_active": ("returned_at",)}
+    value_expressions = {
+        "is_active": ExpressionWrapper(Q(returned_at__isnull=True), output_field=BooleanField())
+    }
+
     class Meta:
         model = Loan
         fields = ("id", "user", "book", "borrowed_at", "returned_at", "is_active")
         read_only_fields = ("id", "borrowed_at", "returned_at", "is_active")
+
+
+class LoanBatchSerializer(serializers.Serializer):
+    """Serializer for batch borrow and return requests."""
+
+    action = serializers.ChoiceField(choices=("borrow", "return"))
+    book_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        min_length=1,
+        max_length=settings.LOAN_BATCH_MAX_SIZE,
+    )
+
+
+class LoanStatsQuerySerializer(serializers.Serializer):
+    """Serializer for the query parameters of circulation statistics."""
+
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    granularity = serializers.ChoiceField(choices=LoanStatsService.GRANULARITIES, default="day")
+    top = serializers.IntegerField(min_value=1, max_value=100, default=10)
+
+    def validate(self, attrs: dict) -> dict:
+        """Default to the last 30 days and check the range is in order."""
+        attrs.setdefault("end", timezone.localdate())
+        attrs.setdefault("start", attrs["end"] - timedelta(days=29))
+        if attrs["start"] > attrs["end"]:
+            raise serializers.ValidationError({"start": "Start must not be after end."})
+        return attrs
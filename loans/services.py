@@ -2,19 +2,51 @@
 Business logic services for Loan operations.
 """
 
+from datetime import date, datetime, time, timedelta
+
 from django.contrib.auth import get_user_model
-from django.db import transaction
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DateField, F, Sum
+from django.db.models.functions import Greatest, Trunc
 from django.utils import timezone
 
 from books.models import Book
+from books.signals import invalidate_book_caches
+from core.db import update_returning, upsert_add
 
-from .models import Loan
+from .models import Loan, LoanDailyRollup, LoanHistory
+from .signals import invalidate_user_loans
 
 User = get_user_model()
 
+# Counter columns updated with every borrow
+BORROW_COUNTERS = {
+    "total_loans": F("total_loans") + 1,
+    "active_loans": F("active_loans") + 1,
+}
+
+# Counter columns updated with every return; never below zero, so counters
+# that drifted low can't make returns fail until they are reconciled
+RETURN_COUNTERS = {
+    "active_loans": Greatest(F("active_loans") - 1, 0),
+}
+
 
 class LoanService:
-    """Service class for loan-related business logic."""
+    """
+    Service class for loan-related business logic.
+
+    Borrowing and returning don't read before they write: the book is
+    claimed or released with a conditional ``UPDATE`` that only matches
+    in the expected state, so concurrent requests can't lend a copy twice.
+    The ``loans_one_active_per_book`` constraint backs this up in the
+    database. Queryset updates send no signals, so caches are invalidated
+    explicitly.
+
+    The circulation counters (``Book.total_loans``, ``Book.active_loans``
+    and ``User.active_loan_count``) are adjusted with ``F()`` expressions
+    in the same statements and transaction as the loans they count.
+    """
 
     @staticmethod
     @transaction.atomic
@@ -32,22 +64,32 @@ class LoanService:
         Raises:
             ValueError: If book is unavailable or user already has an active loan for this book
         """
-        # Check if user already has an active loan for this book
-        active_loan = Loan.objects.filter(user=user, book=book, returned_at__isnull=True).first()
-        if active_loan:
-            raise ValueError(
-                f'You already have an active loan for "{book.title}".' "Please return it first."
-            )
+        now = timezone.now()
+        # Claim the copy; only one concurrent borrower can match is_available
+        claimed = update_returning(
+            Book.objects.filter(pk=book.pk, is_available=True),
+            tuple(BORROW_COUNTERS),
+            is_available=False,
+            updated_at=now,
+            **BORROW_COUNTERS,
+        )
+        if not claimed:
+            raise LoanService.unavailable_error(user, book)
 
-        # Check if book is available
-        if not book.is_available:
-            raise ValueError(f'Book "{book.title}" is not available for borrowing.')
+        try:
+            with transaction.atomic():
+                loan = Loan.objects.create(user=user, book=book)
+        except IntegrityError:
+            # The copy was flagged available while an active loan existed
+            raise LoanService.unavailable_error(user, book)
 
-        # Create loan and mark book as unavailable
-        loan = Loan.objects.create(user=user, book=book)
+        LoanService.count_active_loans(user, 1)
+        LoanStatsService.record(now, [book.pk], borrows=1)
         book.is_available = False
-        book.save(update_fields=["is_available"])
-
+        book.updated_at = now
+        book.total_loans = claimed[0]["total_loans"]
+        book.active_loans = claimed[0]["active_loans"]
+        invalidate_book_caches(book.pk)
         return loan
 
     @staticmethod
@@ -66,16 +108,342 @@ class LoanService:
         Raises:
             ValueError: If user doesn't have an active loan for this book
         """
-        # Find active loan
-        loan = Loan.objects.filter(user=user, book=book, returned_at__isnull=True).first()
-        if not loan:
+        now = timezone.now()
+        # Close the active loan; a concurrent return of the same loan matches nothing
+        returned = update_returning(
+            Loan.objects.filter(user=user, book=book, returned_at__isnull=True),
+            ("id", "borrowed_at"),
+            returned_at=now,
+        )
+        if not returned:
             raise ValueError(f'You do not have an active loan for "{book.title}".')
 
-        # Mark loan as returned and make book available
-        loan.returned_at = timezone.now()
-        loan.save(update_fields=["returned_at"])
-
+        released = update_returning(
+            Book.objects.filter(pk=book.pk),
+            tuple(RETURN_COUNTERS),
+            is_available=True,
+            updated_at=now,
+            **RETURN_COUNTERS,
+        )
+        LoanService.count_active_loans(user, -1)
+        LoanStatsService.record(now, [book.pk], returns=1)
         book.is_available = True
-        book.save(update_fields=["is_available"])
+        book.updated_at = now
+        if released:
+            book.active_loans = released[0]["active_loans"]
+        invalidate_book_caches(book.pk)
+        invalidate_user_loans(user.pk)
 
+        loan = Loan(user=user, book=book, returned_at=now, **returned[0])
+        loan._state.adding = False
         return loan
+
+    @staticmethod
+    @transaction.atomic
+    def borrow_books(user: User, book_ids: list) -> list:
+        """
+        Borrow several books for a user in one transaction.
+
+        Applies the rules of ``borrow_book`` to every book with one query
+        per step instead of one transaction per book. Books that can't be
+        borrowed don't prevent the others from being borrowed.
+
+        Args:
+            user: The user borrowing the books
+            book_ids: Ids of the books to borrow
+
+        Returns:
+            One result per id, in order: ``{"book_id", "loan"}`` on success,
+            ``{"book_id", "error"}`` with the single-item error otherwise
+        """
+        errors, books = LoanService.batch_books(book_ids)
+        now = timezone.now()
+        claimed = {
+            row.pop("id"): row
+            for row in update_returning(
+                Book.objects.filter(pk__in=books, is_available=True),
+                ("id", *BORROW_COUNTERS),
+                is_available=False,
+                updated_at=now,
+                **BORROW_COUNTERS,
+            )
+        }
+        unclaimed = [books[book_id] for book_id in books.keys() - claimed]
+        errors.update(LoanService.unavailable_errors(user, unclaimed))
+
+        loans = {}
+        try:
+            with transaction.atomic():
+                created = Loan.objects.bulk_create(
+                    Loan(user=user, book=books[book_id]) for book_id in claimed
+                )
+            loans = {loan.book_id: loan for loan in created}
+        except IntegrityError:
+            # Some copies were flagged available while lent out; lend the others
+            for book_id in claimed:
+                try:
+                    with transaction.atomic():
+                        loans[book_id] = Loan.objects.create(user=user, book=books[book_id])
+                except IntegrityError:
+                    errors.update(LoanService.unavailable_errors(user, [books[book_id]]))
+            # No loan was created for these, so take back their counts
+            Book.objects.filter(pk__in=claimed.keys() - loans.keys()).update(
+                total_loans=F("total_loans") - 1, active_loans=F("active_loans") - 1
+            )
+
+        if claimed:
+            invalidate_book_caches(*claimed)
+            invalidate_user_loans(user.pk)
+        if loans:
+            LoanService.count_active_loans(user, len(loans))
+            LoanStatsService.record(now, list(loans), borrows=1)
+        for book_id, counters in claimed.items():
+            books[book_id].is_available = False
+            books[book_id].updated_at = now
+            if book_id in loans:
+                books[book_id].total_loans = counters["total_loans"]
+                books[book_id].active_loans = counters["active_loans"]
+        return LoanService.batch_results(book_ids, loans, errors)
+
+    @staticmethod
+    @transaction.atomic
+    def return_books(user: User, book_ids: list) -> list:
+        """
+        Return several books for a user in one transaction.
+
+        Applies the rules of ``return_book`` to every book with one query
+        per step instead of one transaction per book.
+
+        Args:
+            user: The user returning the books
+            book_ids: Ids of the books to return
+
+        Returns:
+            One result per id, in order: ``{"book_id", "loan"}`` on success,
+            ``{"book_id", "error"}`` with the single-item error otherwise
+        """
+        errors, books = LoanService.batch_books(book_ids)
+        now = timezone.now()
+        returned = update_returning(
+            Loan.objects.filter(user=user, book__in=books, returned_at__isnull=True),
+            ("id", "book_id", "borrowed_at"),
+            returned_at=now,
+        )
+        loans = {}
+        for row in returned:
+            book = books[row.pop("book_id")]
+            loan = Loan(user=user, book=book, returned_at=now, **row)
+            loan._state.adding = False
+            loans[loan.book_id] = loan
+        for book_id in books.keys() - loans.keys():
+            errors[book_id] = f'You do not have an active loan for "{books[book_id].title}".'
+
+        released = {}
+        if loans:
+            released = {
+                row.pop("id"): row
+                for row in update_returning(
+                    Book.objects.filter(pk__in=loans),
+                    ("id", *RETURN_COUNTERS),
+                    is_available=True,
+                    updated_at=now,
+                    **RETURN_COUNTERS,
+                )
+            }
+            LoanService.count_active_loans(user, -len(loans))
+            LoanStatsService.record(now, list(loans), returns=1)
+            invalidate_book_caches(*loans)
+            invalidate_user_loans(user.pk)
+        for book_id in loans:
+            books[book_id].is_available = True
+            books[book_id].updated_at = now
+            if book_id in released:
+                books[book_id].active_loans = released[book_id]["active_loans"]
+        return LoanService.batch_results(book_ids, loans, errors)
+
+    @staticmethod
+    def count_active_loans(user: User, delta: int) -> None:
+        """Add ``delta`` to the user's active loan counter, never going below zero."""
+        counted = update_returning(
+            User.objects.filter(pk=user.pk),
+            ("active_loan_count",),
+            active_loan_count=Greatest(F("active_loan_count") + delta, 0),
+        )
+        if counted:
+            user.active_loan_count = counted[0]["active_loan_count"]
+
+    @staticmethod
+    def batch_books(book_ids: list) -> tuple:
+        """
+        Load the books of a batch.
+
+        Returns:
+            ``(errors, books)``: errors for unknown ids and the found books by id
+        """
+        books = Book.objects.in_bulk(set(book_ids))
+        errors = {book_id: "Book not found." for book_id in book_ids if book_id not in books}
+        return errors, books
+
+    @staticmethod
+    def batch_results(book_ids: list, loans: dict, errors: dict) -> list:
+        """Return the per-item results of a batch, in request order."""
+        results = []
+        seen = set()
+        for book_id in book_ids:
+            if book_id in seen:
+                results.append({"book_id": book_id, "error": "Duplicate book id."})
+            elif book_id in errors:
+                results.append({"book_id": book_id, "error": errors[book_id]})
+            else:
+                results.append({"book_id": book_id, "loan": loans[book_id]})
+            seen.add(book_id)
+        return results
+
+    @staticmethod
+    def unavailable_error(user: User, book: Book) -> ValueError:
+        """Return the error explaining why a book can't be borrowed by the user."""
+        return ValueError(LoanService.unavailable_errors(user, [book])[book.pk])
+
+    @staticmethod
+    def unavailable_errors(user: User, books: list) -> dict:
+        """Return why each of the books can't be borrowed by the user, by book id."""
+        if not books:
+            return {}
+        active = set(
+            Loan.objects.filter(user=user, book__in=books, returned_at__isnull=True).values_list(
+                "book_id", flat=True
+            )
+        )
+        return {
+            book.pk: (
+                f'You already have an active loan for "{book.title}".' "Please return it first."
+                if book.pk in active
+                else f'Book "{book.title}" is not available for borrowing.'
+            )
+            for book in books
+        }
+
+
+class LoanStatsService:
+    """
+    Service class for circulation statistics.
+
+    Statistics are answered from ``LoanDailyRollup`` rows: one per book and
+    day, holding the number of borrows and returns. ``LoanService`` adds to
+    them as loans are borrowed and returned; ``rebuild_day`` recomputes a day
+    from the loans, for backfills and repairs.
+    """
+
+    GRANULARITIES = ("day", "week", "month")
+
+    @staticmethod
+    def record(when: datetime, book_ids: list, borrows: int = 0, returns: int = 0) -> None:
+        """Add borrows and returns of the books to the rollups of the day of ``when``."""
+        day = timezone.localdate(when)
+        upsert_add(
+            LoanDailyRollup,
+            ("day", "book"),
+            [
+                {"day": day, "book": book_id, "borrows": borrows, "returns": returns}
+                for book_id in book_ids
+            ],
+        )
+
+    @staticmethod
+    @transaction.atomic
+    def rebuild_day(day: date) -> int:
+        """
+        Recompute the rollups of one day from the loans, archived ones included.
+
+        Returns:
+            Number of rollup rows written
+        """
+        start = timezone.make_aware(datetime.combine(day, time.min))
+        end = timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+        counts = {}
+        for field, timestamp in (("borrows", "borrowed_at"), ("returns", "returned_at")):
+            per_book = (
+                LoanHistory.objects.filter(**{f"{timestamp}__gte": start, f"{timestamp}__lt": end})
+                .order_by()
+                .values("book_id")
+                .annotate(count=Count("*"))
+            )
+            for row in per_book:
+                book_counts = counts.setdefault(row["book_id"], {"borrows": 0, "returns": 0})
+                book_counts[field] = row["count"]
+
+        LoanDailyRollup.objects.filter(day=day).delete()
+        LoanDailyRollup.objects.bulk_create(
+            LoanDailyRollup(day=day, book_id=book_id, **values)
+            for book_id, values in counts.items()
+        )
+        return len(counts)
+
+    @staticmethod
+    def stats(start: date, end: date, granularity: str = "day", top: int = 10) -> dict:
+        """
+        Summarize circulation between ``start`` and ``end`` (inclusive).
+
+        Returns:
+            Borrow and return totals, a series per ``granularity`` period
+            (periods without loans included, with zero counts), and the
+            ``top`` most borrowed books and authors
+        """
+        rollups = LoanDailyRollup.objects.filter(day__gte=start, day__lte=end)
+        per_period = {
+            row["period"]: row
+            for row in rollups.annotate(period=Trunc("day", granularity, output_field=DateField()))
+            .values("period")
+            .annotate(borrows=Sum("borrows"), returns=Sum("returns"))
+            .order_by("period")
+        }
+        series = [
+            {
+                "period": period,
+                "borrows": per_period.get(period, {}).get("borrows", 0),
+                "returns": per_period.get(period, {}).get("returns", 0),
+            }
+            for period in LoanStatsService.periods(start, end, granularity)
+        ]
+        top_books = (
+            rollups.values("book_id", title=F("book__title"), author=F("book__author"))
+            .annotate(borrows=Sum("borrows"))
+            .filter(borrows__gt=0)
+            .order_by("-borrows", "book_id")[:top]
+        )
+        top_authors = (
+            rollups.values(author=F("book__author"))
+            .annotate(borrows=Sum("borrows"))
+            .filter(borrows__gt=0)
+            .order_by("-borrows", "author")[:top]
+        )
+        return {
+            "start": start,
+            "end": end,
+            "granularity": granularity,
+            "borrows": sum(item["borrows"] for item in series),
+            "returns": sum(item["returns"] for item in series),
+            "series": series,
+            "top_books": list(top_books),
+            "top_authors": list(top_authors),
+        }
+
+    @staticmethod
+    def periods(start: date, end: date, granularity: str) -> list:
+        """Return the first day of every ``granularity`` period overlapping the range."""
+        if granularity == "week":
+            period = start - timedelta(days=start.weekday())
+        elif granularity == "month":
+            period = start.replace(day=1)
+        else:
+            period = start
+        periods = []
+        while period <= end:
+            periods.append(period)
+            if granularity == "week":
+                period += timedelta(days=7)
+            elif granularity == "month":
+                period = (period + timedelta(days=32)).replace(day=1)
+            else:
+                period += timedelta(days=1)
+        return periods
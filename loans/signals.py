@@ -0,0 +1,32 @@
+"""
+Signal handlers for the loans app.
+"""
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import bump_user_loans_version
+from .models import Loan
+
+User = get_user_model()
+
+
+def invalidate_user_loans(user_id: int) -> None:
+    """Advance the user's loans version now and again once the transaction commits."""
+    bump_user_loans_version(user_id)
+    transaction.on_commit(lambda: bump_user_loans_version(user_id))
+
+
+@receiver(post_save, sender=Loan)
+@receiver(post_delete, sender=Loan)
+def loan_changed(sender, instance: Loan, **kwargs) -> None:
+    """Invalidate the borrower's loan version marker when a loan is written."""
+    invalidate_user_loans(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance: User, **kwargs) -> None:
+    """Invalidate the user's loan version marker, since loans embed the user."""
+    invalidate_user_loans(instance.pk)
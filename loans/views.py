@@ -2,32 +2,135 @@
 Views for Loan API endpoints.
 """
 
-from rest_framework import viewsets
-from rest_framework.permissions import IsAuthenticated
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
 
-from .models import Loan
-from .serializers import LoanSerializer
+from books.cache import get_catalog_version
+from core.conditional import conditional_get
+from core.idempotency import idempotent
+from core.mixins import CompiledListMixin
 
+from .cache import get_user_loans_version
+from .models import LoanHistory
+from .pagination import LoanPagination
+from .serializers import LoanBatchSerializer, LoanSerializer, LoanStatsQuerySerializer
+from .services import LoanService, LoanStatsService
 
-class LoanViewSet(viewsets.ReadOnlyModelViewSet):
+
+class LoanViewSet(CompiledListMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for Loan model (read-only).
 
     list: GET /loans/ - List all loans for the authenticated user
     retrieve: GET /loans/<id>/ - Get loan details
+    batch: POST /loans/batch/ - Borrow or return several books at once
+    stats: GET /loans/stats/ - Circulation statistics (admin only)
     """
 
     serializer_class = LoanSerializer
     permission_classes = (IsAuthenticated,)
+    pagination_class = LoanPagination
+    ordering_fields = ("borrowed_at",)
+    ordering = ("-borrowed_at", "id")
 
     def get_queryset(self):
-        """Return loans for the authenticated user only."""
+        """Return loans for the authenticated user only, including archived loans."""
         # Handle Swagger schema generation
         if getattr(self, "swagger_fake_view", False):
-            return Loan.objects.none()
+            return LoanHistory.objects.none()
 
         # Check if user is authenticated (not AnonymousUser)
         if not self.request.user.is_authenticated:
-            return Loan.objects.none()
+            return LoanHistory.objects.none()
+
+        return LoanHistory.objects.filter(user_id=self.request.user.pk).select_related(
+            "user", "book"
+        )
+
+    @conditional_get("get_loans_version", per_user=True)
+    def list(self, request, *args, **kwargs) -> Response:
+        """List loans, answering conditional requests with 304 Not Modified."""
+        return super().list(request, *args, **kwargs)
+
+    @conditional_get("get_loans_version", per_user=True)
+    def retrieve(self, request, *args, **kwargs) -> Response:
+        """Get loan details, answering conditional requests with 304 Not Modified."""
+        return super().retrieve(request, *args, **kwargs)
+
+    def get_loans_version(self, request, *args, **kwargs) -> tuple:
+        """
+        Return the version of the user's loans.
+
+        Loans embed their book, so the catalog version is part of it as well.
+        """
+        if not request.user.is_authenticated:
+            return None, None
+        return f"{get_user_loans_version(request.user.pk)}:{get_catalog_version()}", None
+
+    @action(
+        detail=False,
+        methods=["post"],
+        serializer_class=LoanBatchSerializer,
+        url_path="batch",
+        url_name="batch",
+    )
+    @idempotent
+    def batch(self, request) -> Response:
+        """
+        Borrow or return several books in one transaction.
+        POST /loans/batch/ {"action": "borrow" | "return", "book_ids": [...]}
+
+        Every book follows the rules of the single-book borrow and return
+        endpoints. Failing books don't prevent the others from being
+        processed; the response reports the outcome of each book in order.
+        Retries sending the same ``Idempotency-Key`` get the first response.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        book_ids = serializer.validated_data["book_ids"]
+        if serializer.validated_data["action"] == "borrow":
+            results = LoanService.borrow_books(user=request.user, book_ids=book_ids)
+            timestamp = "borrowed_at"
+        else:
+            results = LoanService.return_books(user=request.user, book_ids=book_ids)
+            timestamp = "returned_at"
+
+        items = []
+        for result in results:
+            loan = result.get("loan")
+            if loan is None:
+                items.append(
+                    {"book_id": result["book_id"], "success": False, "error": result["error"]}
+                )
+            else:
+                items.append(
+                    {
+                        "book_id": result["book_id"],
+                        "success": True,
+                        "loan_id": loan.id,
+                        timestamp: getattr(loan, timestamp),
+                    }
+                )
+        return Response({"results": items}, status=status.HTTP_200_OK)
+
+    @action(
+        detail=False,
+        methods=["get"],
+        permission_classes=[IsAdminUser],
+        url_path="stats",
+        url_name="stats",
+    )
+    def stats(self, request) -> Response:
+        """
+        Circulation statistics for a date range.
+        GET /loans/stats/?start=2026-01-01&end=2026-01-31&granularity=week&top=5
 
-        return Loan.objects.filter(user=self.request.user)
+        Returns borrow and return totals, a series per day, week or month,
+        and the most borrowed books and authors. Defaults to the last 30
+        days. Answered from the daily rollups, never from the loans.
+        """
+        params = LoanStatsQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        return Response(LoanStatsService.stats(**params.validated_data), status=status.HTTP_200_OK)
@@ -3,15 +3,55 @@ Pytest configuration and fixtures.
 """
 
 from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.db import connection
 
 import pytest
 from rest_framework.test import APIClient
 
+from books.cache import book_detail_cache
 from books.models import Book
+from users.authentication import USER_CACHE
+from users.blacklist import token_blacklist
 
 User = get_user_model()
 
 
+@pytest.fixture(autouse=True)
+def clear_cache() -> None:
+    """Start every test with empty caches."""
+    cache.clear()
+    caches["throttle"].clear()
+    book_detail_cache.local.clear()
+    USER_CACHE.clear()
+    token_blacklist.reset()
+
+
+@pytest.fixture
+def require_postgres() -> None:
+    """Skip the test unless the database backend is PostgreSQL."""
+    if connection.vendor != "postgresql":
+        pytest.skip("requires PostgreSQL")
+
+
+@pytest.fixture
+def explain(require_postgres: None):
+    """
+    Return a function giving the PostgreSQL plan of a queryset.
+
+    Sequential scans are disabled for the rest of the test transaction, so
+    the plan shows whether an index can serve the query even on the tiny
+    tables of the test database.
+    """
+
+    def explain(queryset) -> str:
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        return queryset.explain()
+
+    return explain
+
+
 @pytest.fixture
 def api_client() -> APIClient:
     """Create an API client."""
@@ -2,14 +2,31 @@
 Integration tests for API endpoints.
 """
 
+import csv
+import io
+import json
+from datetime import timedelta
+
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 
 import pytest
 from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
 
+from books.cache import book_list_cache_key
 from books.models import Book
+from books.serializers import BookSerializer
+from core.throttling import ScopedRateThrottle
 from loans.models import Loan
+from loans.serializers import LoanSerializer
 
 User = get_user_model()
 
@@ -58,6 +75,16 @@ class TestAuthenticationAPI:
         assert "access" in response.data
         assert "refresh" in response.data
 
+    @pytest.mark.django_db
+    def test_login_updates_last_login(self, api_client, user: User) -> None:
+        """Test logging in records the user's last login."""
+        response = api_client.post(
+            reverse("users:login"), {"username": "testuser", "password": "testpass123"}
+        )
+        assert response.status_code == status.HTTP_200_OK
+        user.refresh_from_db()
+        assert user.last_login is not None
+
     @pytest.mark.django_db
     def test_get_current_user(self, authenticated_client, user: User) -> None:
         """Test getting current user info."""
@@ -67,6 +94,134 @@ class TestAuthenticationAPI:
         assert response.data["username"] == user.username
 
 
+class TestClaimsAuthenticationAPI:
+    """Tests for authentication from token claims."""
+
+    @staticmethod
+    def login(username: str, password: str) -> tuple:
+        """Log in and return an API client sending the access token, and the tokens."""
+        tokens = (
+            APIClient()
+            .post(reverse("users:login"), {"username": username, "password": password})
+            .data
+        )
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        return client, tokens
+
+    @staticmethod
+    def user_reads(queries) -> list:
+        """Return the captured queries selecting from the users table."""
+        return [
+            query["sql"]
+            for query in queries
+            if query["sql"].startswith("SELECT") and 'FROM "users"' in query["sql"]
+        ]
+
+    @pytest.mark.django_db
+    def test_reads_skip_user_lookup(self, user: User, book: Book) -> None:
+        """Test read requests are authenticated from the claims, writes from a cached row."""
+        client, _ = self.login("testuser", "testpass123")
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(reverse("books:book-list"))
+        assert response.status_code == status.HTTP_200_OK
+        assert self.user_reads(queries) == []
+
+        borrow = reverse("books:book-borrow", kwargs={"pk": book.id})
+        with CaptureQueriesContext(connection) as queries:
+            assert client.post(borrow).status_code == status.HTTP_201_CREATED
+            assert client.post(borrow).status_code == status.HTTP_400_BAD_REQUEST
+        assert len(self.user_reads(queries)) == 1
+
+    @pytest.mark.django_db
+    def test_me_from_claims(self, user: User) -> None:
+        """Test the current user endpoint returns the full user."""
+        client, _ = self.login("testuser", "testpass123")
+        response = client.get(reverse("users:me"))
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["email"] == user.email
+        assert response.data["date_joined"] is not None
+
+    @pytest.mark.django_db
+    def test_me_current_after_borrow(self, user: User, book: Book) -> None:
+        """Test the current user endpoint isn't served from the authentication cache."""
+        client, _ = self.login("testuser", "testpass123")
+        client.get(reverse("users:me"))
+        response = client.post(reverse("books:book-borrow", kwargs={"pk": book.id}))
+        assert response.status_code == status.HTTP_201_CREATED
+        response = client.get(reverse("users:me"))
+        assert response.data["active_loan_count"] == 1
+
+    @pytest.mark.django_db
+    def test_demotion_applies_to_issued_tokens(self, admin_user: User) -> None:
+        """Test removing the staff flag takes effect for tokens issued before."""
+        client, tokens = self.login("admin", "adminpass123")
+        url = reverse("users:user-list")
+        assert client.get(url).status_code == status.HTTP_200_OK
+        admin_user.is_staff = False
+        admin_user.save()
+        assert client.get(url).status_code == status.HTTP_403_FORBIDDEN
+
+        response = APIClient().post(reverse("users:token_refresh"), {"refresh": tokens["refresh"]})
+        assert AccessToken(response.data["access"])["is_staff"] is False
+
+    @pytest.mark.django_db
+    def test_deactivation_applies_to_issued_tokens(self, user: User) -> None:
+        """Test deactivated users are rejected although their token is still valid."""
+        client, tokens = self.login("testuser", "testpass123")
+        user.is_active = False
+        user.save(update_fields=["is_active"])
+        assert client.get(reverse("books:book-list")).status_code == status.HTTP_401_UNAUTHORIZED
+        response = APIClient().post(reverse("users:token_refresh"), {"refresh": tokens["refresh"]})
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    @pytest.mark.django_db
+    def test_unrelated_save_keeps_tokens_trusted(self, user: User) -> None:
+        """Test saves that don't touch the staff or active flag don't invalidate tokens."""
+        client, _ = self.login("testuser", "testpass123")
+        user.first_name = "Changed"
+        user.save()
+        with CaptureQueriesContext(connection) as queries:
+            client.get(reverse("books:book-list"))
+        assert self.user_reads(queries) == []
+
+
+class TestLogoutAPI:
+    """Tests for logout and the refresh token blacklist."""
+
+    login = staticmethod(TestClaimsAuthenticationAPI.login)
+
+    @pytest.mark.django_db
+    def test_logout_revokes_tokens(self, user: User) -> None:
+        """Test the refresh and access tokens stop working after logout."""
+        client, tokens = self.login("testuser", "testpass123")
+        response = client.post(reverse("users:logout"), {"refresh": tokens["refresh"]})
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+        assert client.get(reverse("users:me")).status_code == status.HTTP_401_UNAUTHORIZED
+        response = APIClient().post(reverse("users:token_refresh"), {"refresh": tokens["refresh"]})
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    @pytest.mark.django_db
+    def test_logout_other_users_token(self, user: User, admin_user: User) -> None:
+        """Test users can't revoke tokens of other users."""
+        client, _ = self.login("testuser", "testpass123")
+        _, admin_tokens = self.login("admin", "adminpass123")
+        response = client.post(reverse("users:logout"), {"refresh": admin_tokens["refresh"]})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    @pytest.mark.django_db
+    def test_rotated_refresh_token_single_use(self, user: User) -> None:
+        """Test a refresh token is rejected once it was rotated."""
+        _, tokens = self.login("testuser", "testpass123")
+        url = reverse("users:token_refresh")
+        rotated = APIClient().post(url, {"refresh": tokens["refresh"]})
+        assert rotated.status_code == status.HTTP_200_OK
+        response = APIClient().post(url, {"refresh": rotated.data["refresh"]})
+        assert response.status_code == status.HTTP_200_OK
+        response = APIClient().post(url, {"refresh": tokens["refresh"]})
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
 class TestBooksAPI:
     """Tests for books endpoints."""
 
@@ -100,6 +255,20 @@ class TestBooksAPI:
         assert response.status_code == status.HTTP_200_OK
         assert len(response.data["results"]) == 1
 
+    @pytest.mark.django_db
+    def test_order_by_total_loans(self, authenticated_client, user: User, book: Book) -> None:
+        """Test books can be sorted by their circulation counters."""
+        popular = Book.objects.create(
+            title="Popular", author="Author", isbn="9876543210", page_count=200
+        )
+        authenticated_client.post(reverse("books:book-borrow", kwargs={"pk": popular.id}))
+        url = reverse("books:book-list")
+        response = authenticated_client.get(url, {"ordering": "-total_loans"})
+        assert response.status_code == status.HTTP_200_OK
+        assert [b["id"] for b in response.data["results"]] == [popular.id, book.id]
+        assert response.data["results"][0]["total_loans"] == 1
+        assert response.data["results"][0]["active_loans"] == 1
+
     @pytest.mark.django_db
     def test_get_book_detail(self, api_client, book: Book) -> None:
         """Test getting book details."""
@@ -254,6 +423,65 @@ class TestLoansAPI:
         response = api_client.get(url)
         assert response.status_code == status.HTTP_401_UNAUTHORIZED
 
+    @pytest.mark.django_db
+    def test_list_loans_cursor_pages(self, authenticated_client, user: User, book: Book) -> None:
+        """Test loans are returned newest first across cursor pages."""
+        loans = [
+            Loan.objects.create(user=user, book=book, returned_at=timezone.now()) for _ in range(3)
+        ]
+        url = reverse("loans:loan-list")
+        first = authenticated_client.get(url)
+        second = authenticated_client.get(first.data["next"])
+        ids = [loan["id"] for loan in first.data["results"] + second.data["results"]]
+        assert ids == [loan.id for loan in reversed(loans)]
+        assert second.data["next"] is None
+
+    @pytest.mark.django_db
+    def test_user_loan_history_paginated(
+        self, authenticated_client, user: User, book: Book
+    ) -> None:
+        """Test a user's loan history is paginated."""
+        for _ in range(3):
+            Loan.objects.create(user=user, book=book, returned_at=timezone.now())
+        url = reverse("users:user-loan_history", kwargs={"pk": user.id})
+        response = authenticated_client.get(url, {"page": 1})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["count"] == 3
+        assert len(response.data["results"]) == 2
+
+    @pytest.mark.django_db
+    def test_book_loan_history_paginated(self, admin_client, user: User, book: Book) -> None:
+        """Test a book's loan history is paginated."""
+        for _ in range(3):
+            Loan.objects.create(user=user, book=book, returned_at=timezone.now())
+        url = reverse("books:book-loan_history", kwargs={"pk": book.id})
+        response = admin_client.get(url, {"page_size": 3})
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data["results"]) == 3
+        assert response.data["next"] is None
+
+    @pytest.mark.django_db
+    def test_histories_include_archived_loans(self, admin_client, user: User, book: Book) -> None:
+        """Test archived loans still show up in loan listings and histories."""
+        returned_at = timezone.now() - timedelta(days=400)
+        loans = [
+            Loan.objects.create(user=user, book=book, returned_at=returned_at) for _ in range(2)
+        ]
+        call_command("archive_loans", batch_size=1, stdout=None)
+        assert Loan.objects.exists() is False
+        expected = [loan.id for loan in reversed(loans)]
+        for url in (
+            reverse("users:user-loan_history", kwargs={"pk": user.id}),
+            reverse("books:book-loan_history", kwargs={"pk": book.id}),
+        ):
+            response = admin_client.get(url, {"page_size": 10})
+            assert [loan["id"] for loan in response.data["results"]] == expected
+        client = APIClient()
+        client.force_authenticate(user=user)
+        response = client.get(reverse("loans:loan-detail", kwargs={"pk": loans[0].id}))
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["is_active"] is False
+
 
 class TestEndToEndFlow:
     """End-to-end integration tests."""
@@ -300,3 +528,697 @@ class TestEndToEndFlow:
         # Response is paginated, so check results
         assert len(loans_response.data["results"]) == 1
         assert loans_response.data["results"][0]["is_active"] is False
+
+
+class TestConditionalGetAPI:
+    """Tests for ETag / Last-Modified handling."""
+
+    @pytest.mark.django_db
+    def test_book_detail_not_modified(self, api_client, book: Book) -> None:
+        """Test a book detail is answered with 304 until the book changes."""
+        url = reverse("books:book-detail", kwargs={"pk": book.id})
+        response = api_client.get(url)
+        etag = response.headers["ETag"]
+        assert "Last-Modified" in response.headers
+
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        response = api_client.get(
+            url, HTTP_IF_MODIFIED_SINCE=api_client.get(url).headers["Last-Modified"]
+        )
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+        book.title = "Changed"
+        book.save()
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["ETag"] != etag
+
+    @pytest.mark.django_db
+    def test_book_detail_served_from_cache(
+        self, api_client, book: Book, django_assert_max_num_queries
+    ) -> None:
+        """Test repeated book detail reads don't query the book again."""
+        url = reverse("books:book-detail", kwargs={"pk": book.id})
+        first = api_client.get(url)
+        with django_assert_max_num_queries(0):
+            second = api_client.get(url)
+        assert second.content == first.content
+
+    @pytest.mark.django_db
+    def test_book_detail_missing(self, api_client) -> None:
+        """Test unknown books still return 404."""
+        response = api_client.get(reverse("books:book-detail", kwargs={"pk": 999}))
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        assert "ETag" not in response.headers
+
+    @pytest.mark.django_db
+    def test_book_list_etag_depends_on_filters(self, api_client, book: Book) -> None:
+        """Test list ETags differ per filter and change when a book is deleted."""
+        url = reverse("books:book-list")
+        etag = api_client.get(url).headers["ETag"]
+        assert api_client.get(url, {"is_available": "true"}).headers["ETag"] != etag
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+        Book.objects.create(title="Other", author="Someone", isbn="1111111111", page_count=1)
+        etag = api_client.get(url).headers["ETag"]
+        Book.objects.get(isbn="1111111111").delete()
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+
+    @pytest.mark.django_db
+    def test_book_list_not_modified_without_serializing(
+        self, api_client, book: Book, monkeypatch
+    ) -> None:
+        """Test a conditional list request missing the caches is answered without serializing."""
+        url = reverse("books:book-list")
+        response = api_client.get(url)
+        etag, last_modified = response.headers["ETag"], response.headers["Last-Modified"]
+        key = book_list_cache_key(Request(APIRequestFactory().get(url)))
+        cache.delete_many([key, f"{key}:validators"])
+
+        def serialize(*args, **kwargs):
+            raise AssertionError("List serialized for a conditional request")
+
+        monkeypatch.setattr("books.views.BookViewSet.get_list_response", serialize)
+        monkeypatch.setattr("books.serializers.BookSerializer.to_representation", serialize)
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        response = api_client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    @pytest.mark.django_db
+    def test_book_list_modified_by_delete(self, api_client, book: Book, monkeypatch) -> None:
+        """Test deleting a book moves the Last-Modified date of the lists that held it."""
+        other = Book.objects.create(
+            title="Other", author="Someone", isbn="1111111111", page_count=1
+        )
+        url = reverse("books:book-list")
+        last_modified = api_client.get(url, {"is_available": "true"}).headers["Last-Modified"]
+
+        later = timezone.now() + timedelta(seconds=5)
+        monkeypatch.setattr("django.utils.timezone.now", lambda: later)
+        other.delete()
+        response = api_client.get(
+            url, {"is_available": "true"}, HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert [result["id"] for result in response.data["results"]] == [book.id]
+
+    @pytest.mark.django_db
+    def test_loans_not_modified_until_borrow(
+        self, authenticated_client, user: User, book: Book
+    ) -> None:
+        """Test loan listings are answered with 304 until the user's loans change."""
+        urls = [
+            reverse("loans:loan-list"),
+            reverse("users:user-loan_history", kwargs={"pk": user.id}),
+        ]
+        etags = [authenticated_client.get(url).headers["ETag"] for url in urls]
+        for url, etag in zip(urls, etags):
+            response = authenticated_client.get(url, HTTP_IF_NONE_MATCH=etag)
+            assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+        authenticated_client.post(reverse("books:book-borrow", kwargs={"pk": book.id}))
+        for url, etag in zip(urls, etags):
+            response = authenticated_client.get(url, HTTP_IF_NONE_MATCH=etag)
+            assert response.status_code == status.HTTP_200_OK
+            assert len(response.data["results"]) == 1
+
+
+class TestBookListCacheAPI:
+    """Tests for the book list response cache."""
+
+    @pytest.mark.django_db
+    def test_list_cached_and_shared(
+        self, authenticated_client, book: Book, django_assert_max_num_queries
+    ) -> None:
+        """Test equivalent list requests are served from the cache for everyone."""
+        url = reverse("books:book-list")
+        first = APIClient().get(url, {"is_available": "true", "ordering": "title"})
+        with django_assert_max_num_queries(0):
+            second = authenticated_client.get(url, {"ordering": "title ", "is_available": "true"})
+        assert second.data == first.data
+
+    @pytest.mark.django_db
+    def test_list_cache_invalidated_by_write(self, api_client, book: Book) -> None:
+        """Test book writes make cached lists stale."""
+        url = reverse("books:book-list")
+        assert len(api_client.get(url).data["results"]) == 1
+        Book.objects.create(title="Other", author="Someone", isbn="1111111111", page_count=1)
+        assert len(api_client.get(url).data["results"]) == 2
+
+    @pytest.mark.django_db
+    def test_metrics_report_hits_and_misses(self, api_client, admin_client, book: Book) -> None:
+        """Test list cache hits and misses are exposed to admins."""
+        url = reverse("books:book-list")
+        api_client.get(url)
+        api_client.get(url)
+        response = admin_client.get(reverse("metrics"))
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["books.list_cache.hits"] == 1
+        assert response.data["books.list_cache.misses"] == 1
+
+    @pytest.mark.django_db
+    def test_metrics_admin_only(self, authenticated_client) -> None:
+        """Test regular users can't read the metrics."""
+        response = authenticated_client.get(reverse("metrics"))
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+class TestBookImportAPI:
+    """Tests for the bulk book import endpoint."""
+
+    @pytest.mark.django_db
+    def test_import_csv(self, admin_client, book: Book) -> None:
+        """Test CSV rows are upserted on ISBN and invalid rows are reported."""
+        url = reverse("books:book-import")
+        body = (
+            "title,author,isbn,page_count\n"
+            "New Book,New Author,978-0-00-000000-2,120\n"
+            "Renamed Book,Test Author,1234567890,150\n"
+            "Bad Book,Someone,12345,0\n"
+        )
+        response = admin_client.post(url, body, content_type="text/csv")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["processed"] == 3
+        assert response.data["imported"] == 2
+        assert response.data["failed"] == 1
+        assert response.data["errors"] == [
+            {
+                "row": 3,
+                "errors": {
+                    "isbn": ["ISBN must be 10 or 13 digits long."],
+                    "page_count": ["Page count must be greater than 0."],
+                },
+            }
+        ]
+        assert Book.objects.get(isbn="9780000000002").title == "New Book"
+        book.refresh_from_db()
+        assert book.title == "Renamed Book"
+        assert book.page_count == 150
+
+    @pytest.mark.django_db
+    def test_import_ndjson(self, admin_client) -> None:
+        """Test NDJSON rows are imported and malformed lines reported per row."""
+        url = reverse("books:book-import")
+        body = (
+            '{"title": "One", "author": "A", "isbn": "1111111111", "page_count": 10}\n'
+            "\n"
+            "{not json}\n"
+            '{"title": "Two", "author": "B", "isbn": "2222222222", "page_count": "20"}\n'
+        )
+        response = admin_client.post(url, body, content_type="application/x-ndjson")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["imported"] == 2
+        assert response.data["errors"][0]["row"] == 2
+        assert "non_field_errors" in response.data["errors"][0]["errors"]
+        assert Book.objects.count() == 2
+
+    @pytest.mark.django_db
+    def test_import_invalidates_caches(
+        self, admin_client, book: Book, django_capture_on_commit_callbacks
+    ) -> None:
+        """Test imported changes are visible in cached book details and lists."""
+        admin_client.get(reverse("books:book-detail", kwargs={"pk": book.id}))
+        admin_client.get(reverse("books:book-list"))
+        body = "title,author,isbn,page_count\nRenamed Book,Test Author,1234567890,150\n"
+        with django_capture_on_commit_callbacks(execute=True):
+            admin_client.post(reverse("books:book-import"), body, content_type="text/csv")
+        response = admin_client.get(reverse("books:book-detail", kwargs={"pk": book.id}))
+        assert response.data["title"] == "Renamed Book"
+        response = admin_client.get(reverse("books:book-list"))
+        assert response.data["results"][0]["title"] == "Renamed Book"
+
+    @pytest.mark.django_db
+    def test_import_requires_admin(self, authenticated_client) -> None:
+        """Test regular users cannot import books."""
+        body = "title,author,isbn,page_count\nOne,A,1111111111,10\n"
+        url = reverse("books:book-import")
+        response = authenticated_client.post(url, body, content_type="text/csv")
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    @pytest.mark.django_db
+    def test_import_unsupported_media_type(self, admin_client) -> None:
+        """Test uploads other than CSV and NDJSON are rejected."""
+        response = admin_client.post(reverse("books:book-import"), {"rows": []}, format="json")
+        assert response.status_code == status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+
+
+class TestBookExportAPI:
+    """Tests for the catalog export endpoint."""
+
+    @pytest.mark.django_db
+    def test_export_ndjson_matches_serializer(
+        self, authenticated_client, book: Book, unavailable_book: Book
+    ) -> None:
+        """Test NDJSON rows equal the serialized books, in list order."""
+        response = authenticated_client.get(reverse("books:book-export"))
+        assert response.status_code == status.HTTP_200_OK
+        assert response["Content-Type"] == "application/x-ndjson; charset=utf-8"
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        listed = authenticated_client.get(reverse("books:book-list")).data["results"]
+        assert rows == [dict(item) for item in listed]
+
+    @pytest.mark.django_db
+    def test_export_csv_with_filters(
+        self, authenticated_client, book: Book, unavailable_book: Book
+    ) -> None:
+        """Test CSV exports honour the book filters."""
+        url = reverse("books:book-export")
+        response = authenticated_client.get(url, {"format": "csv", "is_available": "false"})
+        assert response.status_code == status.HTTP_200_OK
+        assert 'filename="books.csv"' in response["Content-Disposition"]
+        rows = list(csv.DictReader(io.StringIO(b"".join(response.streaming_content).decode())))
+        assert [row["isbn"] for row in rows] == [unavailable_book.isbn]
+        assert rows[0]["is_available"] == "false"
+
+    @pytest.mark.django_db
+    def test_export_requires_authentication(self, api_client) -> None:
+        """Test anonymous users cannot export the catalog."""
+        response = api_client.get(reverse("books:book-export"), {"format": "csv"})
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    @pytest.mark.django_db
+    def test_export_unknown_format(self, authenticated_client) -> None:
+        """Test unsupported export formats are rejected."""
+        response = authenticated_client.get(reverse("books:book-export"), {"format": "xml"})
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+class TestSparseFieldsAPI:
+    """Tests for the fields and expand query parameters."""
+
+    @pytest.mark.django_db
+    def test_loans_sparse_fields(
+        self, authenticated_client, user: User, book: Book, django_assert_num_queries
+    ) -> None:
+        """Test loans render bare ids and only load what was requested."""
+        Loan.objects.create(user=user, book=book)
+        with django_assert_num_queries(1):
+            response = authenticated_client.get(
+                reverse("loans:loan-list"), {"fields": "id,book,is_active", "expand": ""}
+            )
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["results"][0] == {
+            "id": Loan.objects.get().id,
+            "book": book.id,
+            "is_active": True,
+        }
+
+    @pytest.mark.django_db
+    def test_loans_default_output(self, authenticated_client, user: User, book: Book) -> None:
+        """Test loans keep nesting the user and the book without parameters."""
+        Loan.objects.create(user=user, book=book)
+        response = authenticated_client.get(reverse("loans:loan-list"))
+        result = response.data["results"][0]
+        assert result["user"]["username"] == user.username
+        assert result["book"]["isbn"] == book.isbn
+
+    @pytest.mark.django_db
+    def test_loan_history_nested_fields(self, admin_client, user: User, book: Book) -> None:
+        """Test dotted fields select fields of an expanded relation."""
+        Loan.objects.create(user=user, book=book)
+        url = reverse("books:book-loan_history", kwargs={"pk": book.id})
+        response = admin_client.get(url, {"fields": "borrowed_at,user.username"})
+        assert list(response.data["results"][0]) == ["user", "borrowed_at"]
+        assert response.data["results"][0]["user"] == {"username": user.username}
+
+    @pytest.mark.django_db
+    def test_book_fields(self, api_client, book: Book) -> None:
+        """Test book lists and cached book details honour the fields parameter."""
+        response = api_client.get(reverse("books:book-list"), {"fields": "id,title"})
+        assert response.data["results"] == [{"id": book.id, "title": book.title}]
+        url = reverse("books:book-detail", kwargs={"pk": book.id})
+        api_client.get(url)
+        response = api_client.get(url, {"fields": "isbn"})
+        assert response.data == {"isbn": book.isbn}
+
+    @pytest.mark.django_db
+    def test_writes_ignore_fields(self, admin_client, book: Book) -> None:
+        """Test writes validate and render every field whatever fields asks for."""
+        url = reverse("books:book-list") + "?fields=id"
+        response = admin_client.post(
+            url, {"title": "New", "author": "Someone", "isbn": "bad", "page_count": -1}
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert {"isbn", "page_count"} <= set(response.data)
+
+        url = reverse("books:book-detail", kwargs={"pk": book.id}) + "?fields=title"
+        response = admin_client.patch(url, {"page_count": -1})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        response = admin_client.patch(url, {"page_count": 10})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["page_count"] == 10
+        assert "isbn" in response.data
+
+
+class TestCompiledListAPI:
+    """Tests for list responses rendered from values() rows."""
+
+    @pytest.mark.django_db
+    def test_list_matches_serializer(self, admin_client, user: User, book: Book) -> None:
+        """Test list endpoints return exactly what the serializers produce."""
+        Loan.objects.create(user=user, book=book)
+        response = admin_client.get(reverse("books:book-list"))
+        assert response.data["results"] == BookSerializer(Book.objects.all(), many=True).data
+        url = reverse("users:user-loan_history", kwargs={"pk": user.id})
+        response = admin_client.get(url)
+        assert response.data["results"] == LoanSerializer(Loan.objects.all(), many=True).data
+
+    @pytest.mark.django_db
+    def test_cursor_pages_with_sparse_fields(self, authenticated_client, user: User) -> None:
+        """Test cursor pagination works when the ordering fields aren't rendered."""
+        for i in range(3):
+            book = Book.objects.create(
+                title=f"Book {i}", author="Author", isbn=f"200000000{i}", page_count=10
+            )
+            Loan.objects.create(user=user, book=book)
+        url = reverse("loans:loan-list")
+        response = authenticated_client.get(url, {"fields": "id", "page_size": 2})
+        ids = [loan["id"] for loan in response.data["results"]]
+        response = authenticated_client.get(response.data["next"])
+        ids += [loan["id"] for loan in response.data["results"]]
+        assert ids == list(Loan.objects.order_by("-borrowed_at", "id").values_list("id", flat=True))
+
+
+class TestQueryCountsAPI:
+    """Tests pinning the number of queries of the loan endpoints."""
+
+    @pytest.fixture
+    def loans(self, user: User) -> list:
+        """Create ten loans of different books for the user."""
+        books = [
+            Book.objects.create(
+                title=f"Book {i}", author="Author", isbn=f"30000000{i:02d}", page_count=10
+            )
+            for i in range(10)
+        ]
+        return [Loan.objects.create(user=user, book=book) for book in books]
+
+    @pytest.fixture(params=[True, False], ids=["compiled", "serializer"])
+    def compiled(self, request, monkeypatch) -> bool:
+        """Run the test with and without the compiled list serializer."""
+        if not request.param:
+            monkeypatch.setattr("core.mixins.compile_serializer", lambda *args, **kwargs: None)
+        return request.param
+
+    @pytest.mark.django_db
+    def test_loan_list(
+        self, authenticated_client, loans: list, compiled: bool, django_assert_num_queries
+    ) -> None:
+        """Test loans with nested users and books are listed in one query."""
+        with django_assert_num_queries(1):
+            response = authenticated_client.get(reverse("loans:loan-list"), {"page_size": 10})
+        assert len(response.data["results"]) == 10
+
+    @pytest.mark.django_db
+    def test_loan_detail(
+        self, authenticated_client, loans: list, django_assert_num_queries
+    ) -> None:
+        """Test a loan with its user and book is read in one query."""
+        with django_assert_num_queries(1):
+            authenticated_client.get(reverse("loans:loan-detail", kwargs={"pk": loans[0].id}))
+
+    @pytest.mark.django_db
+    def test_user_loan_history(
+        self,
+        authenticated_client,
+        user: User,
+        loans: list,
+        compiled: bool,
+        django_assert_num_queries,
+    ) -> None:
+        """Test a user's loan history costs the user lookup and one page query."""
+        url = reverse("users:user-loan_history", kwargs={"pk": user.id})
+        with django_assert_num_queries(2):
+            response = authenticated_client.get(url, {"page_size": 5})
+        assert len(response.data["results"]) == 5
+        with django_assert_num_queries(2):
+            authenticated_client.get(response.data["next"])
+
+    @pytest.mark.django_db
+    def test_book_loan_history(
+        self, admin_client, user: User, compiled: bool, django_assert_num_queries
+    ) -> None:
+        """Test a book's loan history costs the book lookup and one page query."""
+        book = Book.objects.create(
+            title="Popular", author="Author", isbn="4000000000", page_count=1
+        )
+        for i in range(10):
+            borrower = User.objects.create_user(username=f"reader{i}", password="pass12345")
+            Loan.objects.create(user=borrower, book=book, returned_at=timezone.now())
+        url = reverse("books:book-loan_history", kwargs={"pk": book.id})
+        with django_assert_num_queries(2):
+            response = admin_client.get(url, {"page_size": 5})
+        assert len(response.data["results"]) == 5
+        assert response.data["next"] is not None
+
+
+class TestLoanBatchAPI:
+    """Tests for the batch borrow and return endpoint."""
+
+    @pytest.mark.django_db
+    def test_batch_borrow_and_return(
+        self, authenticated_client, book: Book, unavailable_book: Book
+    ) -> None:
+        """Test per-book outcomes are reported for borrows and returns."""
+        url = reverse("loans:loan-batch")
+        data = {"action": "borrow", "book_ids": [book.id, unavailable_book.id]}
+        response = authenticated_client.post(url, data, format="json")
+        assert response.status_code == status.HTTP_200_OK
+        first, second = response.data["results"]
+        assert first["success"] is True
+        assert first["loan_id"] == Loan.objects.get(book=book).id
+        assert "borrowed_at" in first
+        assert second == {
+            "book_id": unavailable_book.id,
+            "success": False,
+            "error": 'Book "Unavailable Book" is not available for borrowing.',
+        }
+
+        data = {"action": "return", "book_ids": [book.id]}
+        response = authenticated_client.post(url, data, format="json")
+        assert response.data["results"][0]["success"] is True
+        assert response.data["results"][0]["returned_at"] is not None
+
+    @pytest.mark.django_db
+    def test_batch_validation(self, authenticated_client) -> None:
+        """Test the action and the number of books are validated."""
+        url = reverse("loans:loan-batch")
+        response = authenticated_client.post(
+            url, {"action": "renew", "book_ids": []}, format="json"
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert set(response.data) == {"action", "book_ids"}
+
+    @pytest.mark.django_db
+    def test_batch_requires_authentication(self, api_client, book: Book) -> None:
+        """Test anonymous users cannot borrow books in batches."""
+        response = api_client.post(
+            reverse("loans:loan-batch"), {"action": "borrow", "book_ids": [book.id]}, format="json"
+        )
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+class TestLoanStatsAPI:
+    """Tests for the circulation statistics endpoint."""
+
+    @pytest.mark.django_db
+    def test_stats(self, admin_client, book: Book) -> None:
+        """Test statistics of today's borrows are served to admins."""
+        admin_client.post(reverse("books:book-borrow", kwargs={"pk": book.id}))
+        today = timezone.localdate()
+        response = admin_client.get(
+            reverse("loans:loan-stats"), {"start": today, "end": today, "top": 5}
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["borrows"] == 1
+        assert response.data["series"] == [{"period": today, "borrows": 1, "returns": 0}]
+        assert response.data["top_books"][0]["book_id"] == book.id
+
+    @pytest.mark.django_db
+    def test_defaults_and_validation(self, admin_client) -> None:
+        """Test the range defaults to 30 days and inverted ranges are rejected."""
+        url = reverse("loans:loan-stats")
+        response = admin_client.get(url)
+        assert len(response.data["series"]) == 30
+        response = admin_client.get(url, {"start": "2026-02-01", "end": "2026-01-01"})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        response = admin_client.get(url, {"granularity": "year"})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    @pytest.mark.django_db
+    def test_admin_only(self, authenticated_client) -> None:
+        """Test regular users can't read circulation statistics."""
+        response = authenticated_client.get(reverse("loans:loan-stats"))
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+class TestIdempotencyAPI:
+    """Tests for Idempotency-Key support on borrow and return."""
+
+    @pytest.mark.django_db
+    def test_borrow_retry_replayed(self, authenticated_client, book: Book) -> None:
+        """Test a retried borrow gets the first response instead of an error."""
+        url = reverse("books:book-borrow", kwargs={"pk": book.id})
+        first = authenticated_client.post(url, HTTP_IDEMPOTENCY_KEY="kiosk-1")
+        retry = authenticated_client.post(url, HTTP_IDEMPOTENCY_KEY="kiosk-1")
+        assert first.status_code == retry.status_code == status.HTTP_201_CREATED
+        assert retry.data["loan_id"] == first.data["loan_id"]
+        assert retry["Idempotent-Replayed"] == "true"
+        assert "Idempotent-Replayed" not in first
+        assert Loan.objects.count() == 1
+
+        response = authenticated_client.post(url)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    @pytest.mark.django_db
+    def test_return_retry_replayed(self, authenticated_client, book: Book) -> None:
+        """Test a retried return gets the first response instead of an error."""
+        authenticated_client.post(reverse("books:book-borrow", kwargs={"pk": book.id}))
+        url = reverse("books:book-return_book", kwargs={"pk": book.id})
+        first = authenticated_client.post(url, HTTP_IDEMPOTENCY_KEY="kiosk-2")
+        retry = authenticated_client.post(url, HTTP_IDEMPOTENCY_KEY="kiosk-2")
+        assert first.status_code == retry.status_code == status.HTTP_200_OK
+        assert retry.data == first.data
+
+    @pytest.mark.django_db
+    def test_key_reused_for_other_payload(self, authenticated_client, book: Book) -> None:
+        """Test a key can't be reused for a different batch."""
+        url = reverse("loans:loan-batch")
+        data = {"action": "borrow", "book_ids": [book.id]}
+        authenticated_client.post(url, data, format="json", HTTP_IDEMPOTENCY_KEY="batch-1")
+        data = {"action": "return", "book_ids": [book.id]}
+        response = authenticated_client.post(
+            url, data, format="json", HTTP_IDEMPOTENCY_KEY="batch-1"
+        )
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+        assert Loan.objects.get().returned_at is None
+
+    @pytest.mark.django_db
+    def test_keys_scoped_per_user(self, authenticated_client, book: Book) -> None:
+        """Test another user's request with the same key is not replayed."""
+        url = reverse("books:book-borrow", kwargs={"pk": book.id})
+        authenticated_client.post(url, HTTP_IDEMPOTENCY_KEY="shared")
+        other = APIClient()
+        other.force_authenticate(user=User.objects.create_user("other", password="pass12345"))
+        response = other.post(url, HTTP_IDEMPOTENCY_KEY="shared")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert "Idempotent-Replayed" not in response
+
+    @pytest.mark.django_db
+    def test_request_in_progress(self, authenticated_client, book: Book, monkeypatch) -> None:
+        """Test a repeat arriving while the first request runs is rejected."""
+        monkeypatch.setattr("core.idempotency.cache.add", lambda *args, **kwargs: False)
+        url = reverse("books:book-borrow", kwargs={"pk": book.id})
+        response = authenticated_client.post(url, HTTP_IDEMPOTENCY_KEY="busy")
+        assert response.status_code == status.HTTP_409_CONFLICT
+        assert Loan.objects.exists() is False
+
+    @pytest.mark.django_db
+    def test_retry_locking_after_first_finished(
+        self, authenticated_client, book: Book, monkeypatch
+    ) -> None:
+        """Test a retry that missed the response but locks after it was stored replays it."""
+        url = reverse("books:book-borrow", kwargs={"pk": book.id})
+        first = authenticated_client.post(url, HTTP_IDEMPOTENCY_KEY="racing")
+
+        # The retry's first read ran while the first request was still in flight
+        cache_get = cache.get
+        reads = []
+
+        def get(key, *args, **kwargs):
+            reads.append(key)
+            return None if len(reads) == 1 else cache_get(key, *args, **kwargs)
+
+        monkeypatch.setattr("core.idempotency.cache.get", get)
+        retry = authenticated_client.post(url, HTTP_IDEMPOTENCY_KEY="racing")
+        assert retry.status_code == status.HTTP_201_CREATED
+        assert retry.data == first.data
+        assert retry["Idempotent-Replayed"] == "true"
+        assert Loan.objects.count() == 1
+
+        monkeypatch.undo()
+        replay = authenticated_client.post(url, HTTP_IDEMPOTENCY_KEY="racing")
+        assert replay.status_code == status.HTTP_201_CREATED
+
+
+class TestThrottlingAPI:
+    """Tests for the per-view throttle scopes."""
+
+    @pytest.fixture(autouse=True)
+    def frozen_window(self, monkeypatch) -> None:
+        """Keep every request in the same throttle window."""
+        monkeypatch.setattr("core.throttling.CounterRateThrottle.timer", lambda self: 1200.0)
+
+    @pytest.mark.django_db
+    def test_login_throttled(self, api_client, user: User, monkeypatch) -> None:
+        """Test login attempts beyond the login rate are refused."""
+        monkeypatch.setitem(ScopedRateThrottle.THROTTLE_RATES, "login", "3/minute")
+        url = reverse("users:login")
+        for _ in range(3):
+            response = api_client.post(url, {"username": "testuser", "password": "wrong"})
+            assert response.status_code == status.HTTP_401_UNAUTHORIZED
+        response = api_client.post(url, {"username": "testuser", "password": "testpass123"})
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        assert "Retry-After" in response
+
+    @pytest.mark.django_db
+    def test_book_reads_use_own_scope(self, authenticated_client, book: Book, monkeypatch) -> None:
+        """Test book reads are counted at the books_read rate, not the user rate."""
+        # The throttle classes share the rates setting
+        monkeypatch.setitem(ScopedRateThrottle.THROTTLE_RATES, "books_read", "2/minute")
+        monkeypatch.setitem(ScopedRateThrottle.THROTTLE_RATES, "user", "1/minute")
+        url = reverse("books:book-list")
+        assert authenticated_client.get(url).status_code == status.HTTP_200_OK
+        assert authenticated_client.get(url).status_code == status.HTTP_200_OK
+        assert authenticated_client.get(url).status_code == status.HTTP_429_TOO_MANY_REQUESTS
+
+
+class TestLoginGuardAPI:
+    """Tests for the lockout after failed logins."""
+
+    @pytest.mark.django_db
+    def test_locked_out_before_password_check(
+        self, api_client, user: User, settings, monkeypatch
+    ) -> None:
+        """Test a locked out username is rejected without checking the password."""
+        settings.LOGIN_GUARD_USER_FAILURES = 2
+        url = reverse("users:login")
+        for _ in range(2):
+            response = api_client.post(url, {"username": "testuser", "password": "wrong"})
+            assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+        def authenticate(*args, **kwargs):
+            raise AssertionError("Password checked while locked out")
+
+        monkeypatch.setattr("rest_framework_simplejwt.serializers.authenticate", authenticate)
+        response = api_client.post(url, {"username": "testuser", "password": "testpass123"})
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        assert int(response["Retry-After"]) >= 1
+
+    @pytest.mark.django_db
+    def test_success_resets_failures(self, api_client, user: User, settings) -> None:
+        """Test failures before a successful login don't count towards a lockout."""
+        settings.LOGIN_GUARD_USER_FAILURES = 2
+        url = reverse("users:login")
+        api_client.post(url, {"username": "testuser", "password": "wrong"})
+        response = api_client.post(url, {"username": "testuser", "password": "testpass123"})
+        assert response.status_code == status.HTTP_200_OK
+        api_client.post(url, {"username": "testuser", "password": "wrong"})
+        response = api_client.post(url, {"username": "testuser", "password": "testpass123"})
+        assert response.status_code == status.HTTP_200_OK
+
+    @pytest.mark.django_db
+    def test_rejections_in_metrics(self, admin_client, user: User, settings) -> None:
+        """Test lockouts and rejected attempts are reported by the metrics endpoint."""
+        settings.LOGIN_GUARD_USER_FAILURES = 1
+        url = reverse("users:login")
+        client = APIClient()
+        client.post(url, {"username": "testuser", "password": "wrong"})
+        client.post(url, {"username": "testuser", "password": "wrong"})
+        response = admin_client.get(reverse("metrics"))
+        assert response.data["users.login_guard.lockouts"] == 1
+        assert response.data["users.login_guard.rejections"] == 1
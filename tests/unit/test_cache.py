@@ -0,0 +1,360 @@
+"""
+Unit tests for caching helpers.
+"""
+
+import threading
+import time
+
+from django.core.cache import cache
+from django.http import QueryDict
+
+import pytest
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from books.cache import book_detail_cache, get_book_entry
+from books.models import Book
+from core.cache import (
+    STALE_GRACE,
+    BloomFilter,
+    LocalLRUCache,
+    TieredCache,
+    bump_version,
+    get_or_compute,
+    get_version,
+    normalize_query,
+    should_refresh,
+)
+from core.metrics import counter, snapshot
+from loans.services import LoanService
+from users.blacklist import TokenBlacklist
+from users.login_guard import LoginGuard
+
+
+class TestNormalizeQuery:
+    """Tests for normalize_query."""
+
+    def test_equivalent_queries_match(self) -> None:
+        """Test parameter order, blanks and ordering whitespace don't matter."""
+        first = QueryDict("ordering=title,%20-created_at&is_available=true&search=")
+        second = QueryDict("is_available=true&ordering=title,-created_at")
+        assert normalize_query(first) == normalize_query(second)
+        assert normalize_query(first) != normalize_query(QueryDict("is_available=false"))
+
+
+class TestMetrics:
+    """Tests for metrics counters."""
+
+    def test_counters_in_snapshot(self) -> None:
+        """Test registered counters are reported with their values."""
+        hits = counter("test.hits")
+        assert counter("test.hits") is hits
+        hits.incr()
+        hits.incr(2)
+        assert hits.value() == 3
+        assert snapshot()["test.hits"] == 3
+
+
+class TestVersionCounters:
+    """Tests for version counters."""
+
+    def test_bump_changes_version(self) -> None:
+        """Test bumping advances the counter, also after eviction."""
+        version = get_version("test:version")
+        assert bump_version("test:version") == version + 1
+        cache.delete("test:version")
+        assert bump_version("test:version") > version + 1
+
+
+class TestGetOrCompute:
+    """Tests for single-flight recomputation and early refresh."""
+
+    def test_computes_once_under_concurrency(self) -> None:
+        """Test concurrent misses on one key run the computation once."""
+        calls = []
+        results = []
+
+        def compute() -> str:
+            calls.append(1)
+            time.sleep(0.1)
+            return "value"
+
+        def worker() -> None:
+            results.append(get_or_compute("test:herd", compute, 60))
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(calls) == 1
+        assert results == ["value"] * 8
+
+    def test_stale_value_served_while_recomputing(self) -> None:
+        """Test an expired value is served while another caller holds the lock."""
+        cache.set("test:stale", {"value": "old", "delta": 0, "expires_at": time.time() - 1})
+        cache.add("test:stale:lock", 1)
+        assert get_or_compute("test:stale", lambda: "new", 60) == "old"
+        cache.delete("test:stale:lock")
+        assert get_or_compute("test:stale", lambda: "new", 60) == "new"
+        assert get_or_compute("test:stale", lambda: "newer", 60) == "new"
+
+    def test_missing_values_not_cached(self) -> None:
+        """Test ``None`` results are recomputed on every call."""
+        calls = []
+        for _ in range(2):
+            assert get_or_compute("test:none", lambda: calls.append(1), 60) is None
+        assert len(calls) == 2
+
+    def test_early_refresh_probability(self) -> None:
+        """Test slow values close to expiry are refreshed early, fresh ones are not."""
+        now = time.time()
+        assert not should_refresh({"delta": 0.0, "expires_at": now + 60}, now)
+        assert should_refresh({"delta": 0.0, "expires_at": now}, now)
+        near_expiry = {"delta": 10.0, "expires_at": now + 1}
+        refreshes = sum(should_refresh(near_expiry, now) for _ in range(200))
+        assert 100 < refreshes < 200
+
+
+class TestLocalLRUCache:
+    """Tests for LocalLRUCache."""
+
+    def test_evicts_least_recently_used(self) -> None:
+        """Test the oldest unused entry is evicted first."""
+        lru = LocalLRUCache(maxsize=2)
+        lru.set("a", 1, ttl=60)
+        lru.set("b", 2, ttl=60)
+        lru.get("a")
+        lru.set("c", 3, ttl=60)
+        assert lru.get("a") == 1
+        assert lru.get("b") is None
+        assert lru.get("c") == 3
+
+    def test_entries_expire(self) -> None:
+        """Test entries are dropped once their TTL has passed."""
+        lru = LocalLRUCache(maxsize=2)
+        lru.set("a", 1, ttl=0)
+        assert lru.get("a") is None
+
+
+class TestBloomFilter:
+    """Tests for BloomFilter."""
+
+    def test_no_false_negatives(self) -> None:
+        """Test added items are always found and few others are."""
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        for i in range(1000):
+            bloom.add(f"added-{i}")
+        assert all(f"added-{i}" in bloom for i in range(1000))
+        false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+        assert false_positives < 300
+
+
+class TestTokenBlacklist:
+    """Tests for TokenBlacklist."""
+
+    def test_revoke_once(self) -> None:
+        """Test a token can only be revoked once and is then reported revoked."""
+        blacklist = TokenBlacklist()
+        token = RefreshToken()
+        assert blacklist.is_revoked(token, strict=True) is False
+        assert blacklist.revoke(token) is True
+        assert blacklist.revoke(token) is False
+        assert blacklist.is_revoked(token, strict=True) is True
+
+    def test_filter_skips_cache_for_unrevoked_tokens(self, monkeypatch) -> None:
+        """Test tokens missing from the filter are accepted without a cache lookup."""
+        blacklist = TokenBlacklist()
+        blacklist.sync()
+        lookups = []
+        monkeypatch.setattr("users.blacklist.cache.get", lambda *args: lookups.append(args))
+        assert blacklist.is_revoked(AccessToken()) is False
+        assert lookups == []
+
+    def test_revocations_synced_between_processes(self, settings) -> None:
+        """Test another process learns about revoked access tokens from the log."""
+        settings.TOKEN_BLACKLIST_SYNC_INTERVAL = 0
+        here, elsewhere = TokenBlacklist(), TokenBlacklist()
+        token = AccessToken()
+        assert elsewhere.is_revoked(token) is False
+        here.revoke(token)
+        assert elsewhere.is_revoked(token) is True
+        cache.clear()
+        assert elsewhere.is_revoked(token) is False
+
+    def test_revocation_logged_after_sync(self, settings, monkeypatch) -> None:
+        """Test a revocation numbered before a sync but written after it is picked up later."""
+        settings.TOKEN_BLACKLIST_SYNC_INTERVAL = 0
+        here, elsewhere = TokenBlacklist(), TokenBlacklist()
+        elsewhere.sync()
+        token = AccessToken()
+
+        # The other process syncs between taking the log number and writing the entry
+        next_sequence = TokenBlacklist.next_sequence
+
+        def numbered_then_synced() -> int:
+            number = next_sequence()
+            elsewhere.sync()
+            return number
+
+        monkeypatch.setattr(here, "next_sequence", numbered_then_synced)
+        here.revoke(token)
+        assert elsewhere.is_revoked(token) is True
+
+
+class TestLoginGuard:
+    """Tests for LoginGuard."""
+
+    @pytest.fixture(autouse=True)
+    def thresholds(self, settings) -> None:
+        settings.LOGIN_GUARD_USER_FAILURES = 3
+        settings.LOGIN_GUARD_IP_FAILURES = 10
+        settings.LOGIN_GUARD_BASE_DELAY = 10
+        settings.LOGIN_GUARD_MAX_DELAY = 30
+
+    def test_locks_out_username_with_backoff(self) -> None:
+        """Test a username is locked out at the threshold, for doubling delays."""
+        guard = LoginGuard()
+        for _ in range(2):
+            guard.record_failure("alice", "10.0.0.1")
+        assert guard.retry_after("alice", "10.0.0.2") is None
+        guard.record_failure("alice", "10.0.0.1")
+        assert guard.retry_after("Alice", "10.0.0.2") == 10
+        guard.record_failure("alice", "10.0.0.1")
+        assert guard.retry_after("alice", "10.0.0.2") == 20
+        guard.record_failure("alice", "10.0.0.1")
+        assert guard.retry_after("alice", "10.0.0.2") == 30
+        assert counter("users.login_guard.rejections").value() == 3
+        assert counter("users.login_guard.lockouts").value() == 3
+
+    def test_locks_out_address(self) -> None:
+        """Test an address guessing many usernames is locked out."""
+        guard = LoginGuard()
+        for i in range(10):
+            guard.record_failure(f"user{i}", "10.0.0.1")
+        assert guard.retry_after("someone", "10.0.0.1") == 10
+        assert guard.retry_after("someone", "10.0.0.2") is None
+
+    def test_success_clears_username(self) -> None:
+        """Test a successful login clears the username's failures."""
+        guard = LoginGuard()
+        for _ in range(3):
+            guard.record_failure("alice", "10.0.0.1")
+        guard.record_success("alice", "10.0.0.1")
+        assert guard.retry_after("alice", None) is None
+        guard.record_failure("alice", "10.0.0.1")
+        assert guard.retry_after("alice", None) is None
+
+
+class TestTieredCache:
+    """Tests for TieredCache."""
+
+    def test_read_through(self) -> None:
+        """Test values are loaded once and then served from the tiers."""
+        tiered = TieredCache("test", maxsize=10, timeout=60, local_ttl=60)
+        calls = []
+
+        def loader() -> str:
+            calls.append(1)
+            return "value"
+
+        assert tiered.get_or_load(1, loader) == "value"
+        assert tiered.get_or_load(1, loader) == "value"
+        tiered.local.clear()
+        assert tiered.get_or_load(1, loader) == "value"
+        assert len(calls) == 1
+
+        tiered.delete(1)
+        assert tiered.get_or_load(1, loader) == "value"
+        assert len(calls) == 2
+
+    def test_missing_values_not_cached(self) -> None:
+        """Test ``None`` results are not stored."""
+        tiered = TieredCache("test", maxsize=10, timeout=60, local_ttl=60)
+        assert tiered.get_or_load(1, lambda: None) is None
+        assert tiered.get_or_load(1, lambda: "value") == "value"
+
+    def test_load_racing_invalidation_not_served(self) -> None:
+        """Test a value loaded before an invalidation isn't served after it."""
+        tiered = TieredCache("test", maxsize=10, timeout=60, local_ttl=60, versioned=True)
+
+        def stale_loader() -> str:
+            # The writer commits while the old row is being loaded
+            tiered.delete(1)
+            return "old"
+
+        assert tiered.get_or_load(1, stale_loader) == "old"
+        assert tiered.get_or_load(1, lambda: "new") == "new"
+        tiered.local.clear()
+        assert tiered.get_or_load(1, lambda: "newer") == "new"
+
+    def test_delete_many(self) -> None:
+        """Test many keys are invalidated at once, versioned or not."""
+        for versioned in (False, True):
+            tiered = TieredCache("test", maxsize=10, timeout=60, local_ttl=60, versioned=versioned)
+            for key in (1, 2, 3):
+                tiered.get_or_load(key, lambda: "old")
+            tiered.delete_many([1, 2])
+            assert [tiered.get_or_load(key, lambda: "new") for key in (1, 2, 3)] == [
+                "new",
+                "new",
+                "old",
+            ]
+
+    def test_versioned_local_miss_reads_once(self, monkeypatch) -> None:
+        """Test a local miss reads the version and entry in one round trip, and versions expire."""
+        tiered = TieredCache("test", maxsize=10, timeout=60, local_ttl=60, versioned=True)
+        tiered.get_or_load(1, lambda: "value")
+        tiered.local.clear()
+        calls = []
+
+        class Recorder:
+            def __getattr__(self, name):
+                method = getattr(cache, name)
+
+                def record(*args, **kwargs):
+                    calls.append((name, kwargs.get("timeout")))
+                    return method(*args, **kwargs)
+
+                return record
+
+        monkeypatch.setattr("core.cache.cache", Recorder())
+        assert tiered.get_or_load(1, lambda: "other") == "value"
+        assert [name for name, _ in calls] == ["get_many"]
+
+        calls.clear()
+        cache.clear()
+        tiered.local.clear()
+        assert tiered.get_or_load(1, lambda: "other") == "other"
+        assert ("add", 60 + STALE_GRACE) in calls
+
+
+class TestBookDetailCache:
+    """Tests for the book detail cache."""
+
+    @pytest.mark.django_db
+    def test_cached_read_skips_database(self, book: Book, django_assert_num_queries) -> None:
+        """Test a cached book is served without queries."""
+        get_book_entry(book.id)
+        with django_assert_num_queries(0):
+            assert get_book_entry(book.id)["data"]["title"] == book.title
+
+    @pytest.mark.django_db
+    def test_invalidated_on_save_and_delete(self, book: Book) -> None:
+        """Test writes drop the cached book."""
+        get_book_entry(book.id)
+        book.title = "Changed"
+        book.save()
+        assert get_book_entry(book.id)["data"]["title"] == "Changed"
+        book_id = book.id
+        book.delete()
+        assert get_book_entry(book_id) is None
+        assert book_detail_cache.local.get(book_detail_cache.make_key(book_id)) is None
+
+    @pytest.mark.django_db
+    def test_invalidated_on_borrow_and_return(self, user, book: Book) -> None:
+        """Test availability flips done by LoanService drop the cached book."""
+        assert get_book_entry(book.id)["data"]["is_available"] is True
+        LoanService.borrow_book(user=user, book=book)
+        assert get_book_entry(book.id)["data"]["is_available"] is False
+        LoanService.return_book(user=user, book=book)
+        assert get_book_entry(book.id)["data"]["is_available"] is True
@@ -0,0 +1,142 @@
+"""
+Unit tests for filters.
+"""
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import FloatField, Value
+
+import pytest
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from books.filters import BookFuzzySearchFilter, BookOrderingFilter, BookSearchFilter
+from books.models import Book
+from books.views import BookViewSet
+
+
+def make_request(params: dict) -> Request:
+    """Build a DRF request with the given query parameters."""
+    return Request(APIRequestFactory().get("/books/", params))
+
+
+class TestBookSearchFilter:
+    """Tests for BookSearchFilter."""
+
+    @pytest.mark.django_db
+    def test_falls_back_to_icontains(self, book: Book) -> None:
+        """Test non-PostgreSQL backends use the default search."""
+        Book.objects.create(title="Other", author="Someone", isbn="1111111111", page_count=10)
+        queryset = BookSearchFilter().filter_queryset(
+            make_request({"search": "test"}), Book.objects.all(), BookViewSet()
+        )
+        assert list(queryset) == [book]
+
+    @pytest.mark.django_db
+    def test_ranks_matches(self, require_postgres: None, book: Book) -> None:
+        """Test PostgreSQL full-text search ranks title matches above author matches."""
+        by_author = Book.objects.create(
+            title="Unrelated", author="Gatsby Fan", isbn="1111111111", page_count=10
+        )
+        by_title = Book.objects.create(
+            title="The Great Gatsby", author="Fitzgerald", isbn="2222222222", page_count=10
+        )
+        request = make_request({"search": "gatsby"})
+        queryset = BookSearchFilter().filter_queryset(request, Book.objects.all(), BookViewSet())
+        queryset = BookOrderingFilter().filter_queryset(request, queryset, BookViewSet())
+        assert list(queryset) == [by_title, by_author]
+
+    @pytest.mark.django_db
+    def test_matches_isbn(self, require_postgres: None, book: Book) -> None:
+        """Test PostgreSQL full-text search still matches an exact ISBN."""
+        queryset = BookSearchFilter().filter_queryset(
+            make_request({"search": "123-456-7890"}), Book.objects.all(), BookViewSet()
+        )
+        assert list(queryset) == [book]
+
+
+class TestBookFuzzySearchFilter:
+    """Tests for BookFuzzySearchFilter."""
+
+    @pytest.mark.django_db
+    def test_without_parameter(self, book: Book) -> None:
+        """Test the queryset is untouched without the fuzzy parameter."""
+        queryset = Book.objects.all()
+        filtered = BookFuzzySearchFilter().filter_queryset(
+            make_request({}), queryset, BookViewSet()
+        )
+        assert filtered is queryset
+
+    @pytest.mark.django_db
+    def test_falls_back_to_icontains(self, book: Book) -> None:
+        """Test non-PostgreSQL backends match title or author substrings."""
+        queryset = BookFuzzySearchFilter().filter_queryset(
+            make_request({"fuzzy": "author"}), Book.objects.all(), BookViewSet()
+        )
+        assert list(queryset) == [book]
+
+    @pytest.mark.django_db
+    def test_tolerates_typos(self, require_postgres: None, book: Book) -> None:
+        """Test PostgreSQL trigram search matches a misspelled author."""
+        fitzgerald = Book.objects.create(
+            title="The Great Gatsby", author="F. Scott Fitzgerald", isbn="1111111111", page_count=10
+        )
+        request = make_request({"fuzzy": "Fitzgerlad"})
+        queryset = BookFuzzySearchFilter().filter_queryset(
+            request, Book.objects.all(), BookViewSet()
+        )
+        queryset = BookOrderingFilter().filter_queryset(request, queryset, BookViewSet())
+        assert list(queryset) == [fitzgerald]
+
+    @pytest.mark.django_db
+    def test_threshold_set_per_connection(
+        self, require_postgres: None, book: Book, django_assert_num_queries
+    ) -> None:
+        """Test the similarity threshold is a connection setting, not a query per search."""
+        with connection.cursor() as cursor:
+            cursor.execute("SHOW pg_trgm.word_similarity_threshold")
+            assert float(cursor.fetchone()[0]) == settings.BOOK_FUZZY_SEARCH_THRESHOLD
+        with django_assert_num_queries(1):
+            list(
+                BookFuzzySearchFilter().filter_queryset(
+                    make_request({"fuzzy": "Tset"}), Book.objects.all(), BookViewSet()
+                )
+            )
+
+
+class TestBookOrderingFilter:
+    """Tests for BookOrderingFilter."""
+
+    @pytest.mark.django_db
+    def test_default_ordering_without_rank(self) -> None:
+        """Test the view ordering is used for unranked querysets."""
+        ordering = BookOrderingFilter().get_ordering(
+            make_request({}), Book.objects.all(), BookViewSet()
+        )
+        assert tuple(ordering) == ("-created_at", "id")
+
+    @pytest.mark.django_db
+    def test_rank_first_for_ranked_queryset(self) -> None:
+        """Test ranked querysets are ordered by relevance first."""
+        queryset = Book.objects.annotate(search_rank=Value(1.0, output_field=FloatField()))
+        ordering = BookOrderingFilter().get_ordering(make_request({}), queryset, BookViewSet())
+        assert tuple(ordering) == ("-search_rank", "-created_at", "id")
+
+    @pytest.mark.django_db
+    def test_all_ranks_before_default_ordering(self) -> None:
+        """Test full-text rank precedes fuzzy rank when both searches are used."""
+        queryset = Book.objects.annotate(
+            fuzzy_rank=Value(0.5, output_field=FloatField()),
+            search_rank=Value(1.0, output_field=FloatField()),
+        )
+        ordering = BookOrderingFilter().get_ordering(make_request({}), queryset, BookViewSet())
+        assert tuple(ordering) == ("-search_rank", "-fuzzy_rank", "-created_at", "id")
+
+    @pytest.mark.django_db
+    def test_explicit_ordering_wins_over_rank(self) -> None:
+        """Test an explicit ordering parameter replaces relevance ordering."""
+        queryset = Book.objects.annotate(search_rank=Value(1.0, output_field=FloatField()))
+        ordering = BookOrderingFilter().get_ordering(
+            make_request({"ordering": "title"}), queryset, BookViewSet()
+        )
+        assert tuple(ordering) == ("title",)
@@ -3,7 +3,8 @@ Unit tests for models.
 """
 
 from django.contrib.auth import get_user_model
-from django.db import IntegrityError
+from django.db import IntegrityError, connection
+from django.utils import timezone
 
 import pytest
 
@@ -102,3 +103,36 @@ class TestLoanModel:
         loan.returned_at = timezone.now()
         loan.save()
         assert loan.is_active is False
+
+
+class TestLoanIndexes:
+    """EXPLAIN checks that the loan queries use their indexes."""
+
+    @pytest.fixture
+    def loans(self, user: User, book: Book) -> None:
+        """Create returned loans and one active loan."""
+        for _ in range(20):
+            Loan.objects.create(user=user, book=book, returned_at=timezone.now())
+        Loan.objects.create(user=user, book=book)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE loans")
+
+    @pytest.mark.django_db
+    def test_active_loan_of_user(self, explain, loans: None, user: User, book: Book) -> None:
+        """Test a user's active loan of a book is found through the partial index."""
+        queryset = Loan.objects.filter(user=user, book=book, returned_at__isnull=True)
+        assert "loans_user_active_idx" in explain(queryset)
+
+    @pytest.mark.django_db
+    def test_active_loan_of_book(self, explain, loans: None, book: Book) -> None:
+        """Test a book's active loan is found through the partial unique index."""
+        queryset = Loan.objects.filter(book=book, returned_at__isnull=True)
+        assert "loans_one_active_per_book" in explain(queryset)
+
+    @pytest.mark.django_db
+    def test_user_history_page(self, explain, loans: None, user: User) -> None:
+        """Test a page of a user's loan history is read in index order."""
+        queryset = Loan.objects.filter(user=user).order_by("-borrowed_at", "id")[:10]
+        plan = explain(queryset)
+        assert "loans_user_borrowed_idx" in plan
+        assert "Sort" not in plan
@@ -0,0 +1,181 @@
+"""
+Unit tests for pagination.
+"""
+
+from urllib.parse import parse_qs, urlparse
+
+from django.db import connection
+from django.test import override_settings
+from django.utils import timezone
+
+import pytest
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from books.models import Book
+from books.views import BookViewSet
+from core.db import estimated_count
+from core.pagination import (
+    CursorOrPageNumberPagination,
+    EstimatedCountPaginator,
+    KeysetCursorPagination,
+)
+
+
+def make_request(params: dict) -> Request:
+    """Build a DRF request with the given query parameters."""
+    return Request(APIRequestFactory().get("/books/", params))
+
+
+def make_view(request: Request) -> BookViewSet:
+    """Build a book view bound to the request."""
+    view = BookViewSet()
+    view.request = request
+    return view
+
+
+def cursor_from(link: str) -> str:
+    """Extract the cursor parameter from a pagination link."""
+    return parse_qs(urlparse(link).query)["cursor"][0]
+
+
+@pytest.fixture
+def books() -> list:
+    """Create five books sharing the same creation timestamp, newest id last."""
+    created_at = timezone.now()
+    books = [
+        Book.objects.create(
+            title=f"Book {i}", author="Author", isbn=f"100000000{i}", page_count=10 + i
+        )
+        for i in range(5)
+    ]
+    Book.objects.update(created_at=created_at)
+    return books
+
+
+class TestKeysetCursorPagination:
+    """Tests for KeysetCursorPagination."""
+
+    def paginate(self, params: dict) -> tuple:
+        request = make_request(params)
+        paginator = KeysetCursorPagination()
+        paginator.page_size = 2
+        page = paginator.paginate_queryset(Book.objects.all(), request, make_view(request))
+        return paginator, page
+
+    @pytest.mark.django_db
+    def test_appends_tie_breaker(self) -> None:
+        """Test the ordering is made unique with the primary key."""
+        request = make_request({"ordering": "title"})
+        ordering = KeysetCursorPagination().get_ordering(
+            request, Book.objects.all(), make_view(request)
+        )
+        assert ordering == ("title", "id")
+
+    @pytest.mark.django_db
+    def test_walks_ties_forward_and_back(self, books: list) -> None:
+        """Test pages with identical timestamps neither skip nor repeat rows."""
+        paginator, page = self.paginate({})
+        seen = list(page)
+        assert paginator.get_previous_link() is None
+        while paginator.get_next_link():
+            last_paginator = paginator
+            paginator, page = self.paginate({"cursor": cursor_from(paginator.get_next_link())})
+            seen.extend(page)
+        assert seen == sorted(books, key=lambda book: book.id)
+
+        previous, page = self.paginate({"cursor": cursor_from(paginator.get_previous_link())})
+        assert page == last_paginator.page
+        assert previous.get_next_link() is not None
+
+    @pytest.mark.django_db
+    def test_page_size_capped(self, books: list) -> None:
+        """Test the client page size is honoured up to the maximum."""
+        _, page = self.paginate({"page_size": 3})
+        assert len(page) == 3
+        request = make_request({"page_size": 1000})
+        assert KeysetCursorPagination().get_page_size(request) == 100
+
+    @pytest.mark.django_db
+    def test_invalid_cursor(self, books: list) -> None:
+        """Test a malformed cursor position is rejected."""
+        paginator = KeysetCursorPagination()
+        with pytest.raises(NotFound):
+            paginator.get_keyset_filter(("-created_at", "id"), "not json")
+        with pytest.raises(NotFound):
+            paginator.get_keyset_filter(("-created_at", "id"), '["only one"]')
+
+
+class TestCursorOrPageNumberPagination:
+    """Tests for CursorOrPageNumberPagination."""
+
+    @pytest.mark.django_db
+    def test_cursor_by_default(self, books: list) -> None:
+        """Test cursor pagination is used without a page parameter."""
+        request = make_request({})
+        paginator = CursorOrPageNumberPagination()
+        page = paginator.paginate_queryset(Book.objects.all(), request, make_view(request))
+        response = paginator.get_paginated_response([book.id for book in page])
+        assert "count" not in response.data
+        assert "cursor=" in response.data["next"]
+
+    @pytest.mark.django_db
+    def test_page_number_opt_in(self, books: list) -> None:
+        """Test clients sending a page parameter get page number pagination."""
+        request = make_request({"page": 2, "page_size": 2})
+        paginator = CursorOrPageNumberPagination()
+        page = paginator.paginate_queryset(Book.objects.order_by("id"), request, make_view(request))
+        response = paginator.get_paginated_response([book.id for book in page])
+        assert response.data["count"] == 5
+        assert response.data["results"] == [books[2].id, books[3].id]
+        assert "page=3" in response.data["next"]
+
+
+class TestEstimatedCountPaginator:
+    """Tests for EstimatedCountPaginator and estimated_count."""
+
+    @pytest.mark.django_db
+    def test_no_estimate_for_filtered_queryset(self) -> None:
+        """Test filtered querysets are never estimated."""
+        assert estimated_count(Book.objects.filter(is_available=True)) is None
+
+    @pytest.mark.django_db
+    def test_postgres_estimate(self, require_postgres: None, books: list) -> None:
+        """Test the estimate is read from pg_class once the table is analyzed."""
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE books")
+        assert estimated_count(Book.objects.all()) == 5
+
+    @pytest.mark.django_db
+    def test_exact_count_below_threshold(self, monkeypatch, books: list) -> None:
+        """Test small tables are counted exactly."""
+        monkeypatch.setattr("core.pagination.estimated_count", lambda queryset: 50)
+        paginator = EstimatedCountPaginator(Book.objects.all(), 2)
+        assert paginator.count == 5
+        assert paginator.count_is_estimate is False
+
+    @pytest.mark.django_db
+    @override_settings(ESTIMATED_COUNT_THRESHOLD=10)
+    def test_estimate_above_threshold(self, monkeypatch, books: list) -> None:
+        """Test large unfiltered tables use the estimate and keep the last page whole."""
+        monkeypatch.setattr("core.pagination.estimated_count", lambda queryset: 4)
+        paginator = EstimatedCountPaginator(Book.objects.order_by("id"), 2)
+        assert paginator.count == 5
+        monkeypatch.setattr("core.pagination.estimated_count", lambda queryset: 12)
+        paginator = EstimatedCountPaginator(Book.objects.order_by("id"), 4)
+        assert paginator.count == 12
+        assert paginator.count_is_estimate is True
+        assert list(paginator.page(2)) == [books[4]]
+
+    @pytest.mark.django_db
+    @override_settings(ESTIMATED_COUNT_THRESHOLD=1)
+    def test_response_flags_estimate(self, monkeypatch, books: list) -> None:
+        """Test page number responses report whether the count is estimated."""
+        monkeypatch.setattr("core.pagination.estimated_count", lambda queryset: 1000)
+        request = make_request({"page": 1})
+        paginator = CursorOrPageNumberPagination()
+        page = paginator.paginate_queryset(Book.objects.all(), request, make_view(request))
+        response = paginator.get_paginated_response([book.id for book in page])
+        assert response.data["count"] == 1000
+        assert response.data["count_is_estimate"] is True
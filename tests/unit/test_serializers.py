@@ -2,10 +2,21 @@
 Unit tests for serializers.
 """
 
+from django.contrib.auth import get_user_model
+
 import pytest
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
 
+from books.models import Book
 from books.serializers import BookSerializer
-from users.serializers import RegisterSerializer
+from core.serializers import compile_serializer
+from loans.models import Loan
+from loans.serializers import LoanSerializer
+from loans.services import LoanService
+from users.serializers import RegisterSerializer, UserSerializer
+
+User = get_user_model()
 
 
 class TestBookSerializer:
@@ -131,3 +142,78 @@ class TestRegisterSerializer:
         assert user.username == "newuser"
         assert user.email == "new@example.com"
         assert user.check_password("newpass123") is True
+
+
+class TestDynamicFields:
+    """Tests for sparse fieldsets and relation expansion."""
+
+    @pytest.mark.django_db
+    def test_default_expands_relations(self, user, book) -> None:
+        """Test loans nest the user and the book by default."""
+        loan = LoanService.borrow_book(user=user, book=book)
+        data = LoanSerializer(loan).data
+        assert data["user"]["username"] == user.username
+        assert data["book"]["title"] == book.title
+
+    @pytest.mark.django_db
+    def test_unexpanded_relations_are_ids(self, user, book) -> None:
+        """Test relations missing from expand are rendered as ids."""
+        loan = LoanService.borrow_book(user=user, book=book)
+        data = LoanSerializer(loan, expand=["book"], fields=["id", "user", "book.title"]).data
+        assert data == {"id": loan.id, "user": user.id, "book": {"title": book.title}}
+
+    def test_query_plan(self) -> None:
+        """Test the query plan selects expanded relations and loads rendered columns."""
+        serializer = LoanSerializer(fields=["id", "is_active", "book.title"], expand=[])
+        select_related, only = serializer.get_query_plan()
+        assert select_related == ["book"]
+        assert sorted(only) == ["book__id", "book__title", "id", "returned_at"]
+        assert BookSerializer(fields=["isbn"]).get_query_plan() == ([], ["id", "isbn"])
+
+
+class TestCompiledSerializer:
+    """Tests for the compiled read-only serialization path."""
+
+    @pytest.fixture
+    def loans(self, user, admin_user, book, unavailable_book) -> None:
+        """Create returned and active loans."""
+        LoanService.borrow_book(user=user, book=book)
+        LoanService.return_book(user=user, book=book)
+        LoanService.borrow_book(user=admin_user, book=book)
+
+    @pytest.mark.django_db
+    @pytest.mark.parametrize(
+        "serializer_class, model, fields, expand",
+        [
+            (BookSerializer, Book, None, None),
+            (BookSerializer, Book, ("title", "updated_at"), None),
+            (UserSerializer, User, None, None),
+            (LoanSerializer, Loan, None, None),
+            (LoanSerializer, Loan, ("id", "user", "book.isbn", "is_active"), ("book",)),
+            (LoanSerializer, Loan, None, ()),
+        ],
+    )
+    def test_matches_serializer_output(
+        self, loans: None, serializer_class, model, fields, expand
+    ) -> None:
+        """Test compiled output renders to the same bytes as the serializer."""
+        queryset = model.objects.order_by("id")
+        compiled = compile_serializer(serializer_class, fields, expand)
+        fast = [compiled.to_representation(row) for row in compiled.values(queryset)]
+        data = serializer_class(queryset, many=True, fields=fields, expand=expand).data
+        assert fast == data
+        assert JSONRenderer().render(fast) == JSONRenderer().render(data)
+
+    def test_uncompilable_serializer(self) -> None:
+        """Test serializers with computed fields are not compiled."""
+
+        class DescribedBookSerializer(BookSerializer):
+            description = serializers.SerializerMethodField()
+
+            class Meta(BookSerializer.Meta):
+                fields = (*BookSerializer.Meta.fields, "description")
+
+            def get_description(self, book: Book) -> str:
+                return str(book)
+
+        assert compile_serializer(DescribedBookSerializer) is None
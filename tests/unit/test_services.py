@@ -2,12 +2,23 @@
 Unit tests for services.
 """
 
+import threading
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.utils import timezone
 
 import pytest
 
 from books.models import Book
-from loans.services import LoanService
+from books.services import BookImportService
+from core.write_behind import WriteBehindBuffer
+from loans.management.commands.archive_loans import months_ago
+from loans.models import ArchivedLoan, Loan, LoanDailyRollup, LoanHistory
+from loans.services import LoanService, LoanStatsService
 
 User = get_user_model()
 
@@ -66,3 +77,447 @@ class TestLoanService:
         LoanService.return_book(user=user, book=book)
         with pytest.raises(ValueError, match="do not have an active loan"):
             LoanService.return_book(user=user, book=book)
+
+    @pytest.mark.django_db
+    def test_borrow_with_stale_instance(self, user: User, book: Book) -> None:
+        """Test availability is checked in the database, not on the passed instance."""
+        stale = Book.objects.get(pk=book.pk)
+        other = User.objects.create_user(username="other", password="testpass123")
+        LoanService.borrow_book(user=other, book=book)
+        assert stale.is_available is True
+        with pytest.raises(ValueError, match="not available"):
+            LoanService.borrow_book(user=user, book=stale)
+
+    @pytest.mark.django_db
+    def test_active_loan_constraint(self, user: User, book: Book) -> None:
+        """Test a copy flagged available while lent out is not lent again."""
+        other = User.objects.create_user(username="other", password="testpass123")
+        Loan.objects.create(user=other, book=book)
+        with pytest.raises(ValueError, match="not available"):
+            LoanService.borrow_book(user=user, book=book)
+        book.refresh_from_db()
+        assert book.is_available is True
+        assert Loan.objects.filter(user=user).exists() is False
+
+    @pytest.mark.django_db
+    def test_return_book_loan_fields(self, user: User, book: Book) -> None:
+        """Test the returned loan carries the stored values."""
+        loan = LoanService.borrow_book(user=user, book=book)
+        returned = LoanService.return_book(user=user, book=book)
+        stored = Loan.objects.get(pk=loan.pk)
+        assert returned.borrowed_at == stored.borrowed_at == loan.borrowed_at
+        assert returned.returned_at == stored.returned_at
+
+    @pytest.mark.django_db
+    def test_borrow_and_return_queries(
+        self, user: User, book: Book, django_assert_max_num_queries
+    ) -> None:
+        """Test borrowing and returning don't read before writing."""
+        # Conditional update, insert with its savepoint, the user's counter
+        # and the daily rollup, plus the savepoint of the service transaction
+        # inside the test transaction
+        with django_assert_max_num_queries(8):
+            LoanService.borrow_book(user=user, book=book)
+        # Loan update returning the loan, book, user and rollup updates, plus
+        # the savepoint
+        with django_assert_max_num_queries(6):
+            LoanService.return_book(user=user, book=book)
+
+
+class TestLoanServiceBatch:
+    """Tests for batch borrows and returns."""
+
+    @pytest.mark.django_db
+    def test_borrow_books_mixed(self, user: User, book: Book, unavailable_book: Book) -> None:
+        """Test each book of a batch follows the single-book borrow rules."""
+        borrowed = Book.objects.create(
+            title="Borrowed", author="Author", isbn="5555555555", page_count=1
+        )
+        LoanService.borrow_book(user=user, book=borrowed)
+        results = LoanService.borrow_books(
+            user=user, book_ids=[book.id, unavailable_book.id, borrowed.id, 999999, book.id]
+        )
+        assert results[0]["loan"].book == book
+        assert results[1]["error"] == 'Book "Unavailable Book" is not available for borrowing.'
+        assert "already have an active loan" in results[2]["error"]
+        assert results[3]["error"] == "Book not found."
+        assert results[4]["error"] == "Duplicate book id."
+        book.refresh_from_db()
+        assert book.is_available is False
+        assert Loan.objects.filter(user=user, returned_at__isnull=True).count() == 2
+
+    @pytest.mark.django_db
+    def test_return_books_mixed(self, user: User, book: Book, unavailable_book: Book) -> None:
+        """Test each book of a batch follows the single-book return rules."""
+        loan = LoanService.borrow_book(user=user, book=book)
+        results = LoanService.return_books(user=user, book_ids=[book.id, unavailable_book.id])
+        assert results[0]["loan"].id == loan.id
+        assert results[0]["loan"].borrowed_at == loan.borrowed_at
+        assert results[1]["error"] == 'You do not have an active loan for "Unavailable Book".'
+        book.refresh_from_db()
+        assert book.is_available is True
+
+    @pytest.mark.django_db
+    def test_batch_queries_independent_of_size(
+        self, user: User, django_assert_max_num_queries
+    ) -> None:
+        """Test a batch runs a fixed number of queries however many books it has."""
+        books = [
+            Book.objects.create(title=f"B{i}", author="A", isbn=f"60000000{i:02d}", page_count=1)
+            for i in range(15)
+        ]
+        ids = [book.id for book in books]
+        with django_assert_max_num_queries(9):
+            results = LoanService.borrow_books(user=user, book_ids=ids)
+        assert all("loan" in result for result in results)
+        with django_assert_max_num_queries(7):
+            results = LoanService.return_books(user=user, book_ids=ids)
+        assert all("loan" in result for result in results)
+
+
+class TestLoanServiceConcurrency:
+    """Stress tests for concurrent borrows and returns."""
+
+    @staticmethod
+    def race(target, args_list: list) -> list:
+        """Run ``target`` in one thread per argument tuple, all starting together."""
+        barrier = threading.Barrier(len(args_list))
+        results = []
+
+        def run(*args) -> None:
+            try:
+                barrier.wait()
+                target(*args)
+                results.append(True)
+            except (ValueError, OperationalError):
+                # OperationalError: SQLite refuses concurrent writers
+                results.append(False)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run, args=args) for args in args_list]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    @pytest.mark.django_db(transaction=True)
+    def test_no_double_lending(self) -> None:
+        """Test concurrent borrowers of one copy never both get it."""
+        users = [
+            User.objects.create_user(username=f"reader{i}", password="testpass123")
+            for i in range(8)
+        ]
+        for _ in range(5):
+            book = Book.objects.create(
+                title="Contested", author="Author", isbn="9999999999", page_count=1
+            )
+            # Every thread holds an instance loaded while the copy was available
+            copies = [Book.objects.get(pk=book.pk) for _ in users]
+            results = self.race(LoanService.borrow_book, list(zip(users, copies)))
+
+            active = Loan.objects.filter(book=book, returned_at__isnull=True)
+            assert active.count() == results.count(True) <= 1
+            if connection.vendor == "postgresql":
+                assert results.count(True) == 1
+            book.refresh_from_db()
+            assert book.is_available is not active.exists()
+
+            if active.exists():
+                borrower = active.get().user
+                results = self.race(LoanService.return_book, [(borrower, book)] * 4)
+                assert results.count(True) <= 1
+                assert Loan.objects.filter(book=book, returned_at__isnull=True).count() == (
+                    1 - results.count(True)
+                )
+            book.delete()
+
+
+class TestBookImportService:
+    """Tests for BookImportService."""
+
+    @staticmethod
+    def row(isbn: str, **values) -> dict:
+        return {"title": "Title", "author": "Author", "isbn": isbn, "page_count": 100, **values}
+
+    @pytest.mark.django_db
+    def test_chunks_and_duplicates(self, django_assert_max_num_queries) -> None:
+        """Test rows are written in chunks and the last row for an ISBN wins."""
+        rows = [self.row(f"{i:010d}") for i in range(10)] + [self.row("0000000009", title="Latest")]
+        # Per chunk of four rows: savepoint, id lookup, upsert, release
+        with django_assert_max_num_queries(3 * 4):
+            report = BookImportService.import_books(iter(rows), chunk_size=4)
+        assert report["processed"] == 11
+        assert report["imported"] == 11
+        assert Book.objects.count() == 10
+        assert Book.objects.get(isbn="0000000009").title == "Latest"
+
+    @pytest.mark.django_db
+    def test_upsert_keeps_availability(self, unavailable_book: Book) -> None:
+        """Test updating an existing book keeps its availability and creation time."""
+        created_at = unavailable_book.created_at
+        BookImportService.import_books([self.row(unavailable_book.isbn, title="Updated")])
+        unavailable_book.refresh_from_db()
+        assert unavailable_book.title == "Updated"
+        assert unavailable_book.is_available is False
+        assert unavailable_book.created_at == created_at
+
+    @pytest.mark.django_db
+    def test_only_existing_books_invalidated(
+        self, book: Book, monkeypatch, django_capture_on_commit_callbacks
+    ) -> None:
+        """Test a chunk drops the cached copies of updated books only, once it's committed."""
+        invalidated = []
+        monkeypatch.setattr("books.services.invalidate_books", invalidated.append)
+        rows = [self.row(book.isbn, title="Updated"), self.row("0000000001")]
+        with django_capture_on_commit_callbacks(execute=True):
+            BookImportService.import_books(rows, chunk_size=2)
+            assert invalidated == []
+        assert invalidated == [[book.id]]
+
+    @pytest.mark.django_db
+    def test_error_report_capped(self) -> None:
+        """Test only the first errors are reported, but all are counted."""
+        rows = [self.row("bad", page_count="many") for _ in range(5)]
+        report = BookImportService.import_books(rows, max_errors=2)
+        assert report["failed"] == 5
+        assert len(report["errors"]) == 2
+        assert report["errors_truncated"] is True
+        assert report["errors"][0]["errors"]["page_count"] == ["A valid integer is required."]
+
+    def test_clean_row(self) -> None:
+        """Test row validation mirrors the serializer rules."""
+        values, errors = BookImportService.clean_row(self.row(" 978-0-00-000000-2 "))
+        assert errors is None
+        assert values["isbn"] == "9780000000002"
+        _, errors = BookImportService.clean_row({"title": " ", "isbn": "12345678AB"})
+        assert errors == {
+            "title": ["This field may not be blank."],
+            "author": ["This field is required."],
+            "isbn": ["ISBN must contain only digits (or X for ISBN-10)."],
+            "page_count": ["This field is required."],
+        }
+
+
+class TestArchiveLoans:
+    """Tests for the archive_loans management command."""
+
+    @pytest.mark.django_db
+    def test_moves_old_returned_loans_only(self, user: User, book: Book) -> None:
+        """Test only loans returned before the cutoff are archived, ids intact."""
+        long_ago = timezone.now() - timedelta(days=400)
+        old = [Loan.objects.create(user=user, book=book, returned_at=long_ago) for _ in range(3)]
+        recent = Loan.objects.create(user=user, book=book, returned_at=timezone.now())
+        active = Loan.objects.create(user=user, book=book)
+        call_command("archive_loans", months=12, stdout=None)
+        assert set(Loan.objects.values_list("id", flat=True)) == {recent.id, active.id}
+        archived = ArchivedLoan.objects.order_by("id")
+        assert [loan.id for loan in archived] == [loan.id for loan in old]
+        assert archived[0].borrowed_at == old[0].borrowed_at
+        assert archived[0].returned_at == long_ago
+        assert LoanHistory.objects.filter(user=user).count() == 5
+
+    @pytest.mark.django_db
+    def test_batches_bounded(self, user: User, book: Book) -> None:
+        """Test each batch moves at most batch-size rows and max-batches stops early."""
+        long_ago = timezone.now() - timedelta(days=400)
+        for _ in range(5):
+            Loan.objects.create(user=user, book=book, returned_at=long_ago)
+        call_command("archive_loans", batch_size=2, max_batches=2, stdout=None)
+        assert ArchivedLoan.objects.count() == 4
+        assert Loan.objects.count() == 1
+
+    def test_months_ago_clamps_day(self) -> None:
+        """Test shifting to a shorter month lands on its last day."""
+        now = datetime(2026, 3, 31, 12, tzinfo=dt_timezone.utc)
+        assert months_ago(now, 1) == datetime(2026, 2, 28, 12, tzinfo=dt_timezone.utc)
+        assert months_ago(now, 15) == datetime(2024, 12, 31, 12, tzinfo=dt_timezone.utc)
+
+
+class TestLoanCounters:
+    """Tests for the circulation counters maintained by LoanService."""
+
+    @pytest.mark.django_db
+    def test_borrow_and_return(self, user: User, book: Book) -> None:
+        """Test borrowing and returning keep book and user counters in step."""
+        LoanService.borrow_book(user=user, book=book)
+        assert (book.total_loans, book.active_loans, user.active_loan_count) == (1, 1, 1)
+        LoanService.return_book(user=user, book=book)
+        assert (book.total_loans, book.active_loans, user.active_loan_count) == (1, 0, 0)
+        LoanService.borrow_book(user=user, book=book)
+        book.refresh_from_db()
+        user.refresh_from_db()
+        assert (book.total_loans, book.active_loans, user.active_loan_count) == (2, 1, 1)
+
+    @pytest.mark.django_db
+    def test_batches(self, user: User, book: Book, unavailable_book: Book) -> None:
+        """Test batch borrows and returns count only the books they lend or take back."""
+        LoanService.borrow_books(user=user, book_ids=[book.id, unavailable_book.id])
+        book.refresh_from_db()
+        user.refresh_from_db()
+        unavailable_book.refresh_from_db()
+        assert (book.total_loans, book.active_loans, user.active_loan_count) == (1, 1, 1)
+        assert unavailable_book.total_loans == 0
+        LoanService.return_books(user=user, book_ids=[book.id])
+        book.refresh_from_db()
+        user.refresh_from_db()
+        assert (book.total_loans, book.active_loans, user.active_loan_count) == (1, 0, 0)
+
+    @pytest.mark.django_db
+    def test_drifted_counter_never_negative(self, user: User, book: Book) -> None:
+        """Test returning a loan the counters never saw leaves them at zero."""
+        Loan.objects.create(user=user, book=book)
+        LoanService.return_book(user=user, book=book)
+        assert (book.active_loans, user.active_loan_count) == (0, 0)
+
+    @pytest.mark.django_db
+    def test_reconcile(self, user: User, book: Book) -> None:
+        """Test the reconcile command recounts from the loans, including archived ones."""
+        long_ago = timezone.now() - timedelta(days=400)
+        Loan.objects.create(user=user, book=book, returned_at=long_ago)
+        call_command("archive_loans", stdout=None)
+        Loan.objects.create(user=user, book=book, returned_at=timezone.now())
+        Loan.objects.create(user=user, book=book)
+        Book.objects.create(title="Idle", author="Author", isbn="7777777777", page_count=1)
+        Book.objects.update(total_loans=9)
+        call_command("reconcile_loan_counters", batch_size=1, stdout=None)
+        book.refresh_from_db()
+        user.refresh_from_db()
+        assert (book.total_loans, book.active_loans, user.active_loan_count) == (3, 1, 1)
+        assert Book.objects.get(isbn="7777777777").total_loans == 0
+
+
+class TestLoanStatsService:
+    """Tests for the daily loan rollups."""
+
+    @pytest.mark.django_db
+    def test_recorded_with_loans(self, user: User, book: Book, unavailable_book: Book) -> None:
+        """Test borrows and returns, single and batched, add up in the day's rollup."""
+        LoanService.borrow_book(user=user, book=book)
+        LoanService.return_books(user=user, book_ids=[book.id])
+        LoanService.borrow_books(user=user, book_ids=[book.id, unavailable_book.id])
+        rollup = LoanDailyRollup.objects.get()
+        assert rollup.day == timezone.localdate()
+        assert (rollup.book_id, rollup.borrows, rollup.returns) == (book.id, 2, 1)
+
+    @pytest.mark.django_db
+    def test_rebuild_day(self, user: User, book: Book) -> None:
+        """Test a day is recomputed from the loans, replacing what was recorded."""
+        day = timezone.localdate() - timedelta(days=3)
+        at = timezone.make_aware(datetime.combine(day, datetime.min.time())) + timedelta(hours=1)
+        Loan.objects.create(user=user, book=book, returned_at=at)
+        Loan.objects.filter(book=book).update(borrowed_at=at - timedelta(days=1))
+        Loan.objects.create(user=user, book=book)
+        Loan.objects.filter(returned_at__isnull=True).update(borrowed_at=at)
+        LoanDailyRollup.objects.create(day=day, book=book, borrows=40)
+        call_command("rollup_loans", f"--since={day - timedelta(days=1)}", stdout=None)
+        rollup = LoanDailyRollup.objects.get(day=day)
+        assert (rollup.borrows, rollup.returns) == (1, 1)
+        assert LoanDailyRollup.objects.get(day=day - timedelta(days=1)).borrows == 1
+
+    @pytest.mark.django_db
+    def test_stats(self, book: Book, unavailable_book: Book) -> None:
+        """Test totals, zero-filled series and top lists are summed from the rollups."""
+        start = datetime(2026, 3, 30).date()
+        LoanDailyRollup.objects.create(day=start, book=book, borrows=2, returns=1)
+        LoanDailyRollup.objects.create(day=start, book=unavailable_book, borrows=3)
+        LoanDailyRollup.objects.create(day=start + timedelta(days=8), book=book, borrows=4)
+        stats = LoanStatsService.stats(start, start + timedelta(days=9), "week", top=1)
+        assert (stats["borrows"], stats["returns"]) == (9, 1)
+        assert [(item["period"].isoformat(), item["borrows"]) for item in stats["series"]] == [
+            ("2026-03-30", 5),
+            ("2026-04-06", 4),
+        ]
+        assert stats["top_books"] == [
+            {"book_id": book.id, "title": book.title, "author": book.author, "borrows": 6}
+        ]
+        assert stats["top_authors"] == [{"author": "Test Author", "borrows": 9}]
+
+    def test_periods(self) -> None:
+        """Test periods start at the first day of the day, week or month."""
+        start = datetime(2026, 1, 30).date()
+        end = datetime(2026, 3, 2).date()
+        assert len(LoanStatsService.periods(start, end, "day")) == 32
+        assert LoanStatsService.periods(start, end, "week")[0].isoformat() == "2026-01-26"
+        assert [p.isoformat() for p in LoanStatsService.periods(start, end, "month")] == [
+            "2026-01-01",
+            "2026-02-01",
+            "2026-03-01",
+        ]
+
+
+class TestWriteBehindBuffer:
+    """Tests for WriteBehindBuffer."""
+
+    @pytest.fixture
+    def buffer(self, db, settings) -> WriteBehindBuffer:
+        """Create a buffer flushed by its background thread once an hour."""
+        settings.WRITE_BEHIND_INTERVAL = 3600
+        buffer = WriteBehindBuffer()
+        yield buffer
+        buffer.stop()
+
+    def test_buffered_until_flush(self, buffer: WriteBehindBuffer, user: User) -> None:
+        """Test updates reach the database when the buffer is flushed."""
+        now = timezone.now()
+        buffer.set(User, user.pk, "last_login", now)
+        user.refresh_from_db()
+        assert user.last_login is None
+        assert buffer.flush() == 1
+        user.refresh_from_db()
+        assert user.last_login == now
+        assert buffer.pending() == 0
+
+    def test_batched_per_field(
+        self,
+        buffer: WriteBehindBuffer,
+        user: User,
+        admin_user: User,
+        book: Book,
+        django_assert_num_queries,
+    ) -> None:
+        """Test sets keep the latest value, adds are summed, and each field is one statement."""
+        earlier, now = timezone.now() - timedelta(minutes=1), timezone.now()
+        buffer.set(User, user.pk, "last_login", earlier)
+        buffer.set(User, user.pk, "last_login", now)
+        buffer.set(User, admin_user.pk, "last_login", now)
+        buffer.add(Book, book.pk, "total_loans", 2)
+        buffer.add(Book, book.pk, "total_loans", 3)
+        assert buffer.pending() == 3
+        with django_assert_num_queries(2):
+            assert buffer.flush() == 3
+        user.refresh_from_db()
+        book.refresh_from_db()
+        assert user.last_login == now
+        assert book.total_loans == 5
+
+    def test_failed_flush_kept(self, buffer: WriteBehindBuffer, book: Book, monkeypatch) -> None:
+        """Test updates that failed to be written are retried by the next flush."""
+        buffer.add(Book, book.pk, "total_loans", 2)
+
+        def fail(*args, **kwargs):
+            raise OperationalError("database is locked")
+
+        monkeypatch.setattr("core.write_behind.update_from_values", fail)
+        with pytest.raises(OperationalError):
+            buffer.flush()
+        monkeypatch.undo()
+        buffer.add(Book, book.pk, "total_loans", 1)
+        assert buffer.flush() == 1
+        book.refresh_from_db()
+        assert book.total_loans == 3
+
+    def test_stop_flushes(self, buffer: WriteBehindBuffer, user: User) -> None:
+        """Test stopping the buffer, as on worker shutdown, writes what is buffered."""
+        buffer.set(User, user.pk, "last_login", timezone.now())
+        buffer.stop()
+        user.refresh_from_db()
+        assert user.last_login is not None
+
+    def test_write_through_without_interval(self, db, settings, user: User) -> None:
+        """Test updates are written immediately when the interval is 0."""
+        settings.WRITE_BEHIND_INTERVAL = 0
+        WriteBehindBuffer().set(User, user.pk, "last_login", timezone.now())
+        user.refresh_from_db()
+        assert user.last_login is not None
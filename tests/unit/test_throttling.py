@@ -0,0 +1,65 @@
+"""
+Unit tests for the counter rate throttles.
+"""
+
+from django.core.cache import caches
+
+import pytest
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+
+from core.throttling import CounterRateThrottle
+
+
+class FivePerMinuteThrottle(CounterRateThrottle):
+    """Throttle at 5 requests per minute, keyed by IP address."""
+
+    rate = "5/minute"
+
+    def get_cache_key(self, request, view) -> str:
+        return f"test:{self.get_ident(request)}"
+
+
+def throttle_at(now: float) -> FivePerMinuteThrottle:
+    """Return a throttle whose clock reads ``now``."""
+    throttle = FivePerMinuteThrottle()
+    throttle.timer = lambda: now
+    return throttle
+
+
+class TestCounterRateThrottle:
+    """Tests for CounterRateThrottle."""
+
+    @staticmethod
+    def allow(now: float, ip: str = "10.0.0.1") -> bool:
+        request = APIRequestFactory().get("/", REMOTE_ADDR=ip)
+        return throttle_at(now).allow_request(request, APIView())
+
+    def test_throttles_over_rate(self) -> None:
+        """Test requests beyond the rate are refused within the window."""
+        assert all(self.allow(120.0 + i) for i in range(5))
+        assert self.allow(125.0) is False
+
+    def test_counts_per_window(self) -> None:
+        """Test the count starts over in the next window."""
+        for i in range(6):
+            self.allow(120.0 + i)
+        assert self.allow(180.0) is True
+
+    def test_counts_per_client(self) -> None:
+        """Test clients are counted separately."""
+        for i in range(6):
+            self.allow(120.0 + i)
+        assert self.allow(125.0, ip="10.0.0.2") is True
+
+    def test_single_counter_per_window(self) -> None:
+        """Test each window keeps one counter in the throttle cache."""
+        for i in range(3):
+            self.allow(120.0 + i)
+        assert caches["throttle"].get("test:10.0.0.1:2") == 3
+
+    def test_wait_until_window_end(self) -> None:
+        """Test the wait is the time left in the window."""
+        throttle = throttle_at(150.0)
+        throttle.allow_request(APIRequestFactory().get("/"), APIView())
+        assert throttle.wait() == pytest.approx(30.0)
@@ -0,0 +1,115 @@
+"""
+JWT authentication that serves read requests from the token's claims.
+"""
+
+import copy
+import time
+from typing import Optional
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+from core.cache import LocalLRUCache
+
+from .blacklist import token_blacklist
+
+User = get_user_model()
+
+# Full user rows for write requests, per process
+USER_CACHE = LocalLRUCache(maxsize=settings.AUTH_USER_CACHE_SIZE)
+
+# Claims a token must carry for its user to be built without a lookup
+USER_CLAIMS = ("username", "email", "is_staff")
+
+
+def add_user_claims(token, user: User) -> None:
+    """Stamp the user's current identity and staff flag on a token."""
+    token["username"] = user.username
+    token["email"] = user.email
+    token["is_staff"] = user.is_staff
+
+
+def auth_changed_key(user_id) -> str:
+    """Return the cache key marking when the user's staff or active flag changed."""
+    return f"users:auth_changed:{user_id}"
+
+
+def mark_auth_changed(user_id) -> None:
+    """
+    Stop trusting the claims of the user's existing access tokens.
+
+    Tokens issued up to now are answered with a fresh user row until they
+    expire; the marker is kept for as long as an access token lives. Other
+    workers only see the marker through a shared default cache (Redis, see
+    ``REDIS_URL``), which production settings therefore require.
+    """
+    lifetime = api_settings.ACCESS_TOKEN_LIFETIME.total_seconds()
+    cache.set(auth_changed_key(user_id), time.time(), timeout=int(lifetime) + 1)
+    USER_CACHE.delete(str(user_id))
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that skips the user lookup where it can.
+
+    Read requests (``GET``, ``HEAD``, ``OPTIONS``) get a ``TokenUser`` built
+    from the access token's claims, which include ``is_staff``. Write
+    requests get the full user row, cached per process for
+    ``AUTH_USER_CACHE_TTL`` seconds. Changing a user's staff or active flag
+    (see ``users.signals``) marks the user in the shared cache: tokens issued
+    before the change are no longer trusted and cached rows loaded before it
+    are reloaded, so both take effect on the next request in every process.
+    Tokens revoked at logout are rejected (see ``users.blacklist``).
+    """
+
+    def get_validated_token(self, raw_token: bytes):
+        """Validate the token and reject it if it was revoked."""
+        validated_token = super().get_validated_token(raw_token)
+        if token_blacklist.is_revoked(validated_token):
+            raise InvalidToken(_("Token is blacklisted"))
+        return validated_token
+
+    def authenticate(self, request):
+        """Authenticate the request from its bearer token."""
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        changed_at = cache.get(auth_changed_key(validated_token.get(api_settings.USER_ID_CLAIM)))
+        if request.method in SAFE_METHODS and self.claims_trusted(validated_token, changed_at):
+            return TokenUser(validated_token), validated_token
+        return self.get_cached_user(validated_token, changed_at), validated_token
+
+    @staticmethod
+    def claims_trusted(validated_token, changed_at: Optional[float]) -> bool:
+        """Check the token carries the user claims and was issued after the last change."""
+        if any(claim not in validated_token for claim in USER_CLAIMS):
+            return False
+        return changed_at is None or validated_token.get("iat", 0) > changed_at
+
+    def get_cached_user(self, validated_token, changed_at: Optional[float] = None) -> User:
+        """Return the token's user row, from the process cache if loaded after the last change."""
+        key = str(validated_token.get(api_settings.USER_ID_CLAIM))
+        entry = USER_CACHE.get(key)
+        if entry is not None:
+            user, loaded_at = entry
+            if changed_at is None or loaded_at > changed_at:
+                # Callers may update the instance (e.g. its loan counter)
+                return copy.copy(user)
+
+        loaded_at = time.time()
+        user = self.get_user(validated_token)
+        USER_CACHE.set(key, (user, loaded_at), settings.AUTH_USER_CACHE_TTL)
+        return copy.copy(user)
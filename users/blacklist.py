@@ -0,0 +1,186 @@
+"""
+Cache-backed blacklist of revoked JWTs.
+"""
+
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from rest_framework_simplejwt.settings import api_settings
+
+from core.cache import BloomFilter
+
+# Counter numbering the entries of the revocation log
+SEQUENCE_KEY = "users:revoked:seq"
+
+# Log entries fetched per cache round trip when syncing
+SYNC_CHUNK_SIZE = 1000
+
+# Seconds of token expiry covered by one in-process Bloom filter
+BUCKET_SECONDS = 3600
+
+# How long a log number handed out but not yet written is looked up again
+# (seconds); revoke writes the entry right after taking the number
+GAP_RETRY_SECONDS = 60
+
+
+def revoked_key(jti: str) -> str:
+    """Return the cache key marking a token as revoked."""
+    return f"users:revoked:{jti}"
+
+
+def log_key(number: int) -> str:
+    """Return the cache key of an entry of the revocation log."""
+    return f"users:revoked:log:{number}"
+
+
+class TokenBlacklist:
+    """
+    Blacklist of revoked tokens, keyed by their ``jti`` claim.
+
+    Every revoked token is stored in the shared cache until it would have
+    expired anyway, so the blacklist never outgrows the tokens in
+    circulation and needs no cleanup.
+
+    Access tokens are checked on every request, so their revocations are also
+    appended to a numbered log in the shared cache, from which every process
+    feeds local Bloom filters at most every
+    ``TOKEN_BLACKLIST_SYNC_INTERVAL`` seconds. A token missing from the
+    filter, which is nearly every token, is accepted without a cache round
+    trip; possible hits are confirmed in the shared cache. Log numbers taken
+    by a revocation that hasn't written its entry yet are looked up again on
+    the following syncs. There is one filter per hour of token expiry,
+    dropped once that hour has passed, which purges expired entries from
+    memory.
+
+    Refresh tokens are checked against the shared cache directly, and
+    rotation claims them with an atomic ``cache.add``, so a refresh token
+    can't be used twice, not even concurrently in different processes.
+
+    The revocations, the log and its sequence counter are all kept in the
+    default cache, which must be shared by every worker (Redis, see
+    ``REDIS_URL``). With the per-process fallback cache a token revoked in
+    one worker is still accepted by the others, so production settings
+    refuse to start without ``REDIS_URL``.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """Drop the local filters; the next check reloads them from the log."""
+        with self._lock:
+            self._filters: dict = {}
+            self._sequence = None
+            # Log numbers synced before their entry was written, and when
+            self._gaps: dict = {}
+            self._next_sync = 0.0
+
+    def revoke(self, token) -> bool:
+        """
+        Revoke a token until it expires.
+
+        Returns:
+            False if the token had already been revoked
+        """
+        jti = token[api_settings.JTI_CLAIM]
+        exp = token["exp"]
+        timeout = math.ceil(exp - time.time())
+        if timeout <= 0:
+            # Expired tokens are rejected anyway
+            return True
+        if not cache.add(revoked_key(jti), exp, timeout=timeout):
+            return False
+        if token.token_type == "access":
+            cache.set(log_key(self.next_sequence()), (jti, exp), timeout=timeout)
+            with self._lock:
+                self._add(jti, exp)
+        return True
+
+    def is_revoked(self, token, strict: bool = False) -> bool:
+        """
+        Check whether a token was revoked.
+
+        Unless ``strict`` is set, tokens missing from the local filters are
+        taken as not revoked, which may be up to
+        ``TOKEN_BLACKLIST_SYNC_INTERVAL`` seconds behind other processes.
+        """
+        jti = token.get(api_settings.JTI_CLAIM)
+        if jti is None:
+            return False
+        if not strict:
+            self.sync()
+            with self._lock:
+                bloom = self._filters.get(token["exp"] // BUCKET_SECONDS)
+                if bloom is None or jti not in bloom:
+                    return False
+        return cache.get(revoked_key(jti)) is not None
+
+    def sync(self) -> None:
+        """Add the revocations logged by other processes to the local filters."""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._next_sync:
+                return
+            self._next_sync = now + settings.TOKEN_BLACKLIST_SYNC_INTERVAL
+            since = self._sequence
+            gaps = dict(self._gaps)
+
+        latest = cache.get(SEQUENCE_KEY, 0)
+        # Entries missing from older numbers expired with their tokens
+        recent = since
+        if since is None or latest < since:
+            # First sync, or the log was lost with the cache: reload its tail
+            with self._lock:
+                self._filters = {}
+            since = max(0, latest - settings.TOKEN_BLACKLIST_SYNC_BACKLOG)
+            recent = latest - SYNC_CHUNK_SIZE
+            gaps = {}
+
+        numbers = [*gaps, *range(since + 1, latest + 1)]
+        for start in range(0, len(numbers), SYNC_CHUNK_SIZE):
+            chunk = numbers[start : start + SYNC_CHUNK_SIZE]
+            entries = cache.get_many([log_key(number) for number in chunk])
+            with self._lock:
+                for number in chunk:
+                    entry = entries.get(log_key(number))
+                    if entry is not None:
+                        self._add(*entry)
+                        gaps.pop(number, None)
+                    elif number > recent:
+                        # Numbered by a revoke that hasn't written its entry yet
+                        gaps.setdefault(number, now)
+
+        with self._lock:
+            self._sequence = latest
+            self._gaps = {
+                number: seen for number, seen in gaps.items() if now - seen < GAP_RETRY_SECONDS
+            }
+            expired = time.time() // BUCKET_SECONDS
+            for bucket in [bucket for bucket in self._filters if bucket < expired]:
+                del self._filters[bucket]
+
+    def _add(self, jti: str, exp: int) -> None:
+        bucket = exp // BUCKET_SECONDS
+        if bucket not in self._filters:
+            self._filters[bucket] = BloomFilter(settings.TOKEN_BLACKLIST_BLOOM_CAPACITY)
+        self._filters[bucket].add(jti)
+
+    @staticmethod
+    def next_sequence() -> int:
+        """Return the next number of the revocation log."""
+        for _ in range(2):
+            cache.add(SEQUENCE_KEY, 0, timeout=None)
+            try:
+                return cache.incr(SEQUENCE_KEY)
+            except ValueError:
+                # Evicted between add and incr
+                continue
+        raise RuntimeError("Could not advance the token revocation log.")
+
+
+token_blacklist = TokenBlacklist()
@@ -0,0 +1,94 @@
+"""
+Cache-backed lockout of usernames and addresses after failed logins.
+"""
+
+import hashlib
+import math
+import time
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core.metrics import counter
+
+login_rejections = counter("users.login_guard.rejections")
+login_lockouts = counter("users.login_guard.lockouts")
+
+# Caps the backoff exponent, long before LOGIN_GUARD_MAX_DELAY is reached
+MAX_DOUBLINGS = 30
+
+
+def failures_key(ident: str) -> str:
+    """Return the cache key counting the failed logins of an identity."""
+    return f"users:login:failures:{ident}"
+
+
+def locked_key(ident: str) -> str:
+    """Return the cache key holding when an identity's lockout ends."""
+    return f"users:login:locked:{ident}"
+
+
+class LoginGuard:
+    """
+    Lockout with exponential backoff for repeated failed logins.
+
+    Failed logins are counted per username and per client address in the
+    shared cache, for ``LOGIN_GUARD_WINDOW`` seconds from the first failure.
+    Once a username reaches ``LOGIN_GUARD_USER_FAILURES`` failures (an
+    address ``LOGIN_GUARD_IP_FAILURES``, as NAT may share it between many
+    users), every failure locks it out for ``LOGIN_GUARD_BASE_DELAY``
+    seconds, doubled per failure past the threshold, up to
+    ``LOGIN_GUARD_MAX_DELAY``. Attempts made while locked out are rejected
+    with one cache read, before the password is hashed, and don't count as
+    failures. A successful login clears the username's failures.
+
+    Unknown usernames are counted like existing ones, so lockouts don't
+    reveal which accounts exist.
+    """
+
+    @staticmethod
+    def idents(username: str, ip: Optional[str]) -> Dict[str, int]:
+        """Return the identities an attempt is counted against, with their failure thresholds."""
+        # Hashed to keep arbitrary input out of cache keys
+        digest = hashlib.sha256(username.casefold().encode()).hexdigest()[:32]
+        idents = {f"user:{digest}": settings.LOGIN_GUARD_USER_FAILURES}
+        if ip:
+            idents[f"ip:{ip}"] = settings.LOGIN_GUARD_IP_FAILURES
+        return idents
+
+    def retry_after(self, username: str, ip: Optional[str]) -> Optional[int]:
+        """Return the seconds until the username and address may try again, if locked out."""
+        locked = cache.get_many([locked_key(ident) for ident in self.idents(username, ip)])
+        if not locked:
+            return None
+        login_rejections.incr()
+        return max(1, math.ceil(max(locked.values()) - time.time()))
+
+    def record_failure(self, username: str, ip: Optional[str]) -> None:
+        """Count a failed login and lock out identities over their threshold."""
+        for ident, threshold in self.idents(username, ip).items():
+            key = failures_key(ident)
+            cache.add(key, 0, timeout=settings.LOGIN_GUARD_WINDOW)
+            try:
+                failures = cache.incr(key)
+            except ValueError:
+                # Evicted between add and incr
+                cache.set(key, 1, timeout=settings.LOGIN_GUARD_WINDOW)
+                failures = 1
+            if failures < threshold:
+                continue
+            doublings = min(failures - threshold, MAX_DOUBLINGS)
+            delay = min(
+                settings.LOGIN_GUARD_MAX_DELAY, settings.LOGIN_GUARD_BASE_DELAY * 2**doublings
+            )
+            cache.set(locked_key(ident), time.time() + delay, timeout=math.ceil(delay))
+            login_lockouts.incr()
+
+    def record_success(self, username: str, ip: Optional[str]) -> None:
+        """Clear the failures of a username that logged in."""
+        ident = next(iter(self.idents(username, ip)))
+        cache.delete_many([failures_key(ident), locked_key(ident)])
+
+
+login_guard = LoginGuard()
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-16 18:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="active_loan_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -3,14 +3,17 @@ User models for the Library Management System.
 """
 
 from django.contrib.auth.models import AbstractUser
+from django.db import models
 
 
 class User(AbstractUser):
     """
     Custom User model extending Django's AbstractUser.
-    No additional fields needed for this project.
     """
 
+    # Maintained by LoanService (see reconcile_loan_counters)
+    active_loan_count = models.PositiveIntegerField(default=0)
+
     class Meta:
         db_table = "users"
         verbose_name = "User"
@@ -24,4 +24,4 @@ class IsAdminOrSelf(permissions.BasePermission):
         if request.user.is_staff:
             return True
         # Regular users can only access their own data
-        return obj == request.user
+        return obj.pk == request.user.pk
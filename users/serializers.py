@@ -4,20 +4,40 @@ Serializers for user authentication and management.
 
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
 
 from rest_framework import serializers
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, TokenError
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.serializers import DynamicFieldsMixin
+from core.write_behind import write_behind
+
+from .authentication import add_user_claims
+from .blacklist import token_blacklist
 
 User = get_user_model()
 
 
-class UserSerializer(serializers.ModelSerializer):
-    """Serializer for User model."""
+class UserSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    """Serializer for User model. Supports sparse fieldsets."""
 
     class Meta:
         model = User
-        fields = ("id", "username", "email", "first_name", "last_name", "is_staff", "date_joined")
-        read_only_fields = ("id", "is_staff", "date_joined")
+        fields = (
+            "id",
+            "username",
+            "email",
+            "first_name",
+            "last_name",
+            "is_staff",
+            "active_loan_count",
+            "date_joined",
+        )
+        read_only_fields = ("id", "is_staff", "active_loan_count", "date_joined")
 
 
 class RegisterSerializer(serializers.ModelSerializer):
@@ -55,6 +75,65 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     def get_token(cls, user: User):
         """Add custom claims to token."""
         token = super().get_token(user)
-        token["username"] = user.username
-        token["email"] = user.email
+        add_user_claims(token, user)
+        return token
+
+    def validate(self, attrs: dict) -> dict:
+        """Issue the tokens and buffer the update of the user's last login."""
+        data = super().validate(attrs)
+        # Instead of SIMPLE_JWT's UPDATE_LAST_LOGIN, which writes on every login
+        write_behind.set(User, self.user.pk, "last_login", timezone.now())
+        return data
+
+
+class CustomTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Token refresh serializer that re-reads the user claims.
+
+    Access tokens copy their claims from the refresh token, so without this
+    a refreshed token would keep the staff flag the user had at login.
+    Rotated refresh tokens are revoked in ``users.blacklist``.
+    """
+
+    def validate(self, attrs: dict) -> dict:
+        """Issue a new access token (and rotated refresh token) with current claims."""
+        refresh = self.token_class(attrs["refresh"])
+        if api_settings.ROTATE_REFRESH_TOKENS and api_settings.BLACKLIST_AFTER_ROTATION:
+            # Revoking is also the check, atomically, so a token is only used once
+            if not token_blacklist.revoke(refresh):
+                raise TokenError(_("Token is blacklisted"))
+        elif token_blacklist.is_revoked(refresh, strict=True):
+            raise TokenError(_("Token is blacklisted"))
+
+        user = User.objects.filter(
+            **{api_settings.USER_ID_FIELD: refresh.payload.get(api_settings.USER_ID_CLAIM)}
+        ).first()
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(
+                self.error_messages["no_active_account"], "no_active_account"
+            )
+
+        add_user_claims(refresh, user)
+        data = {"access": str(refresh.access_token)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data["refresh"] = str(refresh)
+        return data
+
+
+class LogoutSerializer(serializers.Serializer):
+    """Serializer for logout requests."""
+
+    refresh = serializers.CharField()
+
+    def validate_refresh(self, value: str) -> RefreshToken:
+        """Check the refresh token is valid and belongs to the requesting user."""
+        try:
+            token = RefreshToken(value)
+        except TokenError as e:
+            raise serializers.ValidationError(str(e))
+        if str(token.get(api_settings.USER_ID_CLAIM)) != str(self.context["request"].user.pk):
+            raise serializers.ValidationError("Token belongs to another user.")
         return token
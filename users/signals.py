@@ -0,0 +1,49 @@
+"""
+Signal handlers for the users app.
+"""
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .authentication import USER_CACHE, mark_auth_changed
+
+User = get_user_model()
+
+# Fields whose change must not be missed by token-claim authentication
+AUTH_FIELDS = ("is_staff", "is_active")
+
+
+def invalidate_user_auth(user_id: int) -> None:
+    """Distrust the user's tokens and cached rows now and again once the transaction commits."""
+    mark_auth_changed(user_id)
+    transaction.on_commit(lambda: mark_auth_changed(user_id))
+
+
+@receiver(pre_save, sender=User)
+def user_saving(sender, instance: User, update_fields=None, **kwargs) -> None:
+    """Note whether the save changes the user's staff or active flag."""
+    instance._auth_changed = False
+    if instance.pk is None:
+        return
+    if update_fields is not None and not set(update_fields) & set(AUTH_FIELDS):
+        return
+    stored = User.objects.filter(pk=instance.pk).values(*AUTH_FIELDS).first()
+    instance._auth_changed = stored is not None and any(
+        stored[field] != getattr(instance, field) for field in AUTH_FIELDS
+    )
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance: User, **kwargs) -> None:
+    """Drop the process's cached row, and invalidate tokens if the staff or active flag changed."""
+    USER_CACHE.delete(str(instance.pk))
+    if getattr(instance, "_auth_changed", False):
+        invalidate_user_auth(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance: User, **kwargs) -> None:
+    """Invalidate token claims and cached rows of a deleted user."""
+    invalidate_user_auth(instance.pk)
@@ -3,18 +3,36 @@ Views for user authentication and management.
 """
 
 from django.contrib.auth import get_user_model
+from django.shortcuts import get_object_or_404
+from django.utils.translation import gettext as _
 
 from rest_framework import generics, status, viewsets
 from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.exceptions import AuthenticationFailed, Throttled
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
-from rest_framework_simplejwt.views import TokenObtainPairView
-
-from loans.models import Loan
+from rest_framework.throttling import BaseThrottle
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+
+from books.cache import get_catalog_version
+from core.conditional import conditional_get
+from core.mixins import CompiledListMixin
+from core.throttling import ScopedRateThrottle
+from loans.cache import get_user_loans_version
+from loans.models import LoanHistory
+from loans.pagination import LoanPagination
 from loans.serializers import LoanSerializer
 
+from .blacklist import token_blacklist
+from .login_guard import login_guard
 from .permissions import IsAdminOrSelf
-from .serializers import CustomTokenObtainPairSerializer, RegisterSerializer, UserSerializer
+from .serializers import (
+    CustomTokenObtainPairSerializer,
+    CustomTokenRefreshSerializer,
+    LogoutSerializer,
+    RegisterSerializer,
+    UserSerializer,
+)
 
 User = get_user_model()
 
@@ -47,9 +65,60 @@ class LoginView(TokenObtainPairView):
     User login endpoint.
     POST /auth/login/
     Returns JWT access and refresh tokens.
+    Usernames and addresses with repeated failures are locked out (see ``users.login_guard``).
     """
 
     serializer_class = CustomTokenObtainPairSerializer
+    throttle_classes = (ScopedRateThrottle,)
+    throttle_scope = "login"
+
+    def post(self, request, *args, **kwargs) -> Response:
+        """Log in, rejecting locked out attempts before the password is checked."""
+        username = ""
+        if isinstance(request.data, dict):
+            username = str(request.data.get(User.USERNAME_FIELD, ""))
+        ip = BaseThrottle().get_ident(request)
+
+        wait = login_guard.retry_after(username, ip)
+        if wait is not None:
+            raise Throttled(wait=wait, detail=_("Too many failed login attempts."))
+        try:
+            response = super().post(request, *args, **kwargs)
+        except AuthenticationFailed:
+            login_guard.record_failure(username, ip)
+            raise
+        login_guard.record_success(username, ip)
+        return response
+
+
+class RefreshView(TokenRefreshView):
+    """
+    Token refresh endpoint.
+    POST /auth/token/refresh/
+    Returns a new access token carrying the user's current claims.
+    """
+
+    serializer_class = CustomTokenRefreshSerializer
+
+
+class LogoutView(generics.GenericAPIView):
+    """
+    User logout endpoint.
+    POST /auth/logout/ {"refresh": "<refresh token>"}
+    Revokes the refresh token and the access token the request was sent with.
+    """
+
+    permission_classes = (IsAuthenticated,)
+    serializer_class = LogoutSerializer
+
+    def post(self, request) -> Response:
+        """Revoke the user's tokens."""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        token_blacklist.revoke(serializer.validated_data["refresh"])
+        if request.auth is not None:
+            token_blacklist.revoke(request.auth)
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 @api_view(["GET"])
@@ -59,11 +128,12 @@ def me_view(request) -> Response:
     Get current authenticated user information.
     GET /auth/me/
     """
-    serializer = UserSerializer(request.user)
+    # Always the current row: the authentication cache may lag behind it
+    serializer = UserSerializer(get_object_or_404(User, pk=request.user.pk))
     return Response(serializer.data)
 
 
-class UserViewSet(viewsets.ReadOnlyModelViewSet):
+class UserViewSet(CompiledListMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for User model (read-only).
 
@@ -114,6 +184,7 @@ class UserViewSet(viewsets.ReadOnlyModelViewSet):
         url_path="loan_history",
         url_name="loan_history",
     )
+    @conditional_get("get_loan_history_version", per_user=True)
     def loan_history(self, request, pk=None) -> Response:
         """
         Get loan history for a user.
@@ -132,6 +203,18 @@ class UserViewSet(viewsets.ReadOnlyModelViewSet):
                 status=status.HTTP_403_FORBIDDEN,
             )
 
-        loans = Loan.objects.filter(user=user).order_by("-borrowed_at")
-        serializer = LoanSerializer(loans, many=True)
-        return Response(serializer.data)
+        paginator = LoanPagination()
+        queryset = self.narrow_queryset(
+            LoanHistory.objects.filter(user=user).select_related("user", "book"),
+            LoanSerializer,
+            ordering=paginator.ordering,
+        )
+        return self.get_list_response(queryset, LoanSerializer, paginator)
+
+    def get_loan_history_version(self, request, pk=None) -> tuple:
+        """Return the version of a user's loan history, including the embedded books."""
+        try:
+            user_id = int(pk)
+        except (TypeError, ValueError):
+            return None, None
+        return f"{get_user_loans_version(user_id)}:{get_catalog_version()}", None